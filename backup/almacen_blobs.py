@@ -0,0 +1,192 @@
+# backup/almacen_blobs.py
+"""
+Almacén de contenido para respaldos: cada archivo se guarda una sola vez, identificado por su SHA-256
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+# Bytes que se leen por bloque al copiar y calcular el hash
+TAMANO_BLOQUE = 1024 * 1024
+
+# Segundos durante los que un blob recién creado no se recolecta (puede haber un respaldo en curso)
+GRACIA_RECOLECCION = 3600
+
+
+class AlmacenBlobs:
+    """
+    Blobs en <raiz>/<2 primeros caracteres del hash>/<hash>
+
+    Los respaldos guardan un manifiesto (ruta -> hash) en lugar de los archivos. Un
+    índice con tamaño y fecha de modificación evita volver a leer los archivos que no
+    cambiaron desde el respaldo anterior.
+    """
+
+    def __init__(self, raiz):
+        self.raiz = raiz
+        self.indice_path = os.path.join(raiz, "indice_archivos.json")
+        self._indice = None
+
+    def ruta_blob(self, resumen):
+        """Ruta del blob de un hash"""
+        return os.path.join(self.raiz, resumen[:2], resumen)
+
+    def existe(self, resumen):
+        return os.path.exists(self.ruta_blob(resumen))
+
+    def guardar_arbol(self, nombre, directorio):
+        """
+        Guardar los archivos de un directorio y devolver sus entradas de manifiesto
+
+        Args:
+            nombre: Nombre lógico del directorio dentro del respaldo (por ejemplo 'recibos')
+            directorio: Ruta del directorio en disco
+
+        Returns:
+            tuple: (lista de entradas {'root', 'path', 'hash', 'size'}, blobs nuevos)
+        """
+        entradas = []
+        nuevos = 0
+        if not os.path.isdir(directorio):
+            return entradas, nuevos
+
+        indice = self._cargar_indice()
+        for raiz, _, archivos in os.walk(directorio):
+            for archivo in archivos:
+                ruta = os.path.join(raiz, archivo)
+                estado = os.stat(ruta)
+                clave = os.path.abspath(ruta)
+
+                conocido = indice.get(clave)
+                if (conocido and conocido['size'] == estado.st_size
+                        and conocido['mtime_ns'] == estado.st_mtime_ns and self.existe(conocido['hash'])):
+                    resumen = conocido['hash']
+                else:
+                    resumen, nuevo = self._guardar_archivo(ruta)
+                    nuevos += nuevo
+                    indice[clave] = {'hash': resumen, 'size': estado.st_size, 'mtime_ns': estado.st_mtime_ns}
+
+                entradas.append({
+                    'root': nombre,
+                    'path': os.path.relpath(ruta, directorio).replace("\\", "/"),
+                    'hash': resumen,
+                    'size': estado.st_size
+                })
+        return entradas, nuevos
+
+    def _guardar_archivo(self, ruta):
+        """
+        Copiar un archivo al almacén calculando su hash en la misma lectura
+
+        Returns:
+            tuple: (hash, 1 si se creó un blob nuevo o 0 si ya existía)
+        """
+        os.makedirs(self.raiz, exist_ok=True)
+        sha256 = hashlib.sha256()
+        descriptor, temporal = tempfile.mkstemp(dir=self.raiz, suffix=".tmp")
+        try:
+            with open(ruta, 'rb') as origen, os.fdopen(descriptor, 'wb') as destino:
+                for bloque in iter(lambda: origen.read(TAMANO_BLOQUE), b''):
+                    sha256.update(bloque)
+                    destino.write(bloque)
+
+            resumen = sha256.hexdigest()
+            blob = self.ruta_blob(resumen)
+            if os.path.exists(blob):
+                return resumen, 0
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            os.replace(temporal, blob)
+            return resumen, 1
+        finally:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+
+    def coincide(self, ruta, resumen):
+        """Indica si el archivo en disco ya tiene el contenido de un hash, según el índice"""
+        conocido = self._cargar_indice().get(os.path.abspath(ruta))
+        if not conocido or conocido['hash'] != resumen:
+            return False
+        estado = os.stat(ruta)
+        return conocido['size'] == estado.st_size and conocido['mtime_ns'] == estado.st_mtime_ns
+
+    def hash_blob(self, resumen):
+        """SHA-256 del contenido guardado de un blob"""
+        sha256 = hashlib.sha256()
+        with open(self.ruta_blob(resumen), 'rb') as archivo:
+            for bloque in iter(lambda: archivo.read(TAMANO_BLOQUE), b''):
+                sha256.update(bloque)
+        return sha256.hexdigest()
+
+    def restaurar(self, resumen, destino):
+        """Copiar un blob a su ruta original"""
+        blob = self.ruta_blob(resumen)
+        if not os.path.exists(blob):
+            raise FileNotFoundError(f"Falta el blob {resumen}")
+        os.makedirs(os.path.dirname(os.path.abspath(destino)), exist_ok=True)
+        shutil.copyfile(blob, destino)
+
+    def guardar_indice(self):
+        """Guardar el índice de archivos ya almacenados"""
+        if self._indice is None:
+            return
+        # Olvidar archivos que ya no existen
+        indice = {ruta: datos for ruta, datos in self._indice.items() if os.path.exists(ruta)}
+        os.makedirs(self.raiz, exist_ok=True)
+        temporal = f"{self.indice_path}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(indice, f)
+        os.replace(temporal, self.indice_path)
+        # Otro gestor de respaldos puede actualizarlo: se vuelve a leer en el siguiente respaldo
+        self._indice = None
+
+    def recolectar(self, referenciados, gracia=GRACIA_RECOLECCION):
+        """
+        Eliminar los blobs que ningún respaldo referencia
+
+        Args:
+            referenciados: Conjunto de hashes en uso
+            gracia: Segundos de antigüedad mínima de un blob para eliminarlo
+
+        Returns:
+            tuple: (blobs eliminados, bytes liberados)
+        """
+        eliminados = 0
+        liberados = 0
+        if not os.path.isdir(self.raiz):
+            return eliminados, liberados
+
+        limite = time.time() - gracia
+
+        for prefijo in os.listdir(self.raiz):
+            carpeta = os.path.join(self.raiz, prefijo)
+            if len(prefijo) != 2 or not os.path.isdir(carpeta):
+                continue
+            for resumen in os.listdir(carpeta):
+                if resumen in referenciados:
+                    continue
+                blob = os.path.join(carpeta, resumen)
+                try:
+                    estado = os.stat(blob)
+                    if estado.st_mtime > limite:
+                        continue
+                    tamano = estado.st_size
+                    os.remove(blob)
+                    eliminados += 1
+                    liberados += tamano
+                except OSError as e:
+                    print(f"Error al eliminar blob {resumen}: {e}")
+        return eliminados, liberados
+
+    def _cargar_indice(self):
+        """Índice ruta -> hash, tamaño y fecha de modificación"""
+        if self._indice is None:
+            try:
+                with open(self.indice_path, 'r', encoding='utf-8') as f:
+                    self._indice = json.load(f)
+            except (OSError, ValueError):
+                self._indice = {}
+        return self._indice
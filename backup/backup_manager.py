@@ -9,8 +9,32 @@ import zipfile
 import sqlite3
 from datetime import datetime
 import json
+import uuid
+import hashlib
+import tempfile
 from pathlib import Path
 from config.paths import AppPaths
+from backup.almacen_blobs import AlmacenBlobs
+from backup.catalogo import CatalogoRespaldos, MIEMBRO_METADATOS, MIEMBRO_MANIFIESTO
+from backup.retencion import planear_retencion
+from backup.compresion import (DEFLATE, elegir_codec, comprimir_bloques, descomprimir,
+                               SalidaConResumen, TAMANO_BLOQUE)
+from backup.instantaneas import (copiar_en_linea, tamano_pagina, resumenes_paginas,
+                                 escribir_diferencias, aplicar_diferencias, verificar_integridad,
+                                 vaciar_wal)
+
+# Miembros del ZIP con la base de datos completa o con las páginas cambiadas
+MIEMBRO_BASE_DATOS = "database/criptas.db"
+MIEMBRO_DIFERENCIAS = "database/criptas.db.delta"
+
+# Versión del formato: la 2 guarda la base de datos en bloques comprimidos y el SHA-256 de cada miembro
+VERSION_FORMATO = "2.0"
+
+# Bytes que se leen por vez al verificar un miembro
+TAMANO_LECTURA_VERIFICACION = 1024 * 1024
+
+# Prefijo de los respaldos de seguridad que se crean antes de restaurar
+PREFIJO_SEGURIDAD = "pre_restore_safety"
 
 class BackupManager:
     def __init__(self):
@@ -18,6 +42,16 @@ class BackupManager:
         self.db_path = AppPaths.get_database_path()
         self.config_file = AppPaths.get_backup_config_file_path()
 
+        # Estado de los respaldos incrementales: respaldo completo base y resúmenes de sus páginas
+        self.incremental_state_file = os.path.join(self.backup_dir, ".estado_incremental.json")
+        self.incremental_pages_file = os.path.join(self.backup_dir, ".paginas_base.bin")
+
+        # Los documentos se guardan una sola vez por contenido y los respaldos los referencian
+        self.blob_store = AlmacenBlobs(os.path.join(self.backup_dir, "blobs"))
+
+        # Metadatos de los respaldos, para listarlos sin abrir cada ZIP
+        self.catalog = CatalogoRespaldos(self.backup_dir)
+
         # Cargar configuración
         self.config = self.load_config()
     
@@ -30,7 +64,21 @@ class BackupManager:
             "backup_day": "saturday",
             "backup_time": "12:00",
             "include_reports": True,
-            "compression_level": 6
+            "compression_level": 6,
+            "compression_codec": DEFLATE,
+            "compression_workers": 0,
+            "incremental_enabled": True,
+            "full_backup_every": 24,
+            "backup_pages_per_step": 256,
+            "change_backup_enabled": True,
+            "change_backup_threshold": 25,
+            "change_backup_quiet_minutes": 30,
+            "retention_hourly": 24,
+            "retention_daily": 7,
+            "retention_weekly": 4,
+            "retention_monthly": 12,
+            "retention_max_size_mb": 0,
+            "retention_pinned": [PREFIJO_SEGURIDAD]
         }
         
         if os.path.exists(self.config_file):
@@ -51,12 +99,18 @@ class BackupManager:
         except Exception as e:
             print(f"Error al guardar configuración: {e}")
     
-    def create_backup(self, backup_name=None):
+    def create_backup(self, backup_name=None, incremental=False, cleanup=True):
         """
-        Crear un respaldo completo del sistema
+        Crear un respaldo del sistema
         
+        La base de datos se copia en línea con la API de respaldo de SQLite, así el
+        respaldo es consistente aunque la aplicación esté escribiendo.
+
         Args:
             backup_name: Nombre personalizado para el respaldo
+            incremental: Guardar solo las páginas que cambiaron desde el último respaldo
+                         completo (se hace uno completo cada `full_backup_every` incrementales)
+            cleanup: Aplicar después la política de retención por hora, día, semana y mes (apply_retention)
             
         Returns:
             str: Ruta del archivo de respaldo creado
@@ -66,14 +120,34 @@ class BackupManager:
             backup_name = f"backup_{timestamp}"
         
         backup_path = os.path.join(self.backup_dir, f"{backup_name}.zip")
+        snapshot_path = os.path.join(self.backup_dir, f".{backup_name}.db")
         
         try:
+            base = None
+            if os.path.exists(self.db_path):
+                copiar_en_linea(self.db_path, snapshot_path, self.config['backup_pages_per_step'])
+                if incremental:
+                    base = self._load_incremental_base(snapshot_path)
+
             with zipfile.ZipFile(backup_path, 'w', zipfile.ZIP_DEFLATED, 
                                compresslevel=self.config['compression_level']) as zipf:
                 
-                # Respaldar base de datos principal
-                if os.path.exists(self.db_path):
-                    zipf.write(self.db_path, "database/criptas.db")
+                # SHA-256 de cada miembro, para verificar el respaldo sin conocer su contenido
+                checksums = {}
+                
+                # Respaldar base de datos principal (completa o solo las páginas cambiadas)
+                pages = None
+                chunks = None
+                if os.path.exists(snapshot_path):
+                    if base:
+                        with zipf.open(MIEMBRO_DIFERENCIAS, 'w', force_zip64=True) as delta:
+                            output = SalidaConResumen(delta)
+                            pages = escribir_diferencias(
+                                snapshot_path, base['resumenes'], base['page_size'], output
+                            )
+                        checksums[MIEMBRO_DIFERENCIAS] = output.hexdigest()
+                    else:
+                        chunks = self._write_database_chunks(zipf, snapshot_path, checksums)
                 
                 # Respaldar archivos de configuración
                 config_files = [
@@ -83,21 +157,38 @@ class BackupManager:
                 
                 for config_file in config_files:
                     if os.path.exists(config_file):
-                        zipf.write(config_file, f"config/{config_file}")
+                        with open(config_file, 'rb') as f:
+                            content = f.read()
+                        member = f"config/{os.path.basename(config_file)}"
+                        zipf.writestr(member, content)
+                        checksums[member] = hashlib.sha256(content).hexdigest()
                 
-                # Respaldar reportes si está habilitado
-                if self.config['include_reports']:
-                    self._backup_reports(zipf)
-                
-                # Respaldar logos y assets
-                self._backup_assets(zipf)
+                # Respaldar reportes y assets en el almacén de blobs (solo se copian los nuevos)
+                documents, blobs = self._backup_documents(zipf, checksums)
                 
                 # Crear archivo de metadatos del respaldo
-                metadata = self._create_backup_metadata()
-                zipf.writestr("backup_metadata.json", json.dumps(metadata, indent=4, ensure_ascii=False))
+                metadata = self._create_backup_metadata(snapshot_path, base, pages)
+                metadata.update(documents)
+                metadata["database_chunks"] = chunks
+                metadata["checksums"] = checksums
+                zipf.writestr(MIEMBRO_METADATOS, json.dumps(metadata, indent=4, ensure_ascii=False))
+            
+            # Actualizar la base de los incrementales (los respaldos manuales y de seguridad no son base)
+            if base:
+                self._save_incremental_state(dict(base['estado'], incrementales=base['estado']['incrementales'] + 1))
+            elif incremental and os.path.exists(snapshot_path):
+                self._save_incremental_base(backup_path, metadata, snapshot_path)
+            
+            self.catalog.registrar(backup_path, metadata, blobs)
+            
+            # Las escrituras que quedaron en la instantánea ya no cuentan para los respaldos por cambios
+            if os.path.exists(snapshot_path):
+                from database.contador_escrituras import leer_escrituras_pendientes, descontar_escrituras
+                descontar_escrituras(self.db_path, leer_escrituras_pendientes(snapshot_path)[0])
             
             # Limpiar respaldos antiguos
-            self._cleanup_old_backups()
+            if cleanup:
+                self._cleanup_old_backups()
             
             print(f"Respaldo creado exitosamente: {backup_path}")
             return backup_path
@@ -108,41 +199,140 @@ class BackupManager:
             if os.path.exists(backup_path):
                 os.remove(backup_path)
             raise e
+        finally:
+            if os.path.exists(snapshot_path):
+                os.remove(snapshot_path)
     
-    def _backup_reports(self, zipf):
-        """Respaldar archivos de reportes"""
-        report_dirs = ["reportes", "recibos", "titulos"]
+    def _write_database_chunks(self, zipf, snapshot_path, checksums):
+        """
+        Guardar la instantánea en bloques comprimidos en paralelo
         
-        for report_dir in report_dirs:
-            if os.path.exists(report_dir):
-                for root, dirs, files in os.walk(report_dir):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        arc_path = file_path.replace("\\", "/")  # Normalizar path para ZIP
-                        zipf.write(file_path, arc_path)
+        Cada bloque se comprime en un hilo (deflate o zstd) y se guarda sin volver a
+        comprimir como database/criptas.db.000000, .000001, ...
+        
+        Returns:
+            dict: Codec, tamaño de bloque, número de bloques y SHA-256 de la base completa
+        """
+        codec = elegir_codec(self.config['compression_codec'])
+        workers = self.config['compression_workers'] or None
+        database_hash = hashlib.sha256()
+        count = 0
+        
+        for compressed, original in comprimir_bloques(
+                snapshot_path, codec, self.config['compression_level'], workers):
+            name = f"{MIEMBRO_BASE_DATOS}.{count:06d}"
+            zipf.writestr(name, compressed, compress_type=zipfile.ZIP_STORED)
+            checksums[name] = hashlib.sha256(compressed).hexdigest()
+            database_hash.update(original)
+            count += 1
+        
+        return {
+            "codec": codec,
+            "chunk_size": TAMANO_BLOQUE,
+            "count": count,
+            "sha256": database_hash.hexdigest()
+        }
     
-    def _backup_assets(self, zipf):
-        """Respaldar assets y archivos estáticos"""
-        asset_dirs = ["assets", "images", "fonts"]
+    def _load_incremental_base(self, snapshot_path):
+        """
+        Base para un respaldo incremental
+        
+        Returns:
+            dict con 'estado', 'resumenes' y 'page_size', o None si toca un respaldo completo
+        """
+        try:
+            with open(self.incremental_state_file, 'r', encoding='utf-8') as f:
+                estado = json.load(f)
+            with open(self.incremental_pages_file, 'rb') as f:
+                resumenes = f.read()
+        except (OSError, ValueError):
+            return None
         
-        for asset_dir in asset_dirs:
-            if os.path.exists(asset_dir):
-                for root, dirs, files in os.walk(asset_dir):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        arc_path = file_path.replace("\\", "/")
-                        zipf.write(file_path, arc_path)
+        page_size = tamano_pagina(snapshot_path)
+        if (estado.get('incrementales', 0) >= self.config['full_backup_every']
+                or estado.get('page_size') != page_size
+                or not os.path.exists(os.path.join(self.backup_dir, estado['base_backup']))):
+            return None
+        
+        return {'estado': estado, 'resumenes': resumenes, 'page_size': page_size}
+    
+    def _save_incremental_base(self, backup_path, metadata, snapshot_path):
+        """Registrar un respaldo completo como base de los siguientes incrementales"""
+        page_size = tamano_pagina(snapshot_path)
+        with open(self.incremental_pages_file, 'wb') as f:
+            f.write(resumenes_paginas(snapshot_path, page_size))
+        self._save_incremental_state({
+            'base_backup': os.path.basename(backup_path),
+            'base_snapshot_id': metadata['snapshot_id'],
+            'page_size': page_size,
+            'incrementales': 0
+        })
     
-    def _create_backup_metadata(self):
-        """Crear metadatos del respaldo"""
+    def _save_incremental_state(self, estado):
+        """Guardar el estado de los respaldos incrementales"""
+        with open(self.incremental_state_file, 'w', encoding='utf-8') as f:
+            json.dump(estado, f, indent=4, ensure_ascii=False)
+    
+    def _document_dirs(self):
+        """Directorios de documentos que se respaldan: nombre en el respaldo -> ruta"""
+        dirs = {}
+        if self.config['include_reports']:
+            dirs["reportes"] = AppPaths.get_reportes_dir()
+            dirs["recibos"] = AppPaths.get_recibos_dir()
+            dirs["titulos"] = AppPaths.get_titulos_dir()
+        
+        # Logos y archivos estáticos de la carpeta de instalación
+        for asset_dir in ["assets", "images", "fonts"]:
+            dirs[asset_dir] = asset_dir
+        return dirs
+    
+    def _backup_documents(self, zipf, checksums):
+        """
+        Guardar los documentos en el almacén de blobs y su manifiesto en el respaldo
+        
+        Returns:
+            tuple: (resumen para los metadatos con documentos, bytes y blobs nuevos,
+                    hashes referenciados para el catálogo)
+        """
+        entries = []
+        new_blobs = 0
+        for name, directory in self._document_dirs().items():
+            tree_entries, tree_new = self.blob_store.guardar_arbol(name, directory)
+            entries.extend(tree_entries)
+            new_blobs += tree_new
+        self.blob_store.guardar_indice()
+        
+        manifest = json.dumps({"version": 1, "files": entries}, ensure_ascii=False).encode('utf-8')
+        zipf.writestr(MIEMBRO_MANIFIESTO, manifest)
+        checksums[MIEMBRO_MANIFIESTO] = hashlib.sha256(manifest).hexdigest()
+        summary = {
+            "documents": len(entries),
+            "documents_size": sum(entry['size'] for entry in entries),
+            "new_blobs": new_blobs
+        }
+        return summary, sorted({entry['hash'] for entry in entries})
+    
+    def _create_backup_metadata(self, snapshot_path=None, base=None, pages=None):
+        """Crear metadatos del respaldo (los conteos salen de la instantánea, no del archivo en uso)"""
+        snapshot_path = snapshot_path or self.db_path
         metadata = {
             "backup_date": datetime.now().isoformat(),
-            "backup_type": "full",
-            "version": "1.0",
-            "database_size": self._get_file_size(self.db_path),
-            "total_records": self._count_database_records(),
+            "backup_type": "incremental" if base else "full",
+            "version": VERSION_FORMATO,
+            "snapshot_id": uuid.uuid4().hex,
+            "database_size": self._get_file_size(snapshot_path),
+            "total_records": self._count_database_records(snapshot_path),
             "config": self.config.copy()
         }
+        if base:
+            changed_pages, page_count = pages
+            metadata.update({
+                "base_backup": base['estado']['base_backup'],
+                "base_snapshot_id": base['estado']['base_snapshot_id'],
+                "page_size": base['page_size'],
+                "page_count": page_count,
+                "changed_pages": changed_pages
+            })
         return metadata
     
     def _get_file_size(self, file_path):
@@ -152,13 +342,14 @@ class BackupManager:
         except OSError:
             return 0
     
-    def _count_database_records(self):
+    def _count_database_records(self, db_path=None):
         """Contar registros en la base de datos"""
-        if not os.path.exists(self.db_path):
+        db_path = db_path or self.db_path
+        if not os.path.exists(db_path):
             return {}
         
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = sqlite3.connect(db_path)
             cursor = conn.cursor()
             
             # Obtener todas las tablas
@@ -183,78 +374,249 @@ class BackupManager:
         """
         Restaurar desde un archivo de respaldo
         
+        La base de datos se escribe en un archivo temporal junto a la actual, se valida
+        con PRAGMA integrity_check y solo entonces reemplaza a la actual con os.replace;
+        si algo falla antes, la base de datos en uso queda intacta.
+        
         Args:
             backup_path: Ruta del archivo de respaldo
         """
         if not os.path.exists(backup_path):
             raise FileNotFoundError(f"Archivo de respaldo no encontrado: {backup_path}")
         
-        # Crear respaldo de seguridad antes de restaurar
-        safety_backup = self.create_backup("pre_restore_safety")
-        
-        try:
-            with zipfile.ZipFile(backup_path, 'r') as zipf:
-                
-                # Verificar que es un respaldo válido
-                if "backup_metadata.json" not in zipf.namelist():
-                    raise ValueError("Archivo de respaldo inválido: falta metadata")
-                
-                # Leer metadatos
-                metadata_content = zipf.read("backup_metadata.json").decode('utf-8')
-                metadata = json.loads(metadata_content)
-                
-                print(f"Restaurando respaldo del {metadata['backup_date']}")
-                
-                # Cerrar conexiones de base de datos antes de restaurar
-                self._close_database_connections()
-                
-                # Restaurar base de datos
-                if "database/criptas.db" in zipf.namelist():
-                    # Hacer backup de la BD actual
-                    if os.path.exists(self.db_path):
-                        shutil.copy2(self.db_path, f"{self.db_path}.backup")
+        with zipfile.ZipFile(backup_path, 'r') as zipf:
+            
+            # Verificar que es un respaldo válido
+            if MIEMBRO_METADATOS not in zipf.namelist():
+                raise ValueError("Archivo de respaldo inválido: falta metadata")
+            
+            # Leer metadatos
+            metadata_content = zipf.read(MIEMBRO_METADATOS).decode('utf-8')
+            metadata = json.loads(metadata_content)
+            
+            print(f"Restaurando respaldo del {metadata['backup_date']}")
+            
+            restored_path = None
+            try:
+                if self._has_database(zipf.namelist(), metadata):
+                    # Escribir la BD del respaldo (o reconstruirla desde su base) junto a la actual
+                    descriptor, restored_path = tempfile.mkstemp(
+                        dir=os.path.dirname(self.db_path), suffix=".restore"
+                    )
+                    os.close(descriptor)
+                    self._extract_database(backup_path, zipf, metadata, restored_path)
+                    valid, message = verificar_integridad(restored_path)
+                    if not valid:
+                        raise ValueError(f"La base de datos del respaldo está dañada: {message}")
+                    
+                    # Respaldo de seguridad de la BD actual (se reutiliza uno reciente si existe)
+                    safety_backup = self._safety_backup()
+                    print(f"Respaldo de seguridad: {os.path.basename(safety_backup)}")
                     
-                    # Extraer nueva BD
-                    zipf.extract("database/criptas.db", "temp_restore")
-                    shutil.move("temp_restore/database/criptas.db", self.db_path)
-                    shutil.rmtree("temp_restore", ignore_errors=True)
+                    # Cerrar conexiones y cambiar el archivo de una sola vez
+                    self._close_database_connections()
+                    os.replace(restored_path, self.db_path)
+                    restored_path = None
+                    # Descartar WAL de la base anterior para que no se aplique sobre la restaurada
+                    for sufijo in ("-wal", "-shm"):
+                        if os.path.exists(f"{self.db_path}{sufijo}"):
+                            os.remove(f"{self.db_path}{sufijo}")
+                    self._prepare_restored_database()
                 
                 # Restaurar archivos de configuración
-                for item in zipf.namelist():
-                    if item.startswith("config/"):
-                        target_path = item.replace("config/", "")
-                        zipf.extract(item, "temp_restore")
-                        shutil.move(f"temp_restore/{item}", target_path)
-                
-                # Restaurar reportes si existen
-                if self.config['include_reports']:
-                    self._restore_reports(zipf)
-                
-                # Restaurar assets
-                self._restore_assets(zipf)
+                self._restore_config(zipf)
                 
-                # Limpiar archivos temporales
-                shutil.rmtree("temp_restore", ignore_errors=True)
+                # Restaurar reportes y assets desde el manifiesto (o desde el ZIP en respaldos antiguos)
+                if MIEMBRO_MANIFIESTO in zipf.namelist():
+                    self._restore_documents(zipf)
+                else:
+                    if self.config['include_reports']:
+                        self._restore_reports(zipf)
+                    self._restore_assets(zipf)
                 
                 print("Restauración completada exitosamente")
+                self._cleanup_old_backups()
                 
-        except Exception as e:
-            print(f"Error durante la restauración: {e}")
-            # Intentar restaurar desde el backup de seguridad
-            if os.path.exists(f"{self.db_path}.backup"):
-                shutil.move(f"{self.db_path}.backup", self.db_path)
-            raise e
-        finally:
-            # Limpiar archivos de backup temporal
-            if os.path.exists(f"{self.db_path}.backup"):
-                os.remove(f"{self.db_path}.backup")
+            except Exception as e:
+                print(f"Error durante la restauración: {e}")
+                raise e
+            finally:
+                # Limpiar archivo temporal
+                if restored_path and os.path.exists(restored_path):
+                    os.remove(restored_path)
+    
+    def _safety_backup(self):
+        """
+        Respaldo con el estado actual de la base de datos, antes de restaurar
+        
+        Si no hay escrituras pendientes desde el respaldo más reciente y está íntegro, ya
+        tiene el contenido de la base de datos y se usa ese. Si no, se crea uno
+        (incremental cuando están activados, así tarda poco).
+        
+        Returns:
+            str: Ruta del respaldo de seguridad
+        """
+        backups = [backup for backup in self.list_backups() if backup.get('metadata')]
+        if backups:
+            latest = max(backups, key=lambda backup: backup['metadata']['backup_date'])
+            if self._is_current(latest):
+                valid, message = self.verify_backup(latest['path'])
+                if valid:
+                    return latest['path']
+                print(f"No se reutiliza {latest['filename']} como respaldo de seguridad: {message}")
+        
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # Sin limpieza: podría eliminar el respaldo que se está restaurando o sus documentos
+        return self.create_backup(f"{PREFIJO_SEGURIDAD}_{timestamp}",
+                                  incremental=self.config['incremental_enabled'], cleanup=False)
+    
+    def _is_current(self, backup):
+        """Indicar si la base de datos no cambió desde que se tomó el respaldo"""
+        from database.contador_escrituras import leer_escrituras_pendientes
+        pending, _ = leer_escrituras_pendientes(self.db_path)
+        if pending:
+            # Cada respaldo descuenta lo que guardó: sin pendientes, el último tiene todo
+            return sum(pending.values()) == 0
+        
+        # Bases sin contador: la fecha de modificación de los archivos
+        last_write = max(
+            (os.path.getmtime(path) for path in (self.db_path, f"{self.db_path}-wal") if os.path.exists(path)),
+            default=None
+        )
+        return last_write is not None and datetime.fromisoformat(backup['metadata']['backup_date']).timestamp() > last_write
+    
+    def _restore_config(self, zipf):
+        """Restaurar los archivos de configuración guardados en config/"""
+        targets = {
+            os.path.basename(self.config_file): self.config_file,
+            "app_config.json": "app_config.json"
+        }
+        for item in zipf.namelist():
+            # Los respaldos anteriores guardaban la ruta completa después de config/
+            target_path = targets.get(item.rsplit("/", 1)[-1]) if item.startswith("config/") else None
+            if not target_path:
+                continue
+            temp_path = f"{target_path}.restore"
+            with zipf.open(item) as source, open(temp_path, 'wb') as target:
+                shutil.copyfileobj(source, target)
+            os.replace(temp_path, target_path)
+        
+        self.config = self.load_config()
+    
+    def _has_database(self, names, metadata):
+        """Indica si el respaldo trae la base de datos (completa, en bloques o incremental)"""
+        return bool(metadata.get('database_chunks')) or MIEMBRO_BASE_DATOS in names or MIEMBRO_DIFERENCIAS in names
+    
+    def _chunk_names(self, chunks):
+        """Miembros del ZIP con los bloques de la base de datos, en orden"""
+        if not chunks:
+            return []
+        return [f"{MIEMBRO_BASE_DATOS}.{index:06d}" for index in range(chunks['count'])]
+    
+    def _write_database(self, zipf, metadata, destination):
+        """Escribir la base de datos completa de un respaldo (en bloques o en un solo miembro)"""
+        chunks = metadata.get('database_chunks')
+        if not chunks:
+            with zipf.open(MIEMBRO_BASE_DATOS) as source, open(destination, 'wb') as target:
+                shutil.copyfileobj(source, target)
+            return
+        
+        database_hash = hashlib.sha256()
+        with open(destination, 'wb') as target:
+            for name in self._chunk_names(chunks):
+                data = descomprimir(zipf.read(name), chunks['codec'])
+                database_hash.update(data)
+                target.write(data)
+        if database_hash.hexdigest() != chunks['sha256']:
+            raise ValueError("La base de datos del respaldo no coincide con su SHA-256")
+    
+    def _extract_database(self, backup_path, zipf, metadata, destination):
+        """
+        Escribir en `destination` la base de datos de un respaldo
+        
+        Un respaldo incremental se reconstruye copiando la base de su respaldo completo
+        y aplicando encima las páginas cambiadas.
+        """
+        if MIEMBRO_DIFERENCIAS not in zipf.namelist():
+            self._write_database(zipf, metadata, destination)
+            return
+        
+        base_path = os.path.join(os.path.dirname(backup_path), metadata['base_backup'])
+        if not os.path.exists(base_path):
+            raise FileNotFoundError(f"Falta el respaldo base del incremental: {metadata['base_backup']}")
+        
+        with zipfile.ZipFile(base_path, 'r') as base_zip:
+            base_metadata = json.loads(base_zip.read(MIEMBRO_METADATOS).decode('utf-8'))
+            if base_metadata.get('snapshot_id') != metadata['base_snapshot_id']:
+                raise ValueError(f"El respaldo base {metadata['base_backup']} fue reemplazado")
+            self._write_database(base_zip, base_metadata, destination)
+        
+        with zipf.open(MIEMBRO_DIFERENCIAS) as delta:
+            aplicar_diferencias(delta, destination, metadata['page_size'], metadata['page_count'])
     
     def _close_database_connections(self):
-        """Cerrar todas las conexiones a la base de datos"""
-        # Aquí podrías implementar lógica para cerrar conexiones activas
-        # Por ahora, solo agregamos un pequeño delay
-        import time
-        time.sleep(1)
+        """Cerrar las conexiones del pool de SQLAlchemy y vaciar el WAL de la base actual"""
+        from database.models import engine
+        engine.dispose()
+        if os.path.exists(self.db_path):
+            vaciar_wal(self.db_path)
+    
+    def _prepare_restored_database(self):
+        """Recrear en la base restaurada el índice de búsqueda y los triggers que crea main.init_database"""
+        # Un respaldo anterior a estas tablas, o de otra versión, no las trae o las trae distintas
+        from database.busqueda_fts import crear_indice_busqueda
+        from database.contador_escrituras import crear_contador_escrituras
+        crear_indice_busqueda()
+        crear_contador_escrituras()
+    
+    def _restore_documents(self, zipf):
+        """Reconstruir los directorios de documentos a partir del manifiesto del respaldo"""
+        manifest = json.loads(zipf.read(MIEMBRO_MANIFIESTO).decode('utf-8'))
+        dirs = self._document_dirs()
+        missing = 0
+        
+        for entry in manifest['files']:
+            directory = dirs.get(entry['root'])
+            if directory is None:
+                continue
+            target_path = os.path.join(directory, *entry['path'].split("/"))
+            
+            # Un archivo con el mismo contenido no se vuelve a copiar
+            if os.path.exists(target_path) and self.blob_store.coincide(target_path, entry['hash']):
+                continue
+            try:
+                self.blob_store.restaurar(entry['hash'], target_path)
+            except FileNotFoundError:
+                missing += 1
+        
+        if missing:
+            print(f"Advertencia: {missing} documentos no se pudieron restaurar (faltan en el almacén)")
+    
+    def _referenced_blobs(self, backups):
+        """Hashes que referencian los manifiestos de los respaldos indicados (según el catálogo)"""
+        referenced = set()
+        for backup in backups:
+            if backup.get('blobs') is None:
+                # Ante la duda no se recolecta nada: un manifiesto ilegible podría referenciar cualquier blob
+                print(f"No se pudo leer el manifiesto de {backup['filename']}")
+                return None
+            referenced.update(backup['blobs'])
+        return referenced
+    
+    def collect_garbage(self):
+        """
+        Eliminar los blobs que ya no referencia ningún respaldo
+        
+        Returns:
+            tuple: (blobs eliminados, bytes liberados)
+        """
+        referenced = self._referenced_blobs(self.list_backups())
+        if referenced is None:
+            return 0, 0
+        removed, freed = self.blob_store.recolectar(referenced)
+        if removed:
+            print(f"Blobs sin referencias eliminados: {removed} ({round(freed / (1024 * 1024), 2)} MB)")
+        return removed, freed
     
     def _restore_reports(self, zipf):
         """Restaurar archivos de reportes"""
@@ -275,54 +637,81 @@ class BackupManager:
                     zipf.extract(item, ".")
     
     def list_backups(self):
-        """Listar todos los respaldos disponibles"""
-        if not os.path.exists(self.backup_dir):
-            return []
-        
+        """Listar todos los respaldos disponibles (desde el catálogo, sin abrir cada ZIP)"""
         backups = []
-        for file in os.listdir(self.backup_dir):
-            if file.endswith('.zip'):
-                file_path = os.path.join(self.backup_dir, file)
-                stat = os.stat(file_path)
-                
-                backup_info = {
-                    'filename': file,
-                    'path': file_path,
-                    'size': stat.st_size,
-                    'created': datetime.fromtimestamp(stat.st_ctime),
-                    'modified': datetime.fromtimestamp(stat.st_mtime)
-                }
-                
-                # Intentar leer metadatos si es posible
-                try:
-                    with zipfile.ZipFile(file_path, 'r') as zipf:
-                        if "backup_metadata.json" in zipf.namelist():
-                            metadata_content = zipf.read("backup_metadata.json").decode('utf-8')
-                            metadata = json.loads(metadata_content)
-                            backup_info['metadata'] = metadata
-                except Exception:
-                    pass  # Ignorar errores al leer metadatos
-                
-                backups.append(backup_info)
+        for file, entry in self.catalog.respaldos().items():
+            backup_info = {
+                'filename': file,
+                'path': os.path.join(self.backup_dir, file),
+                'size': entry['size'],
+                'created': datetime.fromtimestamp(entry['created']),
+                'modified': datetime.fromtimestamp(entry['modified']),
+                'blobs': entry['blobs']
+            }
+            if entry['metadata'] is not None:
+                backup_info['metadata'] = entry['metadata']
+            backups.append(backup_info)
         
         # Ordenar por fecha de creación (más reciente primero)
         backups.sort(key=lambda x: x['created'], reverse=True)
         return backups
     
-    def _cleanup_old_backups(self):
-        """Limpiar respaldos antiguos según la configuración"""
-        backups = self.list_backups()
+    def rebuild_catalog(self):
+        """Volver a leer todos los respaldos de la carpeta (por ejemplo, tras copiar ZIP a mano)"""
+        return self.catalog.reconstruir()
+    
+    def plan_retention(self):
+        """
+        Vista previa de la retención, sin eliminar nada
+        
+        Se conservan los `max_backups` más recientes, uno por periodo en cada nivel
+        (horas, días, semanas y meses), los fijados y las bases de los incrementales;
+        `retention_max_size_mb` limita el espacio de los ZIP conservados.
+        
+        Returns:
+            dict: 'keep' (nombre -> motivos), 'delete' (nombres) y 'freed' (bytes)
+        """
+        config = self.config
+        return planear_retencion(
+            self.list_backups(),
+            ultimos=config['max_backups'],
+            niveles={tier: config[f'retention_{tier}'] for tier in ('hourly', 'daily', 'weekly', 'monthly')},
+            fijados=config['retention_pinned'],
+            tamano_maximo=config['retention_max_size_mb'] * 1024 * 1024
+        )
+    
+    def apply_retention(self, dry_run=False):
+        """
+        Eliminar los respaldos que la política de retención no conserva
         
-        if len(backups) > self.config['max_backups']:
-            # Eliminar los respaldos más antiguos
-            backups_to_delete = backups[self.config['max_backups']:]
+        Args:
+            dry_run: Solo calcular y mostrar qué se eliminaría
             
-            for backup in backups_to_delete:
-                try:
-                    os.remove(backup['path'])
-                    print(f"Respaldo antiguo eliminado: {backup['filename']}")
-                except Exception as e:
-                    print(f"Error al eliminar respaldo {backup['filename']}: {e}")
+        Returns:
+            dict: El plan de plan_retention()
+        """
+        plan = self.plan_retention()
+        if dry_run:
+            return plan
+        
+        deleted = 0
+        for filename in plan['delete']:
+            try:
+                os.remove(os.path.join(self.backup_dir, filename))
+                self.catalog.quitar(filename)
+                deleted += 1
+                print(f"Respaldo antiguo eliminado: {filename}")
+            except Exception as e:
+                print(f"Error al eliminar respaldo {filename}: {e}")
+        
+        # Los documentos que solo referenciaban los respaldos eliminados ya no hacen falta
+        if deleted:
+            self.collect_garbage()
+        return plan
+    
+    def _cleanup_old_backups(self):
+        """Limpiar respaldos antiguos según la política de retención"""
+        self.apply_retention()
     
     def delete_backup(self, backup_filename):
         """Eliminar un respaldo específico"""
@@ -330,7 +719,9 @@ class BackupManager:
         
         if os.path.exists(backup_path):
             os.remove(backup_path)
+            self.catalog.quitar(backup_filename)
             print(f"Respaldo eliminado: {backup_filename}")
+            self.collect_garbage()
             return True
         return False
     
@@ -351,8 +742,8 @@ class BackupManager:
                 }
                 
                 # Leer metadatos si existen
-                if "backup_metadata.json" in zipf.namelist():
-                    metadata_content = zipf.read("backup_metadata.json").decode('utf-8')
+                if MIEMBRO_METADATOS in zipf.namelist():
+                    metadata_content = zipf.read(MIEMBRO_METADATOS).decode('utf-8')
                     info['metadata'] = json.loads(metadata_content)
                 
                 return info
@@ -361,27 +752,110 @@ class BackupManager:
             print(f"Error al leer información del respaldo: {e}")
             return None
     
-    def verify_backup(self, backup_path):
-        """Verificar la integridad de un respaldo"""
+    def verify_backup(self, backup_path, check_blobs=False):
+        """
+        Verificar la integridad de un respaldo
+        
+        Lee el ZIP una sola vez: compara el SHA-256 de cada miembro con los metadatos,
+        arma la base de datos en un directorio temporal y ejecuta PRAGMA integrity_check.
+        
+        Args:
+            backup_path: Ruta del respaldo
+            check_blobs: Volver a calcular también el hash de los documentos del almacén
+            
+        Returns:
+            tuple: (bool, mensaje)
+        """
         try:
             with zipfile.ZipFile(backup_path, 'r') as zipf:
-                # Verificar que el archivo ZIP no esté corrupto
-                bad_files = zipf.testzip()
-                if bad_files:
-                    return False, f"Archivos corruptos: {bad_files}"
-                
                 # Verificar que contenga los archivos esenciales
-                required_files = ["database/criptas.db", "backup_metadata.json"]
-                missing_files = [f for f in required_files if f not in zipf.namelist()]
+                names = zipf.namelist()
+                if MIEMBRO_METADATOS not in names:
+                    return False, f"Archivos faltantes: ['{MIEMBRO_METADATOS}']"
+                metadata = json.loads(zipf.read(MIEMBRO_METADATOS).decode('utf-8'))
+                if not self._has_database(names, metadata):
+                    return False, f"Archivos faltantes: ['{MIEMBRO_BASE_DATOS}']"
+                
+                checksums = metadata.get('checksums')
+                if checksums is None:
+                    # Respaldos anteriores al formato 2: solo se pueden comprobar los CRC
+                    bad_files = zipf.testzip()
+                    if bad_files:
+                        return False, f"Archivos corruptos: {bad_files}"
+                else:
+                    missing = [name for name in checksums if name not in names]
+                    if missing:
+                        return False, f"Archivos faltantes: {missing}"
+                
+                with tempfile.TemporaryDirectory() as temp_dir:
+                    database_path = os.path.join(temp_dir, "criptas.db")
+                    
+                    # Un solo recorrido: hash de cada miembro y la base de datos armada al vuelo
+                    chunks = metadata.get('database_chunks')
+                    chunk_names = set(self._chunk_names(chunks))
+                    database_hash = hashlib.sha256()
+                    with open(database_path, 'wb') as database:
+                        for name in names:
+                            if name == MIEMBRO_METADATOS:
+                                continue
+                            content = bytearray() if name in chunk_names else None
+                            member_hash = hashlib.sha256()
+                            with zipf.open(name) as member:
+                                for block in iter(lambda: member.read(TAMANO_LECTURA_VERIFICACION), b''):
+                                    member_hash.update(block)
+                                    if content is not None:
+                                        content += block
+                                    elif name == MIEMBRO_BASE_DATOS:
+                                        database.write(block)
+                            if checksums is not None and checksums.get(name) != member_hash.hexdigest():
+                                return False, f"SHA-256 distinto en {name}"
+                            if content is not None:
+                                data = descomprimir(bytes(content), chunks['codec'])
+                                database_hash.update(data)
+                                database.write(data)
+                    
+                    if chunks and database_hash.hexdigest() != chunks['sha256']:
+                        return False, "La base de datos no coincide con su SHA-256"
+                    
+                    # Un incremental se reconstruye con su respaldo completo base
+                    if MIEMBRO_DIFERENCIAS in names:
+                        base_path = os.path.join(os.path.dirname(backup_path), metadata['base_backup'])
+                        if not os.path.exists(base_path):
+                            return False, f"Falta el respaldo base: {metadata['base_backup']}"
+                        self._extract_database(backup_path, zipf, metadata, database_path)
+                    
+                    valid, message = verificar_integridad(database_path)
+                    if not valid:
+                        return False, f"integrity_check: {message}"
                 
-                if missing_files:
-                    return False, f"Archivos faltantes: {missing_files}"
+                # Documentos del almacén de blobs
+                if MIEMBRO_MANIFIESTO in names:
+                    manifest = json.loads(zipf.read(MIEMBRO_MANIFIESTO).decode('utf-8'))
+                    for entry in manifest['files']:
+                        blob = self.blob_store.ruta_blob(entry['hash'])
+                        if not os.path.exists(blob):
+                            return False, f"Falta el documento {entry['root']}/{entry['path']}"
+                        if check_blobs and self.blob_store.hash_blob(entry['hash']) != entry['hash']:
+                            return False, f"Documento dañado: {entry['root']}/{entry['path']}"
                 
                 return True, "Respaldo íntegro"
                 
         except Exception as e:
             return False, f"Error al verificar respaldo: {e}"
     
+    def verify_all_backups(self, check_blobs=False):
+        """
+        Verificar todos los respaldos conservados
+        
+        Returns:
+            list: Un diccionario por respaldo con 'filename', 'valid' y 'message'
+        """
+        results = []
+        for backup in self.list_backups():
+            valid, message = self.verify_backup(backup['path'], check_blobs)
+            results.append({'filename': backup['filename'], 'valid': valid, 'message': message})
+        return results
+    
     def export_backup_report(self, output_path=None):
         """Exportar reporte de respaldos en formato JSON"""
         if not output_path:
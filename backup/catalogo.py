@@ -0,0 +1,149 @@
+# backup/catalogo.py
+"""
+Catálogo de respaldos: metadatos y documentos referenciados de cada ZIP en un solo archivo JSON
+"""
+
+import json
+import os
+import threading
+import zipfile
+
+MIEMBRO_METADATOS = "backup_metadata.json"
+
+# Manifiesto con la ruta y el hash de cada documento guardado en el almacén de blobs
+MIEMBRO_MANIFIESTO = "documents/manifest.json"
+
+# Campos de los metadatos que no se copian al catálogo (solo los usa la verificación)
+CAMPOS_EXCLUIDOS = ('checksums',)
+
+
+def leer_respaldo(ruta):
+    """
+    Leer del ZIP lo que guarda el catálogo
+
+    Returns:
+        tuple: (metadatos o None, lista de hashes del manifiesto o None si no se pudo leer)
+    """
+    try:
+        with zipfile.ZipFile(ruta, 'r') as zipf:
+            nombres = zipf.namelist()
+            metadatos = None
+            if MIEMBRO_METADATOS in nombres:
+                metadatos = json.loads(zipf.read(MIEMBRO_METADATOS).decode('utf-8'))
+            blobs = []
+            if MIEMBRO_MANIFIESTO in nombres:
+                manifiesto = json.loads(zipf.read(MIEMBRO_MANIFIESTO).decode('utf-8'))
+                blobs = sorted({entrada['hash'] for entrada in manifiesto['files']})
+            return metadatos, blobs
+    except Exception as e:
+        print(f"Error al leer respaldo {os.path.basename(ruta)}: {e}")
+        return None, None
+
+
+class CatalogoRespaldos:
+    """
+    Índice persistente de los respaldos de una carpeta
+
+    Se actualiza al crear y al eliminar respaldos. Al leerlo se compara con el listado
+    de la carpeta (nombre, tamaño y fecha de modificación): solo se abren los ZIP
+    agregados o cambiados a mano y se olvidan los que ya no existen.
+    """
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+        self.ruta = os.path.join(directorio, ".catalogo_respaldos.json")
+        self._lock = threading.Lock()
+
+    def respaldos(self):
+        """
+        Entradas del catálogo sincronizadas con la carpeta
+
+        Returns:
+            dict: nombre de archivo -> {'size', 'mtime_ns', 'created', 'modified', 'metadata', 'blobs'}
+        """
+        with self._lock:
+            entradas = self._cargar()
+            if self._sincronizar(entradas):
+                self._guardar(entradas)
+            return entradas
+
+    def registrar(self, ruta, metadatos, blobs):
+        """Agregar o reemplazar un respaldo recién creado"""
+        with self._lock:
+            entradas = self._cargar()
+            entradas[os.path.basename(ruta)] = self._entrada(os.stat(ruta), metadatos, blobs)
+            self._guardar(entradas)
+
+    def quitar(self, nombre):
+        """Olvidar un respaldo eliminado"""
+        with self._lock:
+            entradas = self._cargar()
+            if entradas.pop(nombre, None) is not None:
+                self._guardar(entradas)
+
+    def reconstruir(self):
+        """
+        Volver a leer todos los ZIP de la carpeta
+
+        Returns:
+            int: Respaldos en el catálogo
+        """
+        with self._lock:
+            entradas = {}
+            self._sincronizar(entradas)
+            self._guardar(entradas)
+            return len(entradas)
+
+    def _sincronizar(self, entradas):
+        """Agregar los ZIP nuevos o cambiados y quitar los que ya no existen; indica si hubo cambios"""
+        if not os.path.isdir(self.directorio):
+            cambios = bool(entradas)
+            entradas.clear()
+            return cambios
+
+        cambios = False
+        encontrados = set()
+        with os.scandir(self.directorio) as archivos:
+            for archivo in archivos:
+                if not archivo.name.endswith('.zip') or not archivo.is_file():
+                    continue
+                encontrados.add(archivo.name)
+                estado = archivo.stat()
+                entrada = entradas.get(archivo.name)
+                if entrada and entrada['size'] == estado.st_size and entrada['mtime_ns'] == estado.st_mtime_ns:
+                    continue
+                metadatos, blobs = leer_respaldo(archivo.path)
+                entradas[archivo.name] = self._entrada(estado, metadatos, blobs)
+                cambios = True
+
+        for nombre in [nombre for nombre in entradas if nombre not in encontrados]:
+            del entradas[nombre]
+            cambios = True
+        return cambios
+
+    def _entrada(self, estado, metadatos, blobs):
+        if metadatos is not None:
+            metadatos = {clave: valor for clave, valor in metadatos.items() if clave not in CAMPOS_EXCLUIDOS}
+        return {
+            'size': estado.st_size,
+            'mtime_ns': estado.st_mtime_ns,
+            'created': estado.st_ctime,
+            'modified': estado.st_mtime,
+            'metadata': metadatos,
+            'blobs': blobs
+        }
+
+    def _cargar(self):
+        try:
+            with open(self.ruta, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _guardar(self, entradas):
+        if not os.path.isdir(self.directorio):
+            return
+        temporal = f"{self.ruta}.{threading.get_ident()}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(entradas, f, ensure_ascii=False)
+        os.replace(temporal, self.ruta)
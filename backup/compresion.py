@@ -0,0 +1,93 @@
+# backup/compresion.py
+"""
+Compresión por bloques en paralelo (deflate o zstd) y resúmenes SHA-256 para los respaldos
+"""
+
+import hashlib
+import os
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# zstd es opcional: si el paquete no está instalado se usa deflate
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DEFLATE = 'deflate'
+ZSTD = 'zstd'
+
+# Tamaño de cada bloque que se comprime por separado
+TAMANO_BLOQUE = 4 * 1024 * 1024
+
+
+def codec_disponible(codec):
+    """Indica si el codec se puede usar en esta instalación"""
+    return codec == DEFLATE or (codec == ZSTD and zstandard is not None)
+
+
+def elegir_codec(codec):
+    """El codec pedido, o deflate si no está disponible"""
+    return codec if codec_disponible(codec) else DEFLATE
+
+
+def comprimir(datos, codec, nivel):
+    """Comprimir un bloque (zlib y zstandard liberan el GIL mientras trabajan)"""
+    if codec == ZSTD:
+        return zstandard.ZstdCompressor(level=nivel).compress(datos)
+    return zlib.compress(datos, nivel)
+
+
+def descomprimir(datos, codec):
+    """Descomprimir un bloque escrito por comprimir()"""
+    if codec == ZSTD:
+        if zstandard is None:
+            raise RuntimeError("El respaldo usa zstd y el paquete 'zstandard' no está instalado")
+        return zstandard.ZstdDecompressor().decompress(datos)
+    return zlib.decompress(datos)
+
+
+def comprimir_bloques(ruta, codec, nivel, procesos=None, tamano_bloque=TAMANO_BLOQUE):
+    """
+    Leer un archivo por bloques y comprimirlos en varios hilos, conservando el orden
+
+    Solo hay en memoria unos pocos bloques por hilo, así el consumo no depende del
+    tamaño del archivo.
+
+    Args:
+        ruta: Archivo a comprimir
+        codec: DEFLATE o ZSTD
+        nivel: Nivel de compresión
+        procesos: Hilos de compresión (por defecto uno por núcleo)
+        tamano_bloque: Bytes por bloque
+
+    Yields:
+        tuple: (bloque comprimido, bloque original)
+    """
+    procesos = procesos or os.cpu_count() or 1
+    with open(ruta, 'rb') as archivo, ThreadPoolExecutor(max_workers=procesos) as executor:
+        pendientes = deque()
+        for bloque in iter(lambda: archivo.read(tamano_bloque), b''):
+            pendientes.append((executor.submit(comprimir, bloque, codec, nivel), bloque))
+            if len(pendientes) >= procesos * 2:
+                futuro, original = pendientes.popleft()
+                yield futuro.result(), original
+        while pendientes:
+            futuro, original = pendientes.popleft()
+            yield futuro.result(), original
+
+
+class SalidaConResumen:
+    """Archivo de escritura que calcula el SHA-256 de lo que se escribe"""
+
+    def __init__(self, destino):
+        self.destino = destino
+        self.sha256 = hashlib.sha256()
+
+    def write(self, datos):
+        self.sha256.update(datos)
+        return self.destino.write(datos)
+
+    def hexdigest(self):
+        return self.sha256.hexdigest()
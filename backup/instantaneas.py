@@ -0,0 +1,147 @@
+# backup/instantaneas.py
+"""
+Instantáneas consistentes de la base de datos SQLite: copia en línea y diferencias por página
+"""
+
+import hashlib
+import sqlite3
+import struct
+
+# Páginas que copia cada paso de la API de respaldo (el bloqueo de lectura dura solo un paso)
+PAGINAS_POR_PASO = 256
+
+# Segundos de pausa entre pasos, para que la aplicación pueda escribir mientras tanto
+PAUSA_ENTRE_PASOS = 0.005
+
+# Cada página cambiada se guarda como número de página (4 bytes) seguido de su contenido
+_NUMERO_PAGINA = struct.Struct('>I')
+
+# Bytes del resumen de cada página (solo se comparan páginas del mismo archivo)
+TAMANO_RESUMEN_PAGINA = 16
+
+
+def copiar_en_linea(origen, destino, paginas=PAGINAS_POR_PASO, pausa=PAUSA_ENTRE_PASOS):
+    """
+    Copiar la base de datos con sqlite3.Connection.backup mientras la aplicación la usa
+
+    La copia refleja un solo instante (incluye lo que todavía está en el WAL) y se
+    hace por pasos de `paginas` páginas; si otra conexión escribe entre pasos, SQLite
+    reinicia la copia, así el resultado nunca queda a medias.
+
+    Args:
+        origen: Ruta de la base de datos en uso
+        destino: Ruta del archivo de la instantánea (se sobrescribe)
+        paginas: Páginas por paso
+        pausa: Segundos entre pasos
+    """
+    fuente = sqlite3.connect(origen, timeout=10)
+    try:
+        copia = sqlite3.connect(destino)
+        try:
+            fuente.backup(copia, pages=paginas, sleep=pausa)
+            # La instantánea debe ser un solo archivo, sin depender de un -wal
+            copia.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            copia.close()
+    finally:
+        fuente.close()
+
+
+def tamano_pagina(ruta):
+    """Tamaño de página de un archivo SQLite, leído de su encabezado"""
+    with open(ruta, 'rb') as archivo:
+        encabezado = archivo.read(18)
+    tamano = int.from_bytes(encabezado[16:18], 'big')
+    # El valor 1 representa páginas de 65536 bytes
+    return 65536 if tamano == 1 else tamano
+
+
+def resumenes_paginas(ruta, tamano):
+    """Resumen BLAKE2b de cada página del archivo, concatenados en un solo bytes"""
+    resumenes = bytearray()
+    with open(ruta, 'rb') as archivo:
+        for pagina in iter(lambda: archivo.read(tamano), b''):
+            resumenes += hashlib.blake2b(pagina, digest_size=TAMANO_RESUMEN_PAGINA).digest()
+    return bytes(resumenes)
+
+
+def escribir_diferencias(ruta, resumenes_base, tamano, salida):
+    """
+    Escribir las páginas que cambiaron respecto a la instantánea base
+
+    Args:
+        ruta: Instantánea actual
+        resumenes_base: resumenes_paginas() de la instantánea base
+        tamano: Tamaño de página (debe ser el mismo de la base)
+        salida: Archivo binario abierto para escritura
+
+    Returns:
+        tuple: (páginas cambiadas, páginas totales)
+    """
+    paginas_base = len(resumenes_base) // TAMANO_RESUMEN_PAGINA
+    cambiadas = 0
+    total = 0
+    with open(ruta, 'rb') as archivo:
+        for numero, pagina in enumerate(iter(lambda: archivo.read(tamano), b'')):
+            total += 1
+            if numero < paginas_base:
+                inicio = numero * TAMANO_RESUMEN_PAGINA
+                resumen = hashlib.blake2b(pagina, digest_size=TAMANO_RESUMEN_PAGINA).digest()
+                if resumen == resumenes_base[inicio:inicio + TAMANO_RESUMEN_PAGINA]:
+                    continue
+            salida.write(_NUMERO_PAGINA.pack(numero))
+            salida.write(pagina)
+            cambiadas += 1
+    return cambiadas, total
+
+
+def aplicar_diferencias(entrada, destino, tamano, paginas_totales):
+    """
+    Aplicar sobre una copia de la base las páginas escritas por escribir_diferencias
+
+    Args:
+        entrada: Archivo binario abierto con las diferencias
+        destino: Copia de la instantánea base (se modifica en el lugar)
+        tamano: Tamaño de página
+        paginas_totales: Páginas de la instantánea diferencial (recorta si la base era mayor)
+    """
+    with open(destino, 'r+b') as archivo:
+        while True:
+            numero = entrada.read(_NUMERO_PAGINA.size)
+            if not numero:
+                break
+            pagina = entrada.read(tamano)
+            if len(numero) != _NUMERO_PAGINA.size or len(pagina) != tamano:
+                raise ValueError("Diferencias de respaldo incompletas")
+            archivo.seek(_NUMERO_PAGINA.unpack(numero)[0] * tamano)
+            archivo.write(pagina)
+        archivo.truncate(paginas_totales * tamano)
+
+
+def vaciar_wal(ruta):
+    """Pasar el WAL de la base de datos al archivo principal y dejarlo vacío"""
+    conn = sqlite3.connect(ruta, timeout=10)
+    try:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+
+
+def verificar_integridad(ruta):
+    """
+    Ejecutar PRAGMA integrity_check sobre una base de datos
+
+    Returns:
+        tuple: (bool, mensaje)
+    """
+    try:
+        conn = sqlite3.connect(ruta)
+        try:
+            resultado = [fila[0] for fila in conn.execute("PRAGMA integrity_check")]
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError as e:
+        return False, str(e)
+    if resultado == ["ok"]:
+        return True, "ok"
+    return False, "; ".join(resultado[:5])
@@ -0,0 +1,106 @@
+# backup/retencion.py
+"""
+Política de retención de respaldos: últimos N, niveles por hora, día, semana y mes, fijados y límite de espacio
+"""
+
+from datetime import datetime
+
+# Nivel -> formato de fecha que identifica su periodo (un respaldo por periodo, el más reciente)
+NIVELES = {
+    'hourly': "%Y-%m-%d %H",
+    'daily': "%Y-%m-%d",
+    'weekly': "%G-W%V",
+    'monthly': "%Y-%m",
+}
+
+
+def fecha_respaldo(respaldo):
+    """Fecha en que se tomó un respaldo (la de sus metadatos o la del archivo)"""
+    fecha = (respaldo.get('metadata') or {}).get('backup_date')
+    if fecha:
+        try:
+            return datetime.fromisoformat(fecha)
+        except ValueError:
+            pass
+    return respaldo['created']
+
+
+def _bases_requeridas(respaldos, nombres):
+    """Respaldos completos de los que dependen los incrementales indicados"""
+    bases = set()
+    for respaldo in respaldos:
+        if respaldo['filename'] in nombres:
+            base = (respaldo.get('metadata') or {}).get('base_backup')
+            if base:
+                bases.add(base)
+    return bases
+
+
+def planear_retencion(respaldos, ultimos=10, niveles=None, fijados=(), tamano_maximo=0):
+    """
+    Decidir qué respaldos conservar
+
+    Se conserva el más reciente de cada periodo hasta llenar cada nivel, los
+    `ultimos` más recientes, los fijados (por prefijo del nombre) y los respaldos
+    completos que necesitan los incrementales conservados. Si los conservados
+    ocupan más de `tamano_maximo` bytes se descartan los más antiguos que no estén
+    fijados; el más reciente nunca se descarta.
+
+    Args:
+        respaldos: Lista de list_backups() (filename, size, created y metadata)
+        ultimos: Respaldos más recientes que siempre se conservan
+        niveles: dict nivel -> número de periodos ('hourly', 'daily', 'weekly', 'monthly')
+        fijados: Prefijos de nombre que nunca se eliminan (por ejemplo 'pre_restore_safety')
+        tamano_maximo: Bytes máximos de los respaldos conservados (0 = sin límite)
+
+    Returns:
+        dict: 'keep' (nombre -> motivos), 'delete' (nombres, del más antiguo al más reciente)
+              y 'freed' (bytes que se liberan)
+    """
+    ordenados = sorted(respaldos, key=fecha_respaldo, reverse=True)
+    motivos = {respaldo['filename']: [] for respaldo in ordenados}
+
+    for respaldo in ordenados[:ultimos]:
+        motivos[respaldo['filename']].append('last')
+
+    for nivel, cantidad in (niveles or {}).items():
+        formato = NIVELES[nivel]
+        periodos = set()
+        for respaldo in ordenados:
+            if len(periodos) >= cantidad:
+                break
+            periodo = fecha_respaldo(respaldo).strftime(formato)
+            if periodo not in periodos:
+                periodos.add(periodo)
+                motivos[respaldo['filename']].append(nivel)
+
+    for respaldo in ordenados:
+        if any(respaldo['filename'].startswith(prefijo) for prefijo in fijados):
+            motivos[respaldo['filename']].append('pinned')
+
+    conservados = {nombre for nombre, razones in motivos.items() if razones}
+
+    # Límite de espacio: descartar los más antiguos que no estén fijados
+    if tamano_maximo and ordenados:
+        tamanos = {respaldo['filename']: respaldo['size'] for respaldo in ordenados}
+        for respaldo in reversed(ordenados[1:]):
+            nombre = respaldo['filename']
+            if sum(tamanos.get(n, 0) for n in conservados | _bases_requeridas(ordenados, conservados)) <= tamano_maximo:
+                break
+            if nombre in conservados and 'pinned' not in motivos[nombre]:
+                conservados.discard(nombre)
+                motivos[nombre] = []
+
+    # Un incremental conservado necesita su respaldo completo base
+    for base in _bases_requeridas(ordenados, conservados):
+        if base in motivos:
+            if base not in conservados:
+                motivos[base].append('base')
+            conservados.add(base)
+
+    eliminar = [respaldo for respaldo in reversed(ordenados) if respaldo['filename'] not in conservados]
+    return {
+        'keep': {nombre: motivos[nombre] for nombre in motivos if nombre in conservados},
+        'delete': [respaldo['filename'] for respaldo in eliminar],
+        'freed': sum(respaldo['size'] for respaldo in eliminar)
+    }
@@ -0,0 +1,35 @@
+"""
+Script para ver (y aplicar) qué respaldos conserva o elimina la política de retención
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backup.backup_manager import BackupManager
+
+def revisar(aplicar=False):
+    """Mostrar el plan de retención y opcionalmente eliminar los respaldos descartados"""
+    manager = BackupManager()
+    plan = manager.apply_retention(dry_run=not aplicar)
+
+    for filename, motivos in sorted(plan['keep'].items()):
+        print(f"✓ Conservar {filename} ({', '.join(motivos)})")
+    for filename in plan['delete']:
+        print(f"✗ Eliminar {filename}")
+
+    liberados = round(plan['freed'] / (1024 * 1024), 2)
+    print(f"\n{len(plan['keep'])} conservados, {len(plan['delete'])} a eliminar ({liberados} MB)")
+    return plan
+
+if __name__ == "__main__":
+    print("=== Retención de respaldos ===\n")
+
+    aplicar = "--aplicar" in sys.argv
+    revisar(aplicar)
+
+    if aplicar:
+        print("\n=== Retención aplicada ===")
+    else:
+        print("\n=== Vista previa (use --aplicar para eliminar) ===")
@@ -4,18 +4,53 @@ Programador automático de respaldos
 """
 
 import threading
-import time
-import schedule
-from datetime import datetime
+from datetime import datetime, timedelta
+from sqlalchemy import event
 from backup.backup_manager import BackupManager
+from database.models import SessionLocal
+from database.contador_escrituras import leer_escrituras_pendientes
+
+# Día de la semana (en inglés o en español, con o sin acento) -> número de datetime.weekday()
+DIAS_SEMANA = {
+    'monday': 0, 'lunes': 0,
+    'tuesday': 1, 'martes': 1,
+    'wednesday': 2, 'miercoles': 2, 'miércoles': 2,
+    'thursday': 3, 'jueves': 3,
+    'friday': 4, 'viernes': 4,
+    'saturday': 5, 'sabado': 5, 'sábado': 5,
+    'sunday': 6, 'domingo': 6
+}
+
+# Motivos de un respaldo automático (forman parte del nombre del archivo)
+SEMANAL = 'semanal'
+CAMBIOS = 'cambios'
+INACTIVIDAD = 'inactividad'
+
+# Segundos máximos de espera; acota el retraso si el equipo estuvo suspendido o cambió la hora
+ESPERA_MAXIMA = 3600
+
+# Segundos antes de volver a intentar un respaldo automático que falló
+ESPERA_REINTENTO = 300
 
 
 class BackupScheduler:
+    """
+    Respaldos automáticos en un solo hilo que duerme hasta el siguiente respaldo
+
+    Hay dos disparadores: el horario semanal (se omite si no hubo escrituras desde el
+    último respaldo) y los cambios en los datos, leídos del contador de escrituras:
+    al llegar a `change_backup_threshold` escrituras pendientes, o cuando pasan
+    `change_backup_quiet_minutes` minutos sin escribir con escrituras pendientes.
+    Cada commit de la aplicación despierta al hilo para recalcular la espera.
+    """
+
     def __init__(self):
         self.backup_manager = BackupManager()
         self.scheduler_thread = None
         self.running = False
         self.stop_event = threading.Event()
+        self.wake_event = threading.Event()
+        self.next_weekly_run = None
 
         # Cargar configuración de horario desde BackupManager
         self.load_schedule_config()
@@ -43,28 +78,18 @@ class BackupScheduler:
         if time_str:
             self.backup_time = time_str
 
-        # Configurar el horario de respaldo según el día especificado
-        day_methods = {
-            'Lunes': schedule.every().monday,
-            'Martes': schedule.every().tuesday,
-            'Miercoles': schedule.every().wednesday,
-            'Jueves': schedule.every().thursday,
-            'Viernes': schedule.every().friday,
-            'Sabado': schedule.every().saturday,
-            'Domingo': schedule.every().sunday
-        }
-
-        if self.backup_day in day_methods:
-            day_methods[self.backup_day].at(self.backup_time).do(self.run_automatic_backup)
-        else:
-            # Por defecto usar sábado si el día no es válido
-            schedule.every().friday.at(self.backup_time).do(self.run_automatic_backup)
+        self.next_weekly_run = self._next_weekly_run(datetime.now())
 
         self.running = True
-        self.stop_event.clear()
+        # Evento nuevo por hilo: uno anterior que siga en un respaldo termina al acabar
+        self.stop_event = threading.Event()
+        self.wake_event.clear()
+
+        # Cada escritura confirmada puede adelantar el siguiente respaldo
+        event.listen(SessionLocal, "after_commit", self._on_commit)
 
         # Ejecutar el scheduler en un hilo separado
-        self.scheduler_thread = threading.Thread(target=self._run_scheduler, daemon=True)
+        self.scheduler_thread = threading.Thread(target=self._run_scheduler, args=(self.stop_event,), daemon=True)
         self.scheduler_thread.start()
 
     def stop_scheduler(self):
@@ -74,58 +99,115 @@ class BackupScheduler:
 
         self.running = False
         self.stop_event.set()
+        self.wake_event.set()
 
-        # Limpiar trabajos programados
-        schedule.clear()
+        if event.contains(SessionLocal, "after_commit", self._on_commit):
+            event.remove(SessionLocal, "after_commit", self._on_commit)
 
         if self.scheduler_thread and self.scheduler_thread.is_alive():
             self.scheduler_thread.join(timeout=0.5)
 
+    def _on_commit(self, session):
+        """Despertar al hilo del scheduler después de un commit"""
+        self.wake_event.set()
 
-    def _run_scheduler(self):
-        """Ejecutar el loop del scheduler en hilo separado"""
-        while self.running and not self.stop_event.is_set():
+    def _next_weekly_run(self, after):
+        """Siguiente fecha del horario semanal posterior a `after`"""
+        weekday = DIAS_SEMANA.get(self.backup_day.lower(), DIAS_SEMANA['saturday'])
+        try:
+            hour, minute = (int(part) for part in self.backup_time.split(":"))
+        except ValueError:
+            hour, minute = 12, 0
+
+        run = after.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        run += timedelta(days=(weekday - after.weekday()) % 7)
+        if run <= after:
+            run += timedelta(days=7)
+        return run
+
+    def _next_change_run(self, now, pending, last_write):
+        """Fecha del respaldo por cambios (None si no hay escrituras pendientes)"""
+        config = self.backup_manager.config
+        total = sum(pending.values())
+        if not config.get('change_backup_enabled', True) or total <= 0:
+            return None, None
+        if total >= config.get('change_backup_threshold', 25):
+            return now, CAMBIOS
+        if last_write:
+            return last_write + timedelta(minutes=config.get('change_backup_quiet_minutes', 30)), INACTIVIDAD
+        return None, None
+
+    def _run_scheduler(self, stop_event):
+        """Dormir hasta el siguiente respaldo (o hasta un commit) y ejecutarlo"""
+        while not stop_event.is_set():
             try:
-                schedule.run_pending()
-                time.sleep(60)  # Verificar cada minuto
+                timeout = self._run_pending(datetime.now())
             except Exception as e:
                 print(f"Error en el scheduler: {e}")
-                time.sleep(60)
+                timeout = ESPERA_REINTENTO
 
-    def run_automatic_backup(self):
-        """Ejecutar respaldo automático"""
-        try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_name = f"auto_backup_sabado_{timestamp}"
+            self.wake_event.wait(min(timeout, ESPERA_MAXIMA))
+            self.wake_event.clear()
 
-            print(f"Iniciando respaldo automático: {backup_name}")
+    def _run_pending(self, now):
+        """
+        Ejecutar el respaldo que toque ahora
 
-            # Ejecutar respaldo en un hilo separado para no bloquear el scheduler
-            backup_thread = threading.Thread(
-                target=self._create_backup_threaded,
-                args=(backup_name,),
-                daemon=True
-            )
-            backup_thread.start()
+        Returns:
+            float: Segundos hasta el siguiente respaldo
+        """
+        pending, last_write = leer_escrituras_pendientes(self.backup_manager.db_path)
+
+        if now >= self.next_weekly_run:
+            self.next_weekly_run = self._next_weekly_run(now)
+            # Sin escrituras desde el último respaldo no hace falta otro
+            if pending and sum(pending.values()) == 0:
+                print("Respaldo semanal omitido: no hay cambios desde el último respaldo")
+            elif not self.run_automatic_backup(SEMANAL):
+                return ESPERA_REINTENTO
+            pending, last_write = leer_escrituras_pendientes(self.backup_manager.db_path)
+
+        change_run, reason = self._next_change_run(now, pending, last_write)
+        if change_run and change_run <= now:
+            if not self.run_automatic_backup(reason):
+                return ESPERA_REINTENTO
+            pending, last_write = leer_escrituras_pendientes(self.backup_manager.db_path)
+            change_run, reason = self._next_change_run(datetime.now(), pending, last_write)
+
+        next_run = min(run for run in (self.next_weekly_run, change_run) if run)
+        return max((next_run - datetime.now()).total_seconds(), 0)
+
+    def run_automatic_backup(self, reason=SEMANAL):
+        """
+        Ejecutar respaldo automático (en el hilo del scheduler)
 
-        except Exception as e:
-            print(f"Error al ejecutar respaldo automático: {e}")
+        Returns:
+            bool: True si el respaldo se creó
+        """
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        backup_name = f"auto_backup_{reason}_{timestamp}"
+
+        print(f"Iniciando respaldo automático: {backup_name}")
+        incremental = self.backup_manager.config.get('incremental_enabled', True)
+        return self._create_backup_threaded(backup_name, incremental)
 
-    def _create_backup_threaded(self, backup_name):
-        """Crear respaldo en hilo separado"""
+    def _create_backup_threaded(self, backup_name, incremental=False):
+        """Crear respaldo (los manuales se crean en un hilo separado)"""
         try:
-            backup_path = self.backup_manager.create_backup(backup_name)
+            backup_path = self.backup_manager.create_backup(backup_name, incremental=incremental)
             print(f"Respaldo automático completado exitosamente: {backup_path}")
+            return True
         except Exception as e:
             print(f"Error al crear respaldo automático: {e}")
+            return False
 
     def get_next_backup_time(self):
         """Obtener la hora del próximo respaldo programado"""
-        jobs = schedule.get_jobs()
-        if jobs:
-            next_job = min(jobs, key=lambda job: job.next_run)
-            return next_job.next_run
-        return None
+        if not self.running:
+            return None
+        pending, last_write = leer_escrituras_pendientes(self.backup_manager.db_path)
+        change_run, _ = self._next_change_run(datetime.now(), pending, last_write)
+        return min(run for run in (self.next_weekly_run, change_run) if run)
 
     def is_running(self):
         """Verificar si el scheduler está ejecutándose"""
@@ -179,4 +261,4 @@ class BackupScheduler:
             'time': self.backup_time,
             'next_run': self.get_next_backup_time(),
             'is_running': self.is_running()
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,36 @@
+"""
+Script para verificar los respaldos: SHA-256 de cada miembro, integrity_check de la base y documentos
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backup.backup_manager import BackupManager
+
+def verificar(check_blobs=False):
+    """Verificar todos los respaldos y mostrar el resultado de cada uno"""
+    resultados = BackupManager().verify_all_backups(check_blobs)
+
+    if not resultados:
+        print("No hay respaldos para verificar")
+        return True
+
+    for resultado in resultados:
+        marca = "✓" if resultado['valid'] else "✗"
+        print(f"{marca} {resultado['filename']}: {resultado['message']}")
+
+    fallidos = sum(1 for resultado in resultados if not resultado['valid'])
+    print(f"\n{len(resultados)} respaldos verificados, {fallidos} con errores")
+    return fallidos == 0
+
+if __name__ == "__main__":
+    print("=== Verificación de respaldos ===\n")
+
+    # --completo vuelve a calcular el hash de cada documento del almacén de blobs
+    if verificar(check_blobs="--completo" in sys.argv):
+        print("\n=== Todos los respaldos están íntegros ===")
+    else:
+        print("\n=== Hay respaldos con errores ===")
+        sys.exit(1)
@@ -84,7 +84,6 @@ a = Analysis(
         'tkinter.ttk',
         'tkinter.messagebox',
         'tkinter.filedialog',
-        'schedule',
         'threading',
         'json',
         'pathlib',
@@ -236,9 +236,6 @@ a = Analysis(
     ],
     hiddenimports=[
         # Modulos criticos - TODOS listados explicitamente
-        'schedule',
-        'schedule.job',
-
         # SQLAlchemy - completo
         'sqlalchemy',
         'sqlalchemy.dialects',
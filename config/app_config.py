@@ -20,7 +20,9 @@ class AppConfig:
             "database": {
                 "url": "sqlite:///criptas.db",
                 "backup_enabled": True,
-                "backup_schedule": "weekly"
+                "backup_schedule": "weekly",
+                "sqlite_profile": "rendimiento",
+                "sqlite_pragmas": {}  # Sobrescribe valores individuales del perfil
             },
             "parroquia": {
                 "nombre": "Parroquia Nuesta Señora del Consuelo de los Afligidos",
@@ -160,6 +162,11 @@ class AppConfig:
         """Obtener URL de base de datos"""
         return self.get("database", "url", "sqlite:///criptas.db")
     
+    def get_sqlite_profile(self):
+        """Obtener nombre del perfil de SQLite y PRAGMA personalizados"""
+        database = self.get("database", default={})
+        return database.get("sqlite_profile", "rendimiento"), database.get("sqlite_pragmas", {})
+    
     def get_parroquia_info(self):
         """Obtener información de la parroquia"""
         return self.get("parroquia", default={})
@@ -99,6 +99,38 @@ DB_SETTINGS = {
     'POOL_RECYCLE': 3600
 }
 
+# Perfiles de SQLite aplicados como PRAGMA en cada conexión
+SQLITE_PROFILES = {
+    # WAL permite leer (reportes, respaldos) mientras se registran pagos
+    'rendimiento': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 268435456,  # 256 MB
+        'cache_size': -65536,    # 64 MB (valores negativos en KiB)
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000     # milisegundos
+    },
+    'seguro': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'mmap_size': 0,
+        'cache_size': -16384,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 10000
+    },
+    # Valores por defecto de SQLite (diario de reversión)
+    'compatible': {
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL',
+        'mmap_size': 0,
+        'cache_size': -2000,
+        'temp_store': 'DEFAULT',
+        'busy_timeout': 5000
+    }
+}
+
+DEFAULT_SQLITE_PROFILE = 'rendimiento'
+
 # Límites de la aplicación
 LIMITS = {
     'MAX_BENEFICIARIOS': 2,
@@ -0,0 +1,196 @@
+# database/busqueda_fts.py
+"""
+Índice de búsqueda de texto completo (SQLite FTS5) sobre titulares, nichos, ventas, pagos y urnas
+"""
+
+import re
+from sqlalchemy import table, column, select, text, literal_column
+from database.models import engine
+
+TABLA_FTS = "busqueda_fts"
+
+# Tipo de documento -> (tabla, código para el rowid, columnas FTS con su expresión SQL)
+# En las expresiones {t} es la fila de origen: NEW en los triggers o la tabla en el llenado inicial
+DOCUMENTOS = {
+    'cliente': ('clientes', 1, {
+        'nombre': "{t}.nombre",
+        'apellido': "{t}.apellido",
+        'cedula': "{t}.cedula",
+        'telefono': "{t}.telefono",
+        'email': "{t}.email",
+    }),
+    'nicho': ('nichos', 2, {
+        'numero': "{t}.numero",
+        'seccion': "{t}.seccion",
+        'fila': "{t}.fila",
+        'columna': "{t}.columna",
+        'descripcion': "{t}.descripcion",
+        'compacto': "replace({t}.numero, '-', '')",
+    }),
+    'venta': ('ventas', 3, {
+        'numero_contrato': "{t}.numero_contrato",
+        'tipo_pago': "{t}.tipo_pago",
+        'observaciones': "{t}.observaciones",
+        'compacto': "replace({t}.numero_contrato, '-', '')",
+    }),
+    'pago': ('pagos', 4, {
+        'numero_recibo': "{t}.numero_recibo",
+        'metodo_pago': "{t}.metodo_pago",
+        'concepto': "{t}.concepto",
+        'observaciones': "{t}.observaciones",
+        'compacto': "replace({t}.numero_recibo, '-', '')",
+    }),
+    'urna': ('urnas', 5, {
+        'nombre_difunto': "{t}.nombre_difunto",
+        'nombre_depositante': "{t}.nombre_depositante",
+        'nombre_crematorio': "{t}.nombre_crematorio",
+    }),
+}
+
+# Columnas cuyo valor se indexa también sin guiones en la columna compacto
+CAMPOS_CON_COMPACTO = {'numero', 'numero_contrato', 'numero_recibo'}
+
+# El rowid codifica tipo e id para que los triggers borren sin buscar: id * 8 + código
+_MULTIPLICADOR_ROWID = 8
+
+# Columnas indexadas (unión de todos los tipos, en orden estable)
+COLUMNAS_FTS = list(dict.fromkeys(
+    nombre for _, _, columnas in DOCUMENTOS.values() for nombre in columnas
+))
+
+# remove_diacritics 2 hace que "Pérez" y "perez" sean el mismo token
+_SQL_TABLA_FTS = (
+    f"CREATE VIRTUAL TABLE {TABLA_FTS} USING fts5("
+    f"tipo UNINDEXED, ref_id UNINDEXED, {', '.join(COLUMNAS_FTS)}, "
+    f"tokenize=\"unicode61 remove_diacritics 2\")"
+)
+
+# Tabla ligera para construir consultas; queda fuera de Base.metadata a propósito
+busqueda_fts = table(
+    TABLA_FTS,
+    column("rowid"),
+    column("tipo"),
+    column("ref_id"),
+    column("rank"),
+    *[column(nombre) for nombre in COLUMNAS_FTS]
+)
+
+
+def _sql_insertar(tipo, origen):
+    """Columnas y valores de la fila FTS de un documento a partir de la fila de origen"""
+    _, codigo, columnas = DOCUMENTOS[tipo]
+    nombres = ", ".join(["rowid", "tipo", "ref_id", *columnas])
+    valores = ", ".join([
+        f"{origen}.id * {_MULTIPLICADOR_ROWID} + {codigo}",
+        f"'{tipo}'",
+        f"{origen}.id",
+        *[expresion.format(t=origen) for expresion in columnas.values()]
+    ])
+    return nombres, valores
+
+
+def _sql_triggers(tipo):
+    """Sentencias que crean los triggers que mantienen sincronizado un tipo de documento"""
+    tabla, codigo, columnas = DOCUMENTOS[tipo]
+    nombres, valores = _sql_insertar(tipo, "NEW")
+    origen = sorted({c for e in columnas.values() for c in re.findall(r"\{t\}\.(\w+)", e)})
+    borrar = f"DELETE FROM {TABLA_FTS} WHERE rowid = OLD.id * {_MULTIPLICADOR_ROWID} + {codigo};"
+    insertar = f"INSERT INTO {TABLA_FTS}({nombres}) VALUES ({valores});"
+
+    return [
+        f"CREATE TRIGGER {TABLA_FTS}_{tabla}_ai AFTER INSERT ON {tabla} BEGIN {insertar} END",
+        # Solo las columnas indexadas: actualizar saldos o fechas no reescribe el índice
+        f"CREATE TRIGGER {TABLA_FTS}_{tabla}_au AFTER UPDATE OF {', '.join(origen)} ON {tabla} "
+        f"BEGIN {borrar} {insertar} END",
+        f"CREATE TRIGGER {TABLA_FTS}_{tabla}_ad AFTER DELETE ON {tabla} BEGIN {borrar} END",
+    ]
+
+
+def _llenar_indice(conn):
+    """Indexar todas las filas existentes"""
+    for tipo, (tabla, _, _) in DOCUMENTOS.items():
+        nombres, valores = _sql_insertar(tipo, tabla)
+        conn.exec_driver_sql(f"INSERT INTO {TABLA_FTS}({nombres}) SELECT {valores} FROM {tabla}")
+
+
+def crear_indice_busqueda():
+    """Crear la tabla FTS5 y sus triggers; se reconstruye si cambió la definición"""
+    try:
+        with engine.begin() as conn:
+            actual = conn.execute(
+                text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :nombre"),
+                {"nombre": TABLA_FTS}
+            ).scalar()
+
+            reconstruir = actual != _SQL_TABLA_FTS
+            if reconstruir:
+                conn.exec_driver_sql(f"DROP TABLE IF EXISTS {TABLA_FTS}")
+                conn.exec_driver_sql(_SQL_TABLA_FTS)
+
+            # Los triggers se recrean siempre para seguir la definición actual
+            for tipo, (tabla, _, _) in DOCUMENTOS.items():
+                for sufijo in ("ai", "au", "ad"):
+                    conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {TABLA_FTS}_{tabla}_{sufijo}")
+                for sentencia in _sql_triggers(tipo):
+                    conn.exec_driver_sql(sentencia)
+
+            if reconstruir:
+                _llenar_indice(conn)
+                print("Índice de búsqueda de texto completo reconstruido")
+    except Exception as e:
+        print(f"Error al crear el índice de búsqueda: {str(e)}")
+
+
+def reconstruir_indice_busqueda():
+    """Vaciar el índice y volver a indexar todas las filas"""
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"DELETE FROM {TABLA_FTS}")
+        _llenar_indice(conn)
+        conn.exec_driver_sql(f"INSERT INTO {TABLA_FTS}({TABLA_FTS}) VALUES ('optimize')")
+
+
+def expresion_busqueda(termino, campos=None):
+    """
+    Convertir el texto del usuario en una expresión MATCH de prefijos
+
+    Args:
+        termino: Texto escrito en la caja de búsqueda
+        campos: Columna o lista de columnas FTS a las que se limita la búsqueda (opcional)
+
+    Returns:
+        str: Expresión FTS5 o None si el texto no tiene palabras
+    """
+    palabras = re.findall(r"\w+", termino or "")
+    if not palabras:
+        return None
+
+    # Cada palabra entre comillas evita que el usuario escriba operadores FTS sin querer
+    expresion = " ".join(f'"{palabra}"*' for palabra in palabras)
+    if campos:
+        if isinstance(campos, str):
+            campos = [campos]
+        # Los números con guiones también se buscan sin ellos ("A1" encuentra "A-1")
+        if any(campo in CAMPOS_CON_COMPACTO for campo in campos):
+            campos = [*campos, 'compacto']
+        expresion = f"{{{' '.join(campos)}}} : ({expresion})"
+    return expresion
+
+
+def _condicion_match(expresion):
+    """Condición MATCH sobre la tabla FTS completa"""
+    return literal_column(TABLA_FTS).op("MATCH")(expresion)
+
+
+def ids_coincidentes(tipo, expresion):
+    """Subconsulta con los ids de un tipo de documento que coinciden con la expresión"""
+    return select(busqueda_fts.c.ref_id).where(
+        busqueda_fts.c.tipo == tipo, _condicion_match(expresion)
+    )
+
+
+def coincidencias(tipo, expresion):
+    """Subconsulta con id y relevancia (bm25, menor es mejor) de los documentos que coinciden"""
+    return select(
+        busqueda_fts.c.ref_id.label("ref_id"),
+        busqueda_fts.c.rank.label("relevancia")
+    ).where(busqueda_fts.c.tipo == tipo, _condicion_match(expresion)).subquery()
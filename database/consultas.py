@@ -0,0 +1,519 @@
+# database/consultas.py
+"""
+Consultas de listados que devuelven filas planas en un solo viaje a la base de datos
+"""
+
+from datetime import datetime
+from sqlalchemy import select, func, and_, or_, false, event, literal, case, union_all, literal_column, Integer
+from sqlalchemy.orm import aliased
+from database.models import engine, get_db_session, normalizar_texto, normalizar_codigo, Cliente, Nicho, Venta, Pago, Beneficiario, Urna
+from database.busqueda_fts import expresion_busqueda, ids_coincidentes
+from database.documentos import TITULO, condicion_documento
+
+# Mayor carácter posible: cierra el rango de una búsqueda por prefijo
+_FIN_PREFIJO = "\U0010ffff"
+
+# Nombre completo calculado en SQL para no cargar el objeto Cliente
+_cliente_nombre = (Cliente.nombre + " " + Cliente.apellido).label("cliente_nombre")
+
+
+# Filas que se piden a SQLite por lote al recorrer un reporte completo
+TAMANO_LOTE_REPORTES = 1000
+
+
+def condicion_prefijo(columna, prefijo):
+    """Rango equivalente a LIKE 'prefijo%' que SQLite resuelve con una búsqueda en el índice"""
+    return and_(columna >= prefijo, columna < prefijo + _FIN_PREFIJO)
+
+
+def filtro_nombre_cliente(termino):
+    """Titulares cuyo nombre o apellido normalizado empieza con el término ("Nunez" -> "Núñez")"""
+    texto = normalizar_texto(termino) or ""
+    condiciones = [
+        condicion_prefijo(Cliente.nombre_normalizado, texto),
+        condicion_prefijo(Cliente.apellido_normalizado, texto)
+    ]
+    # "juan perez": primera palabra en el nombre y el resto en el apellido
+    palabras = texto.split(" ", 1)
+    if len(palabras) == 2:
+        condiciones.append(and_(
+            condicion_prefijo(Cliente.nombre_normalizado, palabras[0]),
+            condicion_prefijo(Cliente.apellido_normalizado, palabras[1])
+        ))
+    return or_(*condiciones)
+
+
+def filtro_numero_nicho(termino):
+    """Nichos cuyo número normalizado empieza con el término ("a1" -> "A-1", "A-10")"""
+    return condicion_prefijo(Nicho.numero_normalizado, normalizar_codigo(termino) or "")
+
+
+def filtro_nombre_difunto(termino):
+    """Urnas cuyo nombre de difunto normalizado empieza con el término"""
+    return condicion_prefijo(Urna.nombre_difunto_normalizado, normalizar_texto(termino) or "")
+
+
+def _filtro_fts(termino, *condiciones):
+    """OR de subconsultas FTS: cada condición es (columna de id, tipo de documento)"""
+    expresion = expresion_busqueda(termino)
+    if expresion is None:
+        return false()
+    return or_(*[columna.in_(ids_coincidentes(tipo, expresion)) for columna, tipo in condiciones])
+
+
+def filtro_busqueda_ventas(termino):
+    """Condición de búsqueda de ventas por contrato, titular, cédula o nicho"""
+    return _filtro_fts(
+        termino,
+        (Venta.id, 'venta'),
+        (Venta.cliente_id, 'cliente'),
+        (Venta.nicho_id, 'nicho')
+    )
+
+
+def filtro_busqueda_pagos(termino):
+    """Condición de búsqueda de pagos por recibo, concepto, contrato o titular"""
+    return _filtro_fts(
+        termino,
+        (Pago.id, 'pago'),
+        (Pago.venta_id, 'venta'),
+        (Venta.cliente_id, 'cliente')
+    )
+
+
+def filtro_busqueda_nichos(termino):
+    """Condición de búsqueda de nichos por número, ubicación o descripción"""
+    return _filtro_fts(termino, (Nicho.id, 'nicho'))
+
+
+def filtro_busqueda_urnas(termino):
+    """Condición de búsqueda de urnas por difunto, depositante, crematorio o nicho"""
+    # Todas las condiciones son sobre columnas de urnas: SQLite resuelve el OR con un índice por condición
+    expresion = expresion_busqueda(termino)
+    if expresion is None:
+        return filtro_nombre_difunto(termino)
+    ventas_nicho = select(Venta.id).where(Venta.nicho_id.in_(ids_coincidentes('nicho', expresion)))
+    return or_(
+        filtro_nombre_difunto(termino),
+        Urna.id.in_(ids_coincidentes('urna', expresion)),
+        Urna.venta_id.in_(ventas_nicho)
+    )
+
+
+def condiciones_fechas(columna, desde=None, hasta=None):
+    """Rango de días sobre la columna (sin func.date, para aprovechar su índice)"""
+    condiciones = []
+    if desde:
+        condiciones.append(columna >= datetime.combine(desde, datetime.min.time()))
+    if hasta:
+        condiciones.append(columna <= datetime.combine(hasta, datetime.max.time()))
+    return condiciones
+
+
+def consulta_ventas(busqueda=None, pagado=None, orden=None, desde=None, hasta=None):
+    """Ventas con titular y nicho como columnas planas"""
+    stmt = select(
+        Venta.id,
+        Venta.numero_contrato,
+        Venta.fecha_venta,
+        _cliente_nombre,
+        Nicho.numero.label("nicho_numero"),
+        Venta.precio_total,
+        Venta.tipo_pago,
+        Venta.saldo_restante,
+        Venta.pagado_completamente
+    ).join(Cliente, Venta.cliente_id == Cliente.id).join(Nicho, Venta.nicho_id == Nicho.id)
+
+    if busqueda:
+        stmt = stmt.where(filtro_busqueda_ventas(busqueda))
+    if pagado is not None:
+        stmt = stmt.where(Venta.pagado_completamente == pagado)
+    stmt = stmt.where(*condiciones_fechas(Venta.fecha_venta, desde, hasta))
+
+    return stmt.order_by(*(orden if orden is not None else [Nicho.numero]))
+
+
+def consulta_ventas_titulos(busqueda=None, pagado=None):
+    """Ventas para títulos, con el número de beneficiarios y si ya tienen título calculados en SQL"""
+    num_beneficiarios = select(func.count(Beneficiario.id)).where(
+        Beneficiario.venta_id == Venta.id
+    ).scalar_subquery().label("num_beneficiarios")
+
+    titulo_generado = condicion_documento(TITULO, Venta.numero_contrato).label("titulo_generado")
+
+    stmt = consulta_ventas(busqueda, pagado, orden=[Venta.fecha_venta.desc()])
+    return stmt.add_columns(num_beneficiarios, titulo_generado)
+
+
+def consulta_datos_titulos(solo_pagadas=False, desde=None, hasta=None):
+    """Todo lo que imprime un título (venta, titular, nicho y beneficiarios activos) en una sentencia"""
+    persona = aliased(Cliente)
+    stmt = select(
+        Venta.id,
+        Venta.numero_contrato,
+        Venta.fecha_venta,
+        Venta.precio_total,
+        Venta.pagado_completamente,
+        Venta.tipo_pago,
+        Venta.observaciones,
+        Cliente.nombre,
+        Cliente.apellido,
+        Cliente.cedula,
+        Cliente.telefono,
+        Cliente.email,
+        Cliente.direccion,
+        Nicho.numero.label("nicho_numero"),
+        Nicho.seccion,
+        Nicho.fila,
+        Nicho.columna,
+        Nicho.precio.label("nicho_precio"),
+        Nicho.descripcion.label("nicho_descripcion"),
+        Beneficiario.orden.label("beneficiario_orden"),
+        persona.nombre.label("beneficiario_nombre"),
+        persona.apellido.label("beneficiario_apellido"),
+        persona.cedula.label("beneficiario_cedula"),
+        persona.telefono.label("beneficiario_telefono"),
+        persona.email.label("beneficiario_email"),
+        persona.direccion.label("beneficiario_direccion")
+    ).join(Cliente, Venta.cliente_id == Cliente.id).join(Nicho, Venta.nicho_id == Nicho.id).outerjoin(
+        Beneficiario, and_(Beneficiario.venta_id == Venta.id, Beneficiario.activo == True)
+    ).outerjoin(persona, Beneficiario.beneficiario_id == persona.id)
+
+    if solo_pagadas:
+        stmt = stmt.where(Venta.pagado_completamente == True)
+    stmt = stmt.where(*condiciones_fechas(Venta.fecha_venta, desde, hasta))
+
+    return stmt.order_by(Venta.fecha_venta, Venta.id, Beneficiario.orden)
+
+
+def obtener_datos_titulos(db, solo_pagadas=False, desde=None, hasta=None):
+    """
+    Instantánea de los datos de los títulos, lista para enviarse a otros procesos
+
+    Returns:
+        list: Un diccionario por venta con 'venta', 'cliente', 'nicho' y 'beneficiarios'
+    """
+    titulos = {}
+    for fila in db.execute(consulta_datos_titulos(solo_pagadas, desde, hasta)):
+        datos = titulos.get(fila.id)
+        if datos is None:
+            datos = titulos[fila.id] = {
+                'venta': {
+                    'numero_contrato': fila.numero_contrato,
+                    'fecha_venta': fila.fecha_venta,
+                    'precio_total': fila.precio_total,
+                    'pagado_completamente': fila.pagado_completamente,
+                    'tipo_pago': fila.tipo_pago,
+                    'observaciones': fila.observaciones
+                },
+                'cliente': {
+                    'nombre': fila.nombre,
+                    'apellido': fila.apellido,
+                    'cedula': fila.cedula,
+                    'telefono': fila.telefono,
+                    'email': fila.email,
+                    'direccion': fila.direccion
+                },
+                'nicho': {
+                    'numero': fila.nicho_numero,
+                    'seccion': fila.seccion,
+                    'fila': fila.fila,
+                    'columna': fila.columna,
+                    'precio': fila.nicho_precio,
+                    'descripcion': fila.nicho_descripcion
+                },
+                'beneficiarios': []
+            }
+        # Las ventas sin beneficiarios traen una sola fila con las columnas del beneficiario en NULL
+        if fila.beneficiario_nombre is not None:
+            datos['beneficiarios'].append({
+                'nombre': fila.beneficiario_nombre,
+                'apellido': fila.beneficiario_apellido,
+                'cedula': fila.beneficiario_cedula,
+                'telefono': fila.beneficiario_telefono,
+                'email': fila.beneficiario_email,
+                'direccion': fila.beneficiario_direccion,
+                'orden': fila.beneficiario_orden
+            })
+    return list(titulos.values())
+
+
+def consulta_saldos_pendientes():
+    """Ventas con saldo, con el total pagado leído de los acumulados de la propia fila"""
+    return select(
+        Venta.numero_contrato,
+        _cliente_nombre,
+        Nicho.numero.label("nicho_numero"),
+        Venta.precio_total,
+        (Venta.enganche + func.coalesce(Venta.total_pagos, 0)).label("total_pagado"),
+        Venta.saldo_restante,
+        Venta.fecha_venta,
+        (func.julianday(func.date('now', 'localtime')) - func.julianday(func.date(Venta.fecha_venta))).cast(
+            Integer
+        ).label("dias_vencido")
+    ).join(Cliente, Venta.cliente_id == Cliente.id).join(Nicho, Venta.nicho_id == Nicho.id).where(
+        Venta.pagado_completamente == False
+    ).order_by(Venta.saldo_restante.desc())
+
+
+def consulta_pagos(busqueda=None, desde=None, hasta=None):
+    """Pagos con contrato y titular como columnas planas"""
+    stmt = select(
+        Pago.id,
+        Pago.fecha_pago,
+        Pago.numero_recibo,
+        Venta.numero_contrato,
+        _cliente_nombre,
+        Pago.monto,
+        Pago.metodo_pago,
+        Pago.concepto
+    ).join(Venta, Pago.venta_id == Venta.id).join(Cliente, Venta.cliente_id == Cliente.id)
+
+    if busqueda:
+        stmt = stmt.where(filtro_busqueda_pagos(busqueda))
+    # Rangos sobre la columna (no func.date) para aprovechar ix_pagos_fecha_pago
+    stmt = stmt.where(*condiciones_fechas(Pago.fecha_pago, desde, hasta))
+
+    return stmt.order_by(Pago.fecha_pago.desc())
+
+
+def consulta_nichos(busqueda=None, disponible=None):
+    """Nichos ordenados por ubicación"""
+    stmt = select(
+        Nicho.id,
+        Nicho.numero,
+        Nicho.seccion,
+        Nicho.fila,
+        Nicho.columna,
+        Nicho.precio,
+        Nicho.disponible,
+        Nicho.descripcion
+    )
+
+    if busqueda:
+        stmt = stmt.where(filtro_busqueda_nichos(busqueda))
+    if disponible is not None:
+        stmt = stmt.where(Nicho.disponible == disponible)
+
+    return stmt.order_by(Nicho.seccion, Nicho.fila, Nicho.columna)
+
+
+def consulta_urnas(busqueda=None):
+    """Urnas con el número de nicho como columna plana"""
+    stmt = select(
+        Urna.id,
+        Nicho.numero.label("nicho_numero"),
+        Urna.numero_urna,
+        Urna.nombre_difunto,
+        Urna.fecha_defuncion,
+        Urna.fecha_deposito_urna,
+        Urna.nombre_depositante,
+        Urna.nombre_crematorio
+    ).join(Venta, Urna.venta_id == Venta.id).join(Nicho, Venta.nicho_id == Nicho.id)
+
+    if busqueda:
+        stmt = stmt.where(filtro_busqueda_urnas(busqueda))
+
+    return stmt.order_by(Nicho.numero, Urna.fecha_deposito_urna)
+
+
+def consulta_movimientos(desde=None, hasta=None):
+    """Ventas y pagos del período en una sola lista, del más reciente al más antiguo"""
+    ventas = select(
+        Venta.fecha_venta.label("fecha"),
+        literal("Venta").label("tipo"),
+        Venta.numero_contrato.label("numero"),
+        _cliente_nombre,
+        (literal("Venta nicho ") + Nicho.numero).label("concepto"),
+        Venta.precio_total.label("monto"),
+        case((Venta.pagado_completamente == True, "Pagado"), else_="Pendiente").label("estado")
+    ).join(Cliente, Venta.cliente_id == Cliente.id).join(Nicho, Venta.nicho_id == Nicho.id).where(
+        *condiciones_fechas(Venta.fecha_venta, desde, hasta)
+    )
+
+    pagos = select(
+        Pago.fecha_pago.label("fecha"),
+        literal("Pago").label("tipo"),
+        Pago.numero_recibo.label("numero"),
+        _cliente_nombre,
+        Pago.concepto.label("concepto"),
+        Pago.monto.label("monto"),
+        literal("Procesado").label("estado")
+    ).join(Venta, Pago.venta_id == Venta.id).join(Cliente, Venta.cliente_id == Cliente.id).where(
+        *condiciones_fechas(Pago.fecha_pago, desde, hasta)
+    )
+
+    return union_all(ventas, pagos).order_by(literal_column("fecha").desc())
+
+
+def consulta_clientes_ventas(desde=None, hasta=None):
+    """Clientes registrados en el período con el número y monto de sus ventas agrupados en SQL"""
+    ventas = select(
+        Venta.cliente_id,
+        func.count(Venta.id).label("num_ventas"),
+        func.sum(Venta.precio_total).label("monto_total")
+    ).group_by(Venta.cliente_id).subquery()
+
+    return select(
+        _cliente_nombre,
+        Cliente.cedula,
+        Cliente.telefono,
+        Cliente.email,
+        func.coalesce(ventas.c.num_ventas, 0).label("num_ventas"),
+        func.coalesce(ventas.c.monto_total, 0).label("monto_total"),
+        Cliente.fecha_registro
+    ).outerjoin(ventas, ventas.c.cliente_id == Cliente.id).where(
+        *condiciones_fechas(Cliente.fecha_registro, desde, hasta)
+    ).order_by(Cliente.fecha_registro.desc())
+
+
+def consulta_nichos_ocupacion():
+    """Nichos por ubicación con el titular y la fecha de su última venta"""
+    ultima_venta = select(
+        Venta.nicho_id,
+        func.max(Venta.id).label("venta_id")
+    ).group_by(Venta.nicho_id).subquery()
+
+    return select(
+        Nicho.numero,
+        Nicho.seccion,
+        ("F" + Nicho.fila + "-C" + Nicho.columna).label("ubicacion"),
+        Nicho.precio,
+        Nicho.disponible,
+        _cliente_nombre,
+        Venta.fecha_venta
+    ).outerjoin(ultima_venta, ultima_venta.c.nicho_id == Nicho.id).outerjoin(
+        Venta, Venta.id == ultima_venta.c.venta_id
+    ).outerjoin(Cliente, Venta.cliente_id == Cliente.id).order_by(
+        Nicho.seccion, Nicho.fila, Nicho.columna
+    )
+
+
+def obtener_filas(db, stmt, limite=None):
+    """Ejecutar una consulta de listado y devolver todas sus filas"""
+    if limite:
+        stmt = stmt.limit(limite)
+    return db.execute(stmt).all()
+
+
+def iterar_filas(stmt, tamano_lote=TAMANO_LOTE_REPORTES):
+    """
+    Recorrer una consulta por lotes sin cargar todas las filas en memoria
+
+    Abre su propia sesión, que se cierra al agotar el generador o al descartarlo.
+    """
+    db = get_db_session()
+    try:
+        yield from db.execute(stmt.execution_options(yield_per=tamano_lote))
+    finally:
+        db.close()
+
+
+# Columnas de los TreeView que se pueden ordenar en el servidor
+ORDEN_VENTAS = {
+    'contrato': [Venta.numero_contrato],
+    'fecha': [Venta.fecha_venta],
+    'cliente': [Cliente.nombre_normalizado, Cliente.apellido_normalizado],
+    'nicho': [Nicho.numero],
+    'precio_total': [Venta.precio_total],
+    'tipo_pago': [Venta.tipo_pago],
+    'saldo': [Venta.saldo_restante],
+    'estado': [Venta.pagado_completamente]
+}
+
+ORDEN_PAGOS = {
+    'fecha': [Pago.fecha_pago],
+    'recibo': [Pago.numero_recibo],
+    'contrato': [Venta.numero_contrato],
+    'cliente': [Cliente.nombre_normalizado, Cliente.apellido_normalizado],
+    'monto': [Pago.monto],
+    'metodo': [Pago.metodo_pago],
+    'concepto': [Pago.concepto]
+}
+
+ORDEN_NICHOS = {
+    'numero': [Nicho.numero],
+    'seccion': [Nicho.seccion, Nicho.fila, Nicho.columna],
+    'fila': [Nicho.fila],
+    'columna': [Nicho.columna],
+    'precio': [Nicho.precio],
+    'disponible': [Nicho.disponible],
+    'descripcion': [Nicho.descripcion]
+}
+
+ORDEN_URNAS = {
+    'nicho': [Nicho.numero, Urna.numero_urna],
+    'urna_num': [Urna.numero_urna],
+    'difunto': [Urna.nombre_difunto_normalizado],
+    'defuncion': [Urna.fecha_defuncion],
+    'deposito': [Urna.fecha_deposito_urna],
+    'depositante': [Urna.nombre_depositante],
+    'crematorio': [Urna.nombre_crematorio]
+}
+
+
+class ConsultaPaginada:
+    """Fuente de datos paginada para VirtualTreeview; cada página usa su propia sesión"""
+
+    def __init__(self, stmt, columnas_orden, desempate):
+        self.stmt = stmt
+        self.columnas_orden = columnas_orden
+        # Columna única que hace estable el orden entre páginas
+        self.desempate = desempate
+
+    @property
+    def sortable(self):
+        """Columnas que se pueden ordenar"""
+        return set(self.columnas_orden)
+
+    def count(self, db=None):
+        """Contar las filas de la consulta (con la sesión dada o una propia)"""
+        conteo = select(func.count()).select_from(self.stmt.order_by(None).subquery())
+        return self._execute(conteo, db)[0][0] or 0
+
+    def fetch(self, offset, limit, sort_key=None, descending=False, db=None):
+        """Obtener una página de filas con el orden solicitado"""
+        stmt = self.stmt
+        if sort_key in self.columnas_orden:
+            columnas = self.columnas_orden[sort_key]
+            stmt = stmt.order_by(None).order_by(
+                *[c.desc() if descending else c.asc() for c in columnas]
+            )
+        stmt = stmt.order_by(self.desempate).offset(offset).limit(limit)
+        return self._execute(stmt, db)
+
+    def _execute(self, stmt, db=None):
+        """Ejecutar con la sesión recibida o con una sesión de corta duración"""
+        if db is not None:
+            return db.execute(stmt).all()
+
+        db = get_db_session()
+        try:
+            return db.execute(stmt).all()
+        finally:
+            db.close()
+
+
+class ContadorSentencias:
+    """Contar las sentencias SQL que emite el engine dentro de un bloque with"""
+
+    def __init__(self, bind=None):
+        self.bind = bind if bind is not None else engine
+        self.total = 0
+        self.sentencias = []
+        # Parámetros de cada sentencia, en el mismo orden (para repetirla con EXPLAIN)
+        self.parametros = []
+
+    def __enter__(self):
+        event.listen(self.bind, "before_cursor_execute", self._registrar)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        event.remove(self.bind, "before_cursor_execute", self._registrar)
+        return False
+
+    def _registrar(self, conn, cursor, statement, parameters, context, executemany):
+        """Registrar una sentencia emitida"""
+        self.total += 1
+        self.sentencias.append(statement)
+        self.parametros.append(parameters)
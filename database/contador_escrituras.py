@@ -0,0 +1,90 @@
+# database/contador_escrituras.py
+"""
+Contador de escrituras pendientes de respaldo, mantenido por triggers de SQLite
+"""
+
+import sqlite3
+from datetime import datetime
+from database.models import engine
+
+TABLA_CONTADOR = "contador_escrituras"
+
+# Tablas con datos de la parroquia cuyas escrituras cuentan para los respaldos por cambios
+TABLAS_CONTADAS = ["clientes", "nichos", "ventas", "pagos", "beneficiarios", "urnas"]
+
+
+def _sql_triggers(tabla):
+    """Sentencias que crean los triggers que cuentan las escrituras de una tabla"""
+    # Mismo formato que guarda SQLAlchemy en las columnas DateTime
+    contar = (
+        f"INSERT INTO {TABLA_CONTADOR}(tabla, pendientes, ultima_escritura) "
+        f"VALUES ('{tabla}', 1, strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')) "
+        f"ON CONFLICT(tabla) DO UPDATE SET pendientes = pendientes + 1, "
+        f"ultima_escritura = excluded.ultima_escritura;"
+    )
+    return [
+        f"CREATE TRIGGER {TABLA_CONTADOR}_{tabla}_{sufijo} AFTER {operacion} ON {tabla} BEGIN {contar} END"
+        for sufijo, operacion in (("ai", "INSERT"), ("au", "UPDATE"), ("ad", "DELETE"))
+    ]
+
+
+def crear_contador_escrituras():
+    """Crear (o recrear) los triggers del contador de escrituras"""
+    try:
+        with engine.begin() as conn:
+            for tabla in TABLAS_CONTADAS:
+                for sufijo in ("ai", "au", "ad"):
+                    conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {TABLA_CONTADOR}_{tabla}_{sufijo}")
+                for sentencia in _sql_triggers(tabla):
+                    conn.exec_driver_sql(sentencia)
+    except Exception as e:
+        print(f"Error al crear el contador de escrituras: {str(e)}")
+
+
+def leer_escrituras_pendientes(ruta):
+    """
+    Escrituras pendientes por tabla en un archivo de base de datos
+
+    Usa sqlite3 directamente: sirve tanto para la base en uso como para una instantánea.
+
+    Returns:
+        tuple: (dict tabla -> pendientes, fecha de la última escritura o None);
+               ({}, None) si la base de datos todavía no tiene el contador
+    """
+    try:
+        conn = sqlite3.connect(ruta, timeout=10)
+        try:
+            filas = conn.execute(f"SELECT tabla, pendientes, ultima_escritura FROM {TABLA_CONTADOR}").fetchall()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return {}, None
+
+    fechas = [datetime.fromisoformat(fecha) for _, _, fecha in filas if fecha]
+    return {tabla: pendientes for tabla, pendientes, _ in filas}, max(fechas, default=None)
+
+
+def descontar_escrituras(ruta, respaldadas):
+    """
+    Restar las escrituras que ya quedaron en un respaldo
+
+    Los triggers solo suman, así las escrituras hechas después de la instantánea siguen pendientes.
+
+    Args:
+        ruta: Base de datos en uso
+        respaldadas: dict tabla -> pendientes leído de la instantánea
+    """
+    if not respaldadas:
+        return
+    try:
+        conn = sqlite3.connect(ruta, timeout=10)
+        try:
+            with conn:
+                conn.executemany(
+                    f"UPDATE {TABLA_CONTADOR} SET pendientes = max(pendientes - ?, 0) WHERE tabla = ?",
+                    [(pendientes, tabla) for tabla, pendientes in respaldadas.items()]
+                )
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"Error al actualizar el contador de escrituras: {e}")
@@ -0,0 +1,214 @@
+# database/documentos.py
+"""
+Índice de los PDF generados (títulos, recibos y consentimientos) en la tabla documentos
+"""
+
+import hashlib
+import os
+import re
+from datetime import datetime
+from sqlalchemy import select, update, delete, exists
+from sqlalchemy.dialects.sqlite import insert
+from config.paths import AppPaths
+from database.models import get_db_session, Documento, Pago, Venta
+
+# Tipos de documento
+RECIBO = 'recibo'
+TITULO = 'titulo'
+CONSENTIMIENTO_URNA = 'consentimiento_urna'
+
+# Nombres de archivo que genera PDFGenerator: tipo -> patrón con la referencia y la fecha
+PATRONES_ARCHIVO = {
+    TITULO: re.compile(r'^titulo_(?P<referencia>.+)_(?P<fecha>\d{8}_\d{6})\.pdf$'),
+    RECIBO: re.compile(r'^recibo_(?P<referencia>.+)_(?P<fecha>\d{8}_\d{6})\.pdf$'),
+    CONSENTIMIENTO_URNA: re.compile(r'^consentimiento_urna_(?P<referencia>.+)_(?P<fecha>\d{8}_\d{6})\.pdf$'),
+}
+
+# Bytes que se leen por bloque al calcular el hash de un archivo
+TAMANO_BLOQUE_HASH = 1024 * 1024
+
+
+def hash_archivo(ruta):
+    """SHA-256 del contenido de un archivo, leído por bloques"""
+    sha256 = hashlib.sha256()
+    with open(ruta, 'rb') as archivo:
+        for bloque in iter(lambda: archivo.read(TAMANO_BLOQUE_HASH), b''):
+            sha256.update(bloque)
+    return sha256.hexdigest()
+
+
+def _valores_documento(tipo, ruta, numero_contrato=None, numero_recibo=None, fecha_generacion=None):
+    """Fila de la tabla documentos para un archivo existente"""
+    return {
+        'tipo': tipo,
+        'numero_contrato': numero_contrato,
+        'numero_recibo': numero_recibo,
+        'ruta': ruta,
+        'hash_sha256': hash_archivo(ruta),
+        'tamano': os.path.getsize(ruta),
+        'fecha_generacion': fecha_generacion or datetime.now(),
+    }
+
+
+def _guardar(db, valores):
+    """Insertar o actualizar por ruta (un archivo regenerado conserva una sola fila)"""
+    stmt = insert(Documento).values(valores)
+    actualizar = {columna: stmt.excluded[columna] for columna in valores if columna != 'ruta'}
+    db.execute(stmt.on_conflict_do_update(index_elements=[Documento.ruta], set_=actualizar))
+
+
+def registrar_documento(tipo, ruta, numero_contrato=None, numero_recibo=None):
+    """
+    Registrar un PDF recién generado
+
+    Args:
+        tipo: TITULO, RECIBO o CONSENTIMIENTO_URNA
+        ruta: Archivo generado
+        numero_contrato: Contrato al que pertenece el documento
+        numero_recibo: Recibo (solo para recibos)
+
+    Returns:
+        bool: True si quedó registrado
+    """
+    db = get_db_session()
+    try:
+        _guardar(db, _valores_documento(tipo, os.path.abspath(ruta), numero_contrato, numero_recibo))
+        db.commit()
+        return True
+    except Exception as e:
+        db.rollback()
+        print(f"Error al registrar documento '{ruta}': {str(e)}")
+        return False
+    finally:
+        db.close()
+
+
+def buscar_documento(db, tipo, numero_contrato=None, numero_recibo=None):
+    """
+    Documento más reciente de un contrato o recibo
+
+    Returns:
+        Documento o None si no se ha generado ninguno
+    """
+    stmt = select(Documento).where(Documento.tipo == tipo)
+    if numero_contrato is not None:
+        stmt = stmt.where(Documento.numero_contrato == numero_contrato)
+    if numero_recibo is not None:
+        stmt = stmt.where(Documento.numero_recibo == numero_recibo)
+    return db.scalars(stmt.order_by(Documento.fecha_generacion.desc()).limit(1)).first()
+
+
+def condicion_documento(tipo, columna_contrato):
+    """EXISTS correlacionado: hay un documento del tipo para el contrato de la columna"""
+    return exists().where(Documento.tipo == tipo, Documento.numero_contrato == columna_contrato)
+
+
+def directorios_documentos():
+    """Carpetas donde PDFGenerator guarda títulos, recibos y consentimientos"""
+    return [AppPaths.get_titulos_dir(), AppPaths.get_recibos_dir()]
+
+
+def _archivos_documentos(directorios):
+    """(tipo, referencia, fecha, ruta absoluta) de cada PDF reconocible en las carpetas"""
+    for directorio in directorios:
+        if not os.path.isdir(directorio):
+            continue
+        with os.scandir(directorio) as entradas:
+            for entrada in entradas:
+                if not entrada.is_file():
+                    continue
+                for tipo, patron in PATRONES_ARCHIVO.items():
+                    coincidencia = patron.match(entrada.name)
+                    if coincidencia:
+                        try:
+                            fecha = datetime.strptime(coincidencia.group('fecha'), "%Y%m%d_%H%M%S")
+                        except ValueError:
+                            fecha = datetime.fromtimestamp(entrada.stat().st_mtime)
+                        yield tipo, coincidencia.group('referencia'), fecha, os.path.abspath(entrada.path)
+                        break
+
+
+def reconciliar_documentos(directorios=None):
+    """
+    Volver a indexar las carpetas de documentos
+
+    Agrega los PDF que no están en la tabla, actualiza el hash de los que cambiaron de
+    tamaño y elimina las filas cuyo archivo ya no existe.
+
+    Args:
+        directorios: Carpetas a recorrer (por defecto las de títulos y recibos)
+
+    Returns:
+        dict: Número de documentos 'agregados', 'actualizados' y 'eliminados'
+    """
+    resultado = {'agregados': 0, 'actualizados': 0, 'eliminados': 0}
+    db = get_db_session()
+    try:
+        registrados = {fila.ruta: fila for fila in db.execute(
+            select(Documento.id, Documento.ruta, Documento.tamano)
+        )}
+
+        archivos = list(_archivos_documentos(directorios or directorios_documentos()))
+
+        # Contrato de cada recibo nuevo, en una sola consulta
+        recibos = {referencia for tipo, referencia, _, ruta in archivos
+                   if tipo == RECIBO and ruta not in registrados}
+        contratos_recibo = {}
+        if recibos:
+            contratos_recibo = dict(db.execute(
+                select(Pago.numero_recibo, Venta.numero_contrato)
+                .join(Venta, Pago.venta_id == Venta.id)
+                .where(Pago.numero_recibo.in_(recibos))
+            ).all())
+
+        encontrados = set()
+        for tipo, referencia, fecha, ruta in archivos:
+            encontrados.add(ruta)
+            registrado = registrados.get(ruta)
+            if registrado is not None:
+                if registrado.tamano != os.path.getsize(ruta):
+                    db.execute(update(Documento).where(Documento.id == registrado.id).values(
+                        hash_sha256=hash_archivo(ruta), tamano=os.path.getsize(ruta)
+                    ))
+                    resultado['actualizados'] += 1
+                continue
+
+            if tipo == TITULO:
+                numero_contrato, numero_recibo = referencia, None
+            elif tipo == RECIBO:
+                numero_contrato, numero_recibo = contratos_recibo.get(referencia), referencia
+            else:
+                # El nombre del consentimiento solo trae el número de urna
+                numero_contrato, numero_recibo = None, None
+            _guardar(db, _valores_documento(tipo, ruta, numero_contrato, numero_recibo, fecha))
+            resultado['agregados'] += 1
+
+        faltantes = [fila.id for ruta, fila in registrados.items()
+                     if ruta not in encontrados and not os.path.exists(ruta)]
+        if faltantes:
+            db.execute(delete(Documento).where(Documento.id.in_(faltantes)))
+            resultado['eliminados'] = len(faltantes)
+
+        db.commit()
+        return resultado
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def indexar_documentos_iniciales():
+    """
+    Indexar las carpetas la primera vez que existe la tabla documentos
+
+    Returns:
+        int: Documentos agregados (0 si la tabla ya tenía filas)
+    """
+    db = get_db_session()
+    try:
+        if db.scalar(select(Documento.id).limit(1)) is not None:
+            return 0
+    finally:
+        db.close()
+    return reconciliar_documentos()['agregados']
@@ -0,0 +1,138 @@
+# database/estadisticas.py
+"""
+Servicio de estadísticas del dashboard y de las barras de información, con caché en memoria
+"""
+
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import select, func, case, true, event
+from database.models import SessionLocal, get_db_session, Nicho, Venta, Pago, Urna
+
+# Modelos cuyos cambios invalidan las estadísticas
+_MODELOS_ESTADISTICAS = (Nicho, Venta, Pago, Urna)
+
+
+def _contar_si(condicion):
+    """Suma condicional: cuenta las filas que cumplen la condición"""
+    return func.coalesce(func.sum(case((condicion, 1), else_=0)), 0)
+
+
+def consulta_estadisticas(inicio_dia):
+    """Todas las cifras en una sola sentencia: un agregado por tabla unidos en una fila"""
+    nichos = select(
+        func.count(Nicho.id).label("total_nichos"),
+        _contar_si(Nicho.disponible == True).label("nichos_disponibles")
+    ).subquery()
+
+    ventas = select(
+        func.count(Venta.id).label("total_ventas"),
+        _contar_si(Venta.pagado_completamente == True).label("ventas_pagadas"),
+        func.coalesce(func.sum(Venta.precio_total), 0).label("monto_vendido"),
+        func.coalesce(func.sum(Venta.saldo_restante), 0).label("saldo_pendiente")
+    ).subquery()
+
+    # Rango sobre fecha_pago para aprovechar ix_pagos_fecha_pago; los pagos con fecha futura no son de hoy
+    del_dia = (Pago.fecha_pago >= inicio_dia, Pago.fecha_pago < inicio_dia + timedelta(days=1))
+    pagos_hoy = select(
+        func.count(Pago.id).label("pagos_hoy"),
+        func.coalesce(func.sum(Pago.monto), 0).label("monto_hoy")
+    ).where(*del_dia).subquery()
+
+    metodo_principal = select(Pago.metodo_pago).where(
+        *del_dia
+    ).group_by(Pago.metodo_pago).order_by(func.count(Pago.id).desc()).limit(1).scalar_subquery()
+
+    urnas = select(func.count(Urna.id).label("total_urnas")).subquery()
+
+    # Cada subconsulta devuelve una sola fila: el producto cruzado las une sin multiplicar
+    una_fila = nichos.join(ventas, true()).join(pagos_hoy, true()).join(urnas, true())
+    return select(
+        nichos, ventas, pagos_hoy, urnas, metodo_principal.label("metodo_principal_hoy")
+    ).select_from(una_fila)
+
+
+class Estadisticas:
+    """Instantánea de cifras calculada bajo demanda y descartada cuando se guardan cambios"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._fecha = None
+        # Aumenta con cada invalidación para no guardar una instantánea calculada durante una escritura
+        self._version = 0
+
+    def obtener(self):
+        """
+        Obtener las cifras actuales (de la caché si nada cambió)
+
+        Returns:
+            dict: total_nichos, nichos_disponibles, nichos_vendidos, total_ventas, ventas_pagadas,
+                  ventas_pendientes, monto_vendido, saldo_pendiente, pagos_hoy, monto_hoy,
+                  metodo_principal_hoy y total_urnas
+        """
+        hoy = datetime.now().date()
+        with self._lock:
+            # Las cifras "de hoy" caducan al cambiar el día aunque no haya escrituras
+            if self._snapshot is not None and self._fecha == hoy:
+                return self._snapshot
+            version = self._version
+
+        snapshot = self._calcular(hoy)
+        with self._lock:
+            if version == self._version:
+                self._snapshot = snapshot
+                self._fecha = hoy
+        return snapshot
+
+    def invalidar(self):
+        """Descartar la instantánea; la próxima consulta vuelve a la base de datos"""
+        with self._lock:
+            self._snapshot = None
+            self._version += 1
+
+    def _calcular(self, hoy):
+        """Ejecutar la consulta agregada y completar las cifras derivadas"""
+        db = get_db_session()
+        try:
+            inicio_dia = datetime.combine(hoy, datetime.min.time())
+            fila = db.execute(consulta_estadisticas(inicio_dia)).mappings().one()
+        finally:
+            db.close()
+
+        snapshot = dict(fila)
+        snapshot['nichos_vendidos'] = snapshot['total_nichos'] - snapshot['nichos_disponibles']
+        snapshot['ventas_pendientes'] = snapshot['total_ventas'] - snapshot['ventas_pagadas']
+        return snapshot
+
+
+estadisticas = Estadisticas()
+
+
+# Invalidación: se marca la sesión al escribir y se descarta la caché al confirmar
+@event.listens_for(SessionLocal, "after_flush")
+def _marcar_cambios(session, flush_context):
+    """Recordar si el flush tocó alguna tabla de las estadísticas"""
+    for objeto in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(objeto, _MODELOS_ESTADISTICAS):
+            session.info['estadisticas_sucias'] = True
+            return
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _marcar_cambios_masivos(orm_execute_state):
+    """Las actualizaciones masivas (update()/delete()) no pasan por el flush"""
+    if orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert:
+        orm_execute_state.session.info['estadisticas_sucias'] = True
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _invalidar_al_confirmar(session):
+    """Descartar la instantánea cuando se confirman cambios"""
+    if session.info.pop('estadisticas_sucias', False):
+        estadisticas.invalidar()
+
+
+@event.listens_for(SessionLocal, "after_soft_rollback")
+def _descartar_marca(session, previous_transaction):
+    """Un rollback deja los datos como estaban"""
+    session.info.pop('estadisticas_sucias', None)
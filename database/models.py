@@ -3,14 +3,33 @@
 Modelos de base de datos para el sistema de administración de criptas
 """
 
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text
+from sqlalchemy import create_engine, event, inspect, case, func, or_, select, insert, update, Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text, Index
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship, sessionmaker
 from datetime import datetime
 from typing import List, Optional
 import os
+import re
+import unicodedata
 
 import shortuuid
 from config.paths import AppPaths
+from config.app_config import app_config
+from config.constants import DB_SETTINGS, SQLITE_PROFILES, DEFAULT_SQLITE_PROFILE
+
+def normalizar_texto(valor):
+    """Minúsculas, sin acentos ni espacios repetidos ("  Núñez " -> "nunez")"""
+    if valor is None:
+        return None
+    descompuesto = unicodedata.normalize("NFKD", str(valor))
+    sin_acentos = "".join(c for c in descompuesto if not unicodedata.combining(c))
+    return " ".join(sin_acentos.lower().split())
+
+def normalizar_codigo(valor):
+    """Normalizar un número de nicho dejando solo letras y dígitos ("A-01" -> "a01")"""
+    texto = normalizar_texto(valor)
+    if texto is None:
+        return None
+    return re.sub(r"[^0-9a-z]", "", texto)
 
 def generar_cedula_automatica():
     """Generar cédula automática usando shortuuid"""
@@ -20,7 +39,50 @@ def generar_cedula_automatica():
 # Usar la ruta de AppPaths para que funcione con instalación para todos los usuarios
 _db_path = AppPaths.get_database_path()
 DATABASE_URL = f"sqlite:///{_db_path}"
-engine = create_engine(DATABASE_URL, echo=False)
+engine = create_engine(
+    DATABASE_URL,
+    echo=False,
+    pool_size=DB_SETTINGS['POOL_SIZE'],
+    max_overflow=DB_SETTINGS['MAX_OVERFLOW'],
+    pool_timeout=DB_SETTINGS['POOL_TIMEOUT'],
+    pool_recycle=DB_SETTINGS['POOL_RECYCLE']
+)
+
+def obtener_perfil_sqlite():
+    """Obtener el perfil de PRAGMA configurado, combinado con los valores personalizados"""
+    nombre, personalizados = app_config.get_sqlite_profile()
+    if nombre not in SQLITE_PROFILES:
+        print(f"Perfil de SQLite desconocido '{nombre}', usando '{DEFAULT_SQLITE_PROFILE}'")
+        nombre = DEFAULT_SQLITE_PROFILE
+    pragmas = {**SQLITE_PROFILES[nombre], **(personalizados or {})}
+    return nombre, pragmas
+
+SQLITE_PROFILE_NAME, SQLITE_PRAGMAS = obtener_perfil_sqlite()
+
+@event.listens_for(engine, "connect")
+def _aplicar_pragmas_sqlite(dbapi_connection, connection_record):
+    """Aplicar los PRAGMA del perfil activo en cada conexión nueva"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma, valor in SQLITE_PRAGMAS.items():
+            try:
+                cursor.execute(f"PRAGMA {pragma}={valor}")
+            except Exception as e:
+                print(f"Error al aplicar PRAGMA {pragma}={valor}: {str(e)}")
+    finally:
+        cursor.close()
+
+def obtener_configuracion_sqlite():
+    """Leer de la base de datos los valores efectivos de los PRAGMA del perfil"""
+    activos = {}
+    with engine.connect() as conn:
+        for pragma in SQLITE_PRAGMAS:
+            try:
+                activos[pragma] = conn.exec_driver_sql(f"PRAGMA {pragma}").scalar()
+            except Exception as e:
+                activos[pragma] = f"error: {str(e)}"
+    return activos
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 class Base(DeclarativeBase):
@@ -28,10 +90,19 @@ class Base(DeclarativeBase):
 
 class Cliente(Base):
     __tablename__ = "clientes"
+    __table_args__ = (
+        Index("ix_clientes_nombre_normalizado", "nombre_normalizado"),
+        Index("ix_clientes_apellido_normalizado", "apellido_normalizado"),
+        # Filtro por período del reporte de clientes
+        Index("ix_clientes_fecha_registro", "fecha_registro"),
+    )
     
     id: Mapped[int] = mapped_column(primary_key=True)
     nombre: Mapped[str] = mapped_column(String(100), nullable=False)
     apellido: Mapped[str] = mapped_column(String(100), nullable=False)
+    # Copias normalizadas para búsquedas por prefijo con índice (ver normalizar_texto)
+    nombre_normalizado: Mapped[Optional[str]] = mapped_column(String(100))
+    apellido_normalizado: Mapped[Optional[str]] = mapped_column(String(100))
     cedula: Mapped[str] = mapped_column(String(20), unique=True, nullable=False)
     telefono: Mapped[Optional[str]] = mapped_column(String(20))
     email: Mapped[Optional[str]] = mapped_column(String(100))
@@ -63,9 +134,15 @@ class Cliente(Base):
 
 class Nicho(Base):
     __tablename__ = "nichos"
+    __table_args__ = (
+        Index("ix_nichos_disponible", "disponible"),
+        Index("ix_nichos_ubicacion", "seccion", "fila", "columna"),
+        Index("ix_nichos_numero_normalizado", "numero_normalizado"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     numero: Mapped[str] = mapped_column(String(20), unique=True, nullable=False)
+    numero_normalizado: Mapped[Optional[str]] = mapped_column(String(20))
     seccion: Mapped[str] = mapped_column(String(50), nullable=False)
     fila: Mapped[str] = mapped_column(String(10), nullable=False)
     columna: Mapped[str] = mapped_column(String(10), nullable=False)
@@ -82,6 +159,12 @@ class Nicho(Base):
 
 class Venta(Base):
     __tablename__ = "ventas"
+    __table_args__ = (
+        Index("ix_ventas_cliente_id", "cliente_id"),
+        Index("ix_ventas_nicho_id", "nicho_id"),
+        Index("ix_ventas_fecha_venta", "fecha_venta"),
+        Index("ix_ventas_pagado_fecha", "pagado_completamente", "fecha_venta"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     numero_contrato: Mapped[str] = mapped_column(String(50), unique=True, nullable=False)
@@ -94,6 +177,10 @@ class Venta(Base):
     pagado_completamente: Mapped[bool] = mapped_column(Boolean, default=False)
     fecha_venta: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
     fecha_ultimo_pago: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    # Acumulados de pagos mantenidos al insertar, editar o anular pagos (ver _acumular_pagos)
+    total_pagos: Mapped[Optional[float]] = mapped_column(Float, default=0.0)  # Sin mantenimiento
+    total_mantenimiento: Mapped[Optional[float]] = mapped_column(Float, default=0.0)
+    num_pagos: Mapped[Optional[int]] = mapped_column(Integer, default=0)
     familia: Mapped[Optional[str]] = mapped_column(String(100))
     observaciones: Mapped[Optional[str]] = mapped_column(Text)
     mantenimiento_pagado: Mapped[bool] = mapped_column(Boolean, default=False)
@@ -112,51 +199,48 @@ class Venta(Base):
     @property
     def total_pagado(self):
         """Total pagado incluyendo enganche (sin incluir mantenimiento)"""
-        return sum(pago.monto for pago in self.pagos if pago.concepto != 'Mantenimiento') + self.enganche
+        return self.total_pagos_adicionales + self.enganche
 
     @property
     def total_pagos_adicionales(self):
         """Total de pagos adicionales (sin incluir enganche ni mantenimiento)"""
-        return sum(pago.monto for pago in self.pagos if pago.concepto != 'Mantenimiento')
+        if self.total_pagos is None:
+            # Venta aún no guardada: calcular desde la relación
+            return sum(pago.monto for pago in self.pagos if pago.concepto != 'Mantenimiento')
+        return self.total_pagos
 
     def actualizar_saldo(self):
         """Actualizar saldo restante basado en los pagos realizados (excluyendo mantenimiento)"""
-        # Obtener la sesión actual y consultar los pagos desde la base de datos
-        # para asegurar que incluya todos los pagos, incluso los recién agregados
         from sqlalchemy.orm import object_session
-        from sqlalchemy import func
 
         session = object_session(self)
-
         if session:
-            # Consultar la suma total de pagos desde la base de datos
-            # EXCLUIR pagos de mantenimiento del cálculo del saldo
-            try:
-                total_pagos_db = session.query(func.sum(Pago.monto)).filter(
-                    Pago.venta_id == self.id,
-                    Pago.concepto != 'Mantenimiento'
-                ).scalar() or 0
-            except:
-                # Fallback a usar la relación
-                total_pagos_db = self.total_pagos_adicionales
-        else:
-            # Fallback si no hay sesión
-            total_pagos_db = self.total_pagos_adicionales
+            # El flush aplica los pagos pendientes a total_pagos; el valor se lee de la fila de la venta
+            session.flush()
 
         # El saldo restante debe ser: precio_total - enganche - pagos_adicionales (sin mantenimiento)
-        self.saldo_restante = self.precio_total - self.enganche - total_pagos_db
+        self.saldo_restante = self.precio_total - self.enganche - self.total_pagos_adicionales
         self.pagado_completamente = self.saldo_restante <= 0
 
 class Pago(Base):
     __tablename__ = "pagos"
-    
+    __table_args__ = (
+        # Cubre el SUM de recalcular_acumulados_pagos sin leer la tabla
+        Index("ix_pagos_venta_concepto_monto", "venta_id", "concepto", "monto"),
+        Index("ix_pagos_fecha_pago", "fecha_pago"),
+        Index("ix_pagos_concepto_fecha", "concepto", "fecha_pago"),
+        # Cubre los agregados del resumen financiero: un rango de fechas sin leer la tabla
+        Index("ix_pagos_fecha_resumen", "fecha_pago", "concepto", "monto", "metodo_pago", "venta_id"),
+    )
+
     id: Mapped[int] = mapped_column(primary_key=True)
-    venta_id: Mapped[int] = mapped_column(ForeignKey("ventas.id"), nullable=False)
+    # active_history conserva el valor anterior al editar para ajustar los acumulados de la venta
+    venta_id: Mapped[int] = mapped_column(ForeignKey("ventas.id"), nullable=False, active_history=True)
     numero_recibo: Mapped[str] = mapped_column(String(50), unique=True, nullable=False)
-    monto: Mapped[float] = mapped_column(Float, nullable=False)
-    fecha_pago: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+    monto: Mapped[float] = mapped_column(Float, nullable=False, active_history=True)
+    fecha_pago: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, active_history=True)
     metodo_pago: Mapped[str] = mapped_column(String(50), nullable=False)  # "efectivo", "transferencia", etc.
-    concepto: Mapped[str] = mapped_column(String(200), nullable=False)
+    concepto: Mapped[str] = mapped_column(String(200), nullable=False, active_history=True)
     observaciones: Mapped[Optional[str]] = mapped_column(Text)
     
     # Relaciones
@@ -167,6 +251,9 @@ class Pago(Base):
 
 class Beneficiario(Base):
     __tablename__ = "beneficiarios"
+    __table_args__ = (
+        Index("ix_beneficiarios_venta_id", "venta_id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     venta_id: Mapped[int] = mapped_column(ForeignKey("ventas.id"), nullable=False)
@@ -186,11 +273,16 @@ class Beneficiario(Base):
 
 class Urna(Base):
     __tablename__ = "urnas"
+    __table_args__ = (
+        Index("ix_urnas_venta_numero", "venta_id", "numero_urna"),
+        Index("ix_urnas_nombre_difunto_normalizado", "nombre_difunto_normalizado"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     venta_id: Mapped[int] = mapped_column(ForeignKey("ventas.id"), nullable=False)
     numero_urna: Mapped[int] = mapped_column(Integer, nullable=False)  # Incrementa por nicho
     nombre_difunto: Mapped[str] = mapped_column(String(100), nullable=False)
+    nombre_difunto_normalizado: Mapped[Optional[str]] = mapped_column(String(100))
     fecha_defuncion: Mapped[datetime] = mapped_column(DateTime, nullable=False)
     fecha_deposito_urna: Mapped[datetime] = mapped_column(DateTime, nullable=False)
     fecha_cremacion: Mapped[Optional[datetime]] = mapped_column(DateTime)
@@ -208,6 +300,281 @@ class Urna(Base):
     def __repr__(self):
         return f"Urna(venta_id={self.venta_id}, numero_urna={self.numero_urna}, nombre_difunto='{self.nombre_difunto}')"
 
+class Secuencia(Base):
+    __tablename__ = "secuencias"
+
+    # Contador por nombre y periodo (año para contratos y recibos, id de nicho para urnas)
+    nombre: Mapped[str] = mapped_column(String(30), primary_key=True)
+    periodo: Mapped[int] = mapped_column(Integer, primary_key=True)
+    valor: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"Secuencia(nombre='{self.nombre}', periodo={self.periodo}, valor={self.valor})"
+
+class ContadorEscrituras(Base):
+    __tablename__ = "contador_escrituras"
+
+    # Filas escritas por tabla que todavía no están en un respaldo (lo mantienen triggers)
+    tabla: Mapped[str] = mapped_column(String(30), primary_key=True)
+    pendientes: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    ultima_escritura: Mapped[Optional[datetime]] = mapped_column(DateTime)
+
+    def __repr__(self):
+        return f"ContadorEscrituras(tabla='{self.tabla}', pendientes={self.pendientes})"
+
+class Documento(Base):
+    __tablename__ = "documentos"
+    __table_args__ = (
+        Index("ix_documentos_tipo_contrato_fecha", "tipo", "numero_contrato", "fecha_generacion"),
+        Index("ix_documentos_tipo_recibo_fecha", "tipo", "numero_recibo", "fecha_generacion"),
+    )
+
+    # PDF generado (título, recibo o consentimiento) y dónde quedó guardado
+    id: Mapped[int] = mapped_column(primary_key=True)
+    tipo: Mapped[str] = mapped_column(String(30), nullable=False)
+    numero_contrato: Mapped[Optional[str]] = mapped_column(String(50))
+    numero_recibo: Mapped[Optional[str]] = mapped_column(String(50))
+    ruta: Mapped[str] = mapped_column(String(500), unique=True, nullable=False)
+    hash_sha256: Mapped[str] = mapped_column(String(64), nullable=False)
+    tamano: Mapped[int] = mapped_column(Integer, nullable=False)
+    fecha_generacion: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+
+    def __repr__(self):
+        return f"Documento(tipo='{self.tipo}', ruta='{self.ruta}')"
+
+# Columnas normalizadas: modelo -> {columna normalizada: (columna original, función)}
+COLUMNAS_NORMALIZADAS = {
+    Cliente: {
+        'nombre_normalizado': ('nombre', normalizar_texto),
+        'apellido_normalizado': ('apellido', normalizar_texto),
+    },
+    Nicho: {
+        'numero_normalizado': ('numero', normalizar_codigo),
+    },
+    Urna: {
+        'nombre_difunto_normalizado': ('nombre_difunto', normalizar_texto),
+    },
+}
+
+def _actualizar_normalizadas(mapper, connection, target):
+    """Recalcular las columnas normalizadas antes de guardar la fila"""
+    for destino, (origen, funcion) in COLUMNAS_NORMALIZADAS[type(target)].items():
+        setattr(target, destino, funcion(getattr(target, origen)))
+
+for _modelo in COLUMNAS_NORMALIZADAS:
+    event.listen(_modelo, "before_insert", _actualizar_normalizadas)
+    event.listen(_modelo, "before_update", _actualizar_normalizadas)
+
+def _aporte_pago(monto, concepto):
+    """(pagos, mantenimiento) con que un pago contribuye a los acumulados de su venta"""
+    monto = monto or 0
+    return (0, monto) if concepto == 'Mantenimiento' else (monto, 0)
+
+def _valor_anterior(objeto, atributo):
+    """Valor de un atributo antes de los cambios pendientes del objeto"""
+    historial = inspect(objeto).attrs[atributo].history
+    return historial.deleted[0] if historial.deleted else getattr(objeto, atributo)
+
+def _acumular_pagos(session, flush_context, instances):
+    """Trasladar a ventas los pagos nuevos, editados o anulados en este flush"""
+    cambios = {}
+
+    def cambio(venta):
+        return cambios.setdefault(venta, {
+            'pagos': 0, 'mantenimiento': 0, 'num': 0,
+            'fechas': [], 'recalcular_fecha': False, 'excluir': set()
+        })
+
+    def venta_de(venta_id):
+        return session.get(Venta, venta_id) if venta_id is not None else None
+
+    for pago in session.new:
+        if not isinstance(pago, Pago):
+            continue
+        if pago.fecha_pago is None:
+            pago.fecha_pago = datetime.now()
+        venta = pago.venta or venta_de(pago.venta_id)
+        if venta is None:
+            continue
+        pagos, mantenimiento = _aporte_pago(pago.monto, pago.concepto)
+        datos = cambio(venta)
+        datos['pagos'] += pagos
+        datos['mantenimiento'] += mantenimiento
+        datos['num'] += 1
+        datos['fechas'].append(pago.fecha_pago)
+
+    for pago in session.dirty:
+        if not isinstance(pago, Pago):
+            continue
+        # Cambiar observaciones o método de pago no afecta los acumulados
+        estado = inspect(pago)
+        if not any(estado.attrs[atributo].history.has_changes()
+                   for atributo in ('venta_id', 'monto', 'concepto', 'fecha_pago')):
+            continue
+        anterior = venta_de(_valor_anterior(pago, 'venta_id'))
+        if anterior is not None:
+            pagos, mantenimiento = _aporte_pago(_valor_anterior(pago, 'monto'),
+                                                _valor_anterior(pago, 'concepto'))
+            datos = cambio(anterior)
+            datos['pagos'] -= pagos
+            datos['mantenimiento'] -= mantenimiento
+            datos['num'] -= 1
+            datos['recalcular_fecha'] = True
+            datos['excluir'].add(pago.id)
+
+        actual = venta_de(pago.venta_id)
+        if actual is not None:
+            pagos, mantenimiento = _aporte_pago(pago.monto, pago.concepto)
+            datos = cambio(actual)
+            datos['pagos'] += pagos
+            datos['mantenimiento'] += mantenimiento
+            datos['num'] += 1
+            datos['fechas'].append(pago.fecha_pago)
+
+    for pago in session.deleted:
+        if not isinstance(pago, Pago):
+            continue
+        venta = venta_de(_valor_anterior(pago, 'venta_id'))
+        if venta is None:
+            continue
+        pagos, mantenimiento = _aporte_pago(_valor_anterior(pago, 'monto'),
+                                            _valor_anterior(pago, 'concepto'))
+        datos = cambio(venta)
+        datos['pagos'] -= pagos
+        datos['mantenimiento'] -= mantenimiento
+        datos['num'] -= 1
+        datos['recalcular_fecha'] = True
+        datos['excluir'].add(pago.id)
+
+    for venta, datos in cambios.items():
+        if venta in session.new:
+            venta.total_pagos = (venta.total_pagos or 0) + datos['pagos']
+            venta.total_mantenimiento = (venta.total_mantenimiento or 0) + datos['mantenimiento']
+            venta.num_pagos = (venta.num_pagos or 0) + datos['num']
+        else:
+            # Expresiones SQL: el incremento se aplica sobre el valor de la fila dentro de la transacción
+            venta.total_pagos = Venta.total_pagos + datos['pagos']
+            venta.total_mantenimiento = Venta.total_mantenimiento + datos['mantenimiento']
+            venta.num_pagos = Venta.num_pagos + datos['num']
+
+        fechas = datos['fechas']
+        if datos['recalcular_fecha'] and venta.id is not None:
+            # El pago editado o anulado pudo ser el último: buscar entre los demás
+            restantes = session.query(func.max(Pago.fecha_pago)).filter(
+                Pago.venta_id == venta.id, Pago.id.notin_(datos['excluir'])
+            ).scalar()
+            fechas.append(restantes)
+        else:
+            fechas.append(venta.fecha_ultimo_pago)
+        fechas = [fecha for fecha in fechas if fecha is not None]
+        venta.fecha_ultimo_pago = max(fechas) if fechas else None
+
+event.listen(SessionLocal, "before_flush", _acumular_pagos)
+
+def _consulta_acumulados_pagos():
+    """Acumulados de pagos calculados desde la tabla pagos, agrupados por venta"""
+    es_mantenimiento = Pago.concepto == 'Mantenimiento'
+    return select(
+        Pago.venta_id,
+        func.coalesce(func.sum(case((es_mantenimiento, 0), else_=Pago.monto)), 0).label("total_pagos"),
+        func.coalesce(func.sum(case((es_mantenimiento, Pago.monto), else_=0)), 0).label("total_mantenimiento"),
+        func.count(Pago.id).label("num_pagos"),
+        func.max(Pago.fecha_pago).label("fecha_ultimo_pago")
+    ).group_by(Pago.venta_id)
+
+def recalcular_acumulados_pagos(solo_pendientes=False):
+    """
+    Recalcular en bloque los acumulados de pagos y el saldo de las ventas
+
+    Args:
+        solo_pendientes: Solo las ventas sin acumulados (filas anteriores a la migración)
+
+    Returns:
+        int: Número de ventas actualizadas
+    """
+    acumulados = _consulta_acumulados_pagos().subquery()
+
+    def desde_pagos(columna, vacio):
+        return func.coalesce(
+            select(columna).where(acumulados.c.venta_id == Venta.id).scalar_subquery(), vacio
+        )
+
+    total_pagos = desde_pagos(acumulados.c.total_pagos, 0)
+    stmt = update(Venta).values(
+        total_pagos=total_pagos,
+        total_mantenimiento=desde_pagos(acumulados.c.total_mantenimiento, 0),
+        num_pagos=desde_pagos(acumulados.c.num_pagos, 0),
+        fecha_ultimo_pago=desde_pagos(acumulados.c.fecha_ultimo_pago, None),
+        saldo_restante=Venta.precio_total - Venta.enganche - total_pagos,
+        pagado_completamente=(Venta.precio_total - Venta.enganche - total_pagos) <= 0
+    )
+    if solo_pendientes:
+        stmt = stmt.where(Venta.num_pagos.is_(None))
+
+    db = get_db_session()
+    try:
+        resultado = db.execute(stmt, execution_options={"synchronize_session": False})
+        db.commit()
+        return resultado.rowcount
+    except Exception as e:
+        db.rollback()
+        print(f"Error al recalcular acumulados de pagos: {str(e)}")
+        return 0
+    finally:
+        db.close()
+
+def verificar_acumulados_pagos(tolerancia=0.005):
+    """
+    Comparar los acumulados guardados en ventas con los calculados desde pagos
+
+    Returns:
+        list: Diccionarios con el contrato y los valores guardados y esperados que difieren
+    """
+    acumulados = _consulta_acumulados_pagos().subquery()
+    stmt = select(
+        Venta.numero_contrato,
+        Venta.precio_total,
+        Venta.enganche,
+        Venta.saldo_restante,
+        Venta.total_pagos,
+        Venta.total_mantenimiento,
+        Venta.num_pagos,
+        Venta.fecha_ultimo_pago,
+        acumulados.c.total_pagos.label("esperado_pagos"),
+        acumulados.c.total_mantenimiento.label("esperado_mantenimiento"),
+        acumulados.c.num_pagos.label("esperado_num"),
+        acumulados.c.fecha_ultimo_pago.label("esperado_fecha")
+    ).outerjoin(acumulados, acumulados.c.venta_id == Venta.id)
+
+    db = get_db_session()
+    try:
+        diferencias = []
+        for fila in db.execute(stmt):
+            esperado_pagos = fila.esperado_pagos or 0
+            esperado = {
+                'total_pagos': esperado_pagos,
+                'total_mantenimiento': fila.esperado_mantenimiento or 0,
+                'num_pagos': fila.esperado_num or 0,
+                'fecha_ultimo_pago': fila.esperado_fecha,
+                'saldo_restante': fila.precio_total - fila.enganche - esperado_pagos
+            }
+            for campo, valor in esperado.items():
+                guardado = getattr(fila, campo)
+                if campo in ('total_pagos', 'total_mantenimiento', 'saldo_restante'):
+                    distinto = guardado is None or abs(guardado - valor) > tolerancia
+                else:
+                    distinto = guardado != valor
+                if distinto:
+                    diferencias.append({
+                        'contrato': fila.numero_contrato,
+                        'campo': campo,
+                        'guardado': guardado,
+                        'esperado': valor
+                    })
+        return diferencias
+    finally:
+        db.close()
+
 # Funciones auxiliares para manejo de la base de datos
 def get_db_session():
     """Obtener una nueva sesión de base de datos"""
@@ -217,6 +584,55 @@ def get_db_session():
     finally:
         pass  # No cerramos aquí, se debe cerrar manualmente
 
+def crear_indices_faltantes():
+    """Crear los índices definidos en los modelos que aún no existan en una base de datos previa"""
+    # create_all solo crea índices junto con tablas nuevas; las bases existentes los necesitan aparte
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=engine, checkfirst=True)
+            except Exception as e:
+                print(f"Error al crear índice '{index.name}': {str(e)}")
+
+def rellenar_columnas_normalizadas(todas=False):
+    """
+    Llenar las columnas normalizadas de filas existentes
+
+    Args:
+        todas: Recalcular todas las filas y no solo las que aún no tienen valor
+
+    Returns:
+        int: Número de filas actualizadas
+    """
+    db = get_db_session()
+    try:
+        actualizadas = 0
+        for modelo, columnas in COLUMNAS_NORMALIZADAS.items():
+            origenes = [getattr(modelo, origen) for origen, _ in columnas.values()]
+            query = db.query(modelo.id, *origenes)
+            if not todas:
+                query = query.filter(or_(*[getattr(modelo, destino).is_(None) for destino in columnas]))
+
+            cambios = []
+            for fila in query.all():
+                valores = {"id": fila[0]}
+                for indice, (destino, (_, funcion)) in enumerate(columnas.items(), start=1):
+                    valores[destino] = funcion(fila[indice])
+                cambios.append(valores)
+
+            if cambios:
+                # Actualización masiva por clave primaria (no dispara los eventos before_update)
+                db.execute(update(modelo), cambios)
+                actualizadas += len(cambios)
+        db.commit()
+        return actualizadas
+    except Exception as e:
+        db.rollback()
+        print(f"Error al rellenar columnas normalizadas: {str(e)}")
+        return 0
+    finally:
+        db.close()
+
 def crear_cliente_con_cedula_automatica(nombre, apellido, telefono=None, email=None, direccion=None):
     """Crear un nuevo cliente con cédula generada automáticamente"""
     db = get_db_session()
@@ -285,54 +701,100 @@ def buscar_cliente_por_cedula(cedula):
     finally:
         db.close()
 
-def generar_numero_contrato():
-    """Generar número único de contrato"""
-    db = get_db_session()
-    try:
-        # Obtener el último número de contrato
-        ultima_venta = db.query(Venta).order_by(Venta.id.desc()).first()
-        if ultima_venta:
-            ultimo_numero = int(ultima_venta.numero_contrato.split('-')[-1])
-            nuevo_numero = ultimo_numero + 1
-        else:
-            nuevo_numero = 1
-        
-        # Formato: CRIPTA-YYYY-NNNN
-        year = datetime.now().year
-        return f"CRIPTA-{year}-{nuevo_numero:04d}"
-    finally:
-        db.close()
+def _ultimo_sufijo(numeros):
+    """Mayor sufijo numérico de una lista de números con formato PREFIJO-AAAA-NNNN"""
+    ultimo = 0
+    for numero in numeros:
+        try:
+            ultimo = max(ultimo, int(numero.split('-')[-1]))
+        except (AttributeError, ValueError):
+            continue
+    return ultimo
+
+def _inicio_secuencia_contrato(db, year):
+    """Último contrato emitido en el año antes de que existiera el contador"""
+    return _ultimo_sufijo(n for (n,) in db.query(Venta.numero_contrato).filter(
+        Venta.numero_contrato.like(f"CRIPTA-{year}-%")
+    ))
+
+def _inicio_secuencia_recibo(db, year):
+    """Último recibo emitido en el año antes de que existiera el contador"""
+    return _ultimo_sufijo(n for (n,) in db.query(Pago.numero_recibo).filter(
+        Pago.numero_recibo.like(f"REC-{year}-%")
+    ))
+
+def _inicio_secuencia_urna(db, nicho_id):
+    """Número de urna más alto del nicho antes de que existiera el contador"""
+    return db.query(func.max(Urna.numero_urna)).join(Venta).filter(
+        Venta.nicho_id == nicho_id
+    ).scalar() or 0
+
+# Nombre de la secuencia -> función que calcula su valor inicial a partir de los datos existentes
+INICIO_SECUENCIAS = {
+    'contrato': _inicio_secuencia_contrato,
+    'recibo': _inicio_secuencia_recibo,
+    'urna': _inicio_secuencia_urna,
+}
+
+def siguiente_valor_secuencia(db, nombre, periodo):
+    """
+    Incrementar un contador dentro de la transacción de la sesión recibida
+
+    El UPDATE toma el bloqueo de escritura de SQLite hasta el commit del llamador, por lo
+    que dos ventanas (o dos equipos) no pueden obtener el mismo valor. Si el llamador hace
+    rollback, el número también se libera.
+
+    Args:
+        db: Sesión del llamador (no se hace commit aquí)
+        nombre: Nombre de la secuencia ('contrato', 'recibo' o 'urna')
+        periodo: Año o id de nicho al que pertenece el contador
+
+    Returns:
+        int: Nuevo valor del contador
+    """
+    condicion = (Secuencia.nombre == nombre) & (Secuencia.periodo == periodo)
+    resultado = db.execute(
+        update(Secuencia).where(condicion).values(valor=Secuencia.valor + 1),
+        execution_options={"synchronize_session": False}
+    )
+    if resultado.rowcount == 0:
+        # Primer uso del periodo: continuar desde los números que ya existen
+        inicio = INICIO_SECUENCIAS[nombre](db, periodo) if nombre in INICIO_SECUENCIAS else 0
+        db.execute(insert(Secuencia).values(nombre=nombre, periodo=periodo, valor=inicio + 1))
+        return inicio + 1
+
+    return db.execute(select(Secuencia.valor).where(condicion)).scalar_one()
+
+def _con_sesion(db, generar):
+    """Ejecutar generar(db) con la sesión dada o con una propia que se confirma al final"""
+    if db is not None:
+        return generar(db)
 
-def generar_numero_recibo():
-    """Generar número único de recibo"""
     db = get_db_session()
     try:
-        # Obtener el último número de recibo
-        ultimo_pago = db.query(Pago).order_by(Pago.id.desc()).first()
-        if ultimo_pago:
-            ultimo_numero = int(ultimo_pago.numero_recibo.split('-')[-1])
-            nuevo_numero = ultimo_numero + 1
-        else:
-            nuevo_numero = 1
-
-        # Formato: REC-YYYY-NNNN
-        year = datetime.now().year
-        return f"REC-{year}-{nuevo_numero:04d}"
+        valor = generar(db)
+        db.commit()
+        return valor
+    except Exception:
+        db.rollback()
+        raise
     finally:
         db.close()
 
-def generar_numero_urna_para_nicho(nicho_id):
+def generar_numero_contrato(db=None):
+    """Generar número único de contrato (con db, dentro de la transacción del llamador)"""
+    year = datetime.now().year
+    numero = _con_sesion(db, lambda sesion: siguiente_valor_secuencia(sesion, 'contrato', year))
+    # Formato: CRIPTA-YYYY-NNNN
+    return f"CRIPTA-{year}-{numero:04d}"
+
+def generar_numero_recibo(db=None):
+    """Generar número único de recibo (con db, dentro de la transacción del llamador)"""
+    year = datetime.now().year
+    numero = _con_sesion(db, lambda sesion: siguiente_valor_secuencia(sesion, 'recibo', year))
+    # Formato: REC-YYYY-NNNN
+    return f"REC-{year}-{numero:04d}"
+
+def generar_numero_urna_para_nicho(nicho_id, db=None):
     """Generar número de urna para un nicho específico (incrementa por nicho)"""
-    db = get_db_session()
-    try:
-        # Obtener todas las urnas para este nicho a través de las ventas
-        ultima_urna = db.query(Urna).join(Venta).filter(
-            Venta.nicho_id == nicho_id
-        ).order_by(Urna.numero_urna.desc()).first()
-
-        if ultima_urna:
-            return ultima_urna.numero_urna + 1
-        else:
-            return 1
-    finally:
-        db.close()
\ No newline at end of file
+    return _con_sesion(db, lambda sesion: siguiente_valor_secuencia(sesion, 'urna', nicho_id))
\ No newline at end of file
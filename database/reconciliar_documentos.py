@@ -0,0 +1,35 @@
+"""
+Script para volver a indexar los PDF de las carpetas de títulos y recibos en la tabla documentos
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.models import Base, engine
+from database.documentos import reconciliar_documentos, directorios_documentos
+
+def reconciliar(directorios=None):
+    """Sincronizar la tabla documentos con los archivos y mostrar el resultado"""
+    # La tabla puede no existir si la aplicación no se ha abierto desde la actualización
+    Base.metadata.create_all(bind=engine)
+
+    directorios = directorios or directorios_documentos()
+    for directorio in directorios:
+        print(f"Carpeta: {directorio}")
+
+    resultado = reconciliar_documentos(directorios)
+    print(f"\n✓ Agregados: {resultado['agregados']}")
+    print(f"✓ Actualizados: {resultado['actualizados']}")
+    print(f"✓ Eliminados (archivo inexistente): {resultado['eliminados']}")
+    return resultado
+
+if __name__ == "__main__":
+    print("=== Reconciliación del índice de documentos ===\n")
+
+    # Carpetas adicionales como argumentos (por ejemplo, una carpeta "titulos" antigua)
+    extras = [os.path.abspath(ruta) for ruta in sys.argv[1:]]
+    reconciliar(directorios_documentos() + extras if extras else None)
+
+    print("\n=== Reconciliación completada ===")
@@ -0,0 +1,132 @@
+# database/resumen_financiero.py
+"""
+Resumen financiero calculado con agregados agrupados en SQL
+"""
+
+from sqlalchemy import select, func, case, literal, union_all, true
+from database.models import Venta, Pago, Nicho
+from database.consultas import condiciones_fechas
+
+# Periodos de hasta este número de días se desglosan por día; los más largos, por mes
+MAX_DIAS_DESGLOSE_DIARIO = 31
+
+
+def _sumar_si(condicion, valor):
+    """Suma condicional de un valor"""
+    return func.coalesce(func.sum(case((condicion, valor), else_=0)), 0)
+
+
+def consulta_totales(fecha_inicio=None, fecha_fin=None):
+    """Totales del período y saldo pendiente en una sola fila"""
+    es_mantenimiento = Pago.concepto == 'Mantenimiento'
+
+    ventas = select(
+        func.count(Venta.id).label("ventas_count"),
+        func.coalesce(func.sum(Venta.precio_total), 0).label("ventas_monto")
+    ).where(*condiciones_fechas(Venta.fecha_venta, fecha_inicio, fecha_fin)).subquery()
+
+    pagos = select(
+        _sumar_si(~es_mantenimiento, 1).label("pagos_count"),
+        _sumar_si(~es_mantenimiento, Pago.monto).label("pagos_monto"),
+        _sumar_si(es_mantenimiento, 1).label("mantenimiento_count"),
+        _sumar_si(es_mantenimiento, Pago.monto).label("mantenimiento_monto")
+    ).where(*condiciones_fechas(Pago.fecha_pago, fecha_inicio, fecha_fin)).subquery()
+
+    saldos = select(
+        func.coalesce(func.sum(Venta.saldo_restante), 0).label("saldo_pendiente")
+    ).where(Venta.pagado_completamente == False).subquery()
+
+    return select(ventas, pagos, saldos).select_from(
+        ventas.join(pagos, true()).join(saldos, true())
+    )
+
+
+def consulta_desgloses(fecha_inicio=None, fecha_fin=None, por_dia=True):
+    """
+    Desgloses agrupados en una sola sentencia (UNION ALL de un GROUP BY por dimensión)
+
+    Cada fila trae: origen ('pagos', 'ventas' o 'saldos'), dimension ('dia', 'mes',
+    'metodo' o 'seccion'), clave, cantidad, monto y mantenimiento.
+    """
+    es_mantenimiento = Pago.concepto == 'Mantenimiento'
+    rango_pagos = condiciones_fechas(Pago.fecha_pago, fecha_inicio, fecha_fin)
+    rango_ventas = condiciones_fechas(Venta.fecha_venta, fecha_inicio, fecha_fin)
+
+    periodo = "dia" if por_dia else "mes"
+    formato = "%Y-%m-%d" if por_dia else "%Y-%m"
+
+    def pagos_por(dimension, clave, con_seccion=False):
+        stmt = select(
+            literal("pagos").label("origen"),
+            literal(dimension).label("dimension"),
+            clave.label("clave"),
+            func.count(Pago.id).label("cantidad"),
+            _sumar_si(~es_mantenimiento, Pago.monto).label("monto"),
+            _sumar_si(es_mantenimiento, Pago.monto).label("mantenimiento")
+        ).select_from(Pago)
+        if con_seccion:
+            stmt = stmt.join(Venta, Pago.venta_id == Venta.id).join(Nicho, Venta.nicho_id == Nicho.id)
+        return stmt.where(*rango_pagos).group_by(clave)
+
+    def ventas_por(dimension, clave):
+        return select(
+            literal("ventas").label("origen"),
+            literal(dimension).label("dimension"),
+            clave.label("clave"),
+            func.count(Venta.id).label("cantidad"),
+            func.coalesce(func.sum(Venta.precio_total), 0).label("monto"),
+            literal(0).label("mantenimiento")
+        ).select_from(Venta).join(Nicho, Venta.nicho_id == Nicho.id).where(
+            *rango_ventas
+        ).group_by(clave)
+
+    saldos_por_seccion = select(
+        literal("saldos").label("origen"),
+        literal("seccion").label("dimension"),
+        Nicho.seccion.label("clave"),
+        func.count(Venta.id).label("cantidad"),
+        func.coalesce(func.sum(Venta.saldo_restante), 0).label("monto"),
+        literal(0).label("mantenimiento")
+    ).select_from(Venta).join(Nicho, Venta.nicho_id == Nicho.id).where(
+        Venta.pagado_completamente == False
+    ).group_by(Nicho.seccion)
+
+    return union_all(
+        pagos_por(periodo, func.strftime(formato, Pago.fecha_pago)),
+        pagos_por("metodo", Pago.metodo_pago),
+        pagos_por("seccion", Nicho.seccion, con_seccion=True),
+        ventas_por(periodo, func.strftime(formato, Venta.fecha_venta)),
+        ventas_por("seccion", Nicho.seccion),
+        saldos_por_seccion
+    )
+
+
+def obtener_resumen_financiero(db, fecha_inicio=None, fecha_fin=None):
+    """
+    Calcular el resumen financiero en dos viajes a la base de datos
+
+    Args:
+        db: Sesión de base de datos
+        fecha_inicio: Fecha inicial del período (None = sin límite)
+        fecha_fin: Fecha final del período (None = sin límite)
+
+    Returns:
+        dict: 'totales' (dict), 'periodo' ('dia' o 'mes') y 'desgloses', un dict
+              {(origen, dimension): [filas ordenadas por clave]}
+    """
+    totales = dict(db.execute(consulta_totales(fecha_inicio, fecha_fin)).mappings().one())
+
+    por_dia = bool(fecha_inicio and fecha_fin and
+                   (fecha_fin - fecha_inicio).days < MAX_DIAS_DESGLOSE_DIARIO)
+
+    desgloses = {}
+    for fila in db.execute(consulta_desgloses(fecha_inicio, fecha_fin, por_dia)):
+        desgloses.setdefault((fila.origen, fila.dimension), []).append(fila)
+    for filas in desgloses.values():
+        filas.sort(key=lambda fila: fila.clave or "")
+
+    return {
+        'totales': totales,
+        'periodo': 'dia' if por_dia else 'mes',
+        'desgloses': desgloses
+    }
@@ -0,0 +1,37 @@
+"""
+Script para verificar (y corregir) los acumulados de pagos guardados en la tabla ventas
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.models import verificar_acumulados_pagos, recalcular_acumulados_pagos
+
+def verificar(corregir=False):
+    """Mostrar las ventas cuyos acumulados no coinciden con sus pagos y opcionalmente recalcularlos"""
+    diferencias = verificar_acumulados_pagos()
+
+    if not diferencias:
+        print("✓ Los acumulados de pagos coinciden con la tabla pagos")
+        return True
+
+    for diferencia in diferencias:
+        print(f"Contrato {diferencia['contrato']}: {diferencia['campo']} "
+              f"guardado={diferencia['guardado']} esperado={diferencia['esperado']}")
+    print(f"\n{len(diferencias)} diferencias encontradas")
+
+    if corregir:
+        actualizadas = recalcular_acumulados_pagos()
+        print(f"✓ Acumulados recalculados para {actualizadas} ventas")
+        return not verificar_acumulados_pagos()
+    return False
+
+if __name__ == "__main__":
+    print("=== Verificación de acumulados de pagos ===\n")
+
+    if verificar(corregir="--corregir" in sys.argv):
+        print("\n=== Verificación completada sin diferencias ===")
+    else:
+        print("\n=== Hay diferencias (use --corregir para recalcular) ===")
@@ -12,14 +12,16 @@ import os
 import shutil
 import json
 from pathlib import Path
-import threading
-import schedule
-import time
+import multiprocessing
 
 # Importaciones de nuestros módulos
 from config.paths import AppPaths
-from database.models import Base, engine, SessionLocal
+from database.models import Base, engine, SessionLocal, crear_indices_faltantes, rellenar_columnas_normalizadas
+from database.models import SQLITE_PROFILE_NAME, obtener_configuracion_sqlite, recalcular_acumulados_pagos
 from database.models import Nicho, Cliente, Venta, Pago, Beneficiario
+from database.busqueda_fts import crear_indice_busqueda
+from database.documentos import indexar_documentos_iniciales
+from database.contador_escrituras import crear_contador_escrituras
 from ui.main_window import MainWindow
 from reports.pdf_generator import PDFGenerator
 from backup.backup_manager import BackupManager
@@ -63,9 +65,6 @@ class CriptasApp:
             github_token=github_token
         )
 
-        # Configurar respaldos automáticos
-        self.setup_auto_backup()
-
         # Verificar actualizaciones al iniciar (silenciosamente)
         self.check_for_updates_on_startup()
     
@@ -86,14 +85,43 @@ class CriptasApp:
             self.migrate_database()
 
             Base.metadata.create_all(bind=engine)
+
+            # Bases de datos existentes no reciben los índices nuevos con create_all
+            crear_indices_faltantes()
+
+            # Copias normalizadas de nombres y números para filas anteriores
+            actualizadas = rellenar_columnas_normalizadas()
+            if actualizadas:
+                print(f"Columnas normalizadas rellenadas en {actualizadas} filas")
+
+            # Acumulados de pagos de ventas registradas antes de la migración
+            actualizadas = recalcular_acumulados_pagos(solo_pendientes=True)
+            if actualizadas:
+                print(f"Acumulados de pagos calculados para {actualizadas} ventas")
+
+            # Índice de texto completo que usan las cajas de búsqueda
+            crear_indice_busqueda()
+
+            # Escrituras pendientes de respaldo (disparan los respaldos por cambios)
+            crear_contador_escrituras()
+
+            # Índice de los PDF generados antes de que existiera la tabla documentos
+            indexados = indexar_documentos_iniciales()
+            if indexados:
+                print(f"Documentos existentes indexados: {indexados}")
             print("Base de datos inicializada correctamente")
+
+            # Informar la configuración efectiva de SQLite
+            activos = obtener_configuracion_sqlite()
+            detalles = ", ".join(f"{pragma}={valor}" for pragma, valor in activos.items())
+            print(f"Perfil SQLite '{SQLITE_PROFILE_NAME}': {detalles}")
         except Exception as e:
             messagebox.showerror("Error", f"Error al inicializar la base de datos: {str(e)}")
 
     def migrate_database(self):
         """Ejecutar migraciones de base de datos de forma escalable"""
         try:
-            db_path = "criptas.db"
+            db_path = AppPaths.get_database_path()
             if os.path.exists(db_path):
                 conn = sqlite3.connect(db_path)
                 cursor = conn.cursor()
@@ -104,7 +132,21 @@ class CriptasApp:
                         'familia': 'VARCHAR(100)',
                         'fecha_ultimo_pago': 'DATETIME',
                         'mantenimiento_pagado': 'BOOLEAN DEFAULT 0',
-                        'fecha_proximo_mantenimiento': 'DATETIME'
+                        'fecha_proximo_mantenimiento': 'DATETIME',
+                        # Sin DEFAULT: NULL marca las ventas cuyos acumulados aún no se calculan
+                        'total_pagos': 'FLOAT',
+                        'total_mantenimiento': 'FLOAT',
+                        'num_pagos': 'INTEGER'
+                    },
+                    'clientes': {
+                        'nombre_normalizado': 'VARCHAR(100)',
+                        'apellido_normalizado': 'VARCHAR(100)'
+                    },
+                    'nichos': {
+                        'numero_normalizado': 'VARCHAR(20)'
+                    },
+                    'urnas': {
+                        'nombre_difunto_normalizado': 'VARCHAR(100)'
                     }
                 }
 
@@ -139,20 +181,6 @@ class CriptasApp:
         except Exception as e:
             print(f"Error en migración: {str(e)}")
     
-    def setup_auto_backup(self):
-        """Configurar respaldos automáticos semanales"""
-        # Programar respaldo cada sábado a las 12:00 PM
-        schedule.every().saturday.at("12:00").do(self.backup_manager.create_backup)
-        
-        # Ejecutar scheduler en un hilo separado
-        def run_scheduler():
-            while True:
-                schedule.run_pending()
-                time.sleep(60)  # Verificar cada minuto
-        
-        backup_thread = threading.Thread(target=run_scheduler, daemon=True)
-        backup_thread.start()
-    
     def check_for_updates_on_startup(self):
         """Verificar actualizaciones al iniciar la aplicación (silenciosamente)"""
         try:
@@ -179,5 +207,7 @@ class CriptasApp:
             messagebox.showerror("Error Fatal", f"Error en la aplicación: {str(e)}")
 
 if __name__ == "__main__":
+    # Necesario en el ejecutable empaquetado para los procesos de trabajo (títulos en lote)
+    multiprocessing.freeze_support()
     app = CriptasApp()
     app.run()
\ No newline at end of file
@@ -0,0 +1,177 @@
+# reports/cola_documentos.py
+"""
+Cola de documentos: genera recibos, títulos y consentimientos en un hilo de fondo
+"""
+
+import itertools
+import queue
+import threading
+from datetime import datetime
+from database.documentos import RECIBO, TITULO, CONSENTIMIENTO_URNA, registrar_documento
+
+# Tipo de documento y el método de PDFGenerator que lo genera
+METODOS_DOCUMENTO = {
+    RECIBO: 'generar_recibo_pago',
+    TITULO: 'generar_titulo_propiedad',
+    CONSENTIMIENTO_URNA: 'generar_consentimiento_urna',
+}
+
+# Estados de un trabajo
+PENDIENTE = 'pendiente'
+EN_PROCESO = 'en_proceso'
+TERMINADO = 'terminado'
+FALLIDO = 'fallido'
+
+# Intentos por documento antes de darlo por fallido
+MAX_INTENTOS = 3
+
+# Segundos antes del primer reintento (se duplica en cada intento)
+ESPERA_REINTENTO = 1.0
+
+
+def _referencias(tipo, datos):
+    """Contrato y recibo con los que se indexa el documento en la tabla documentos"""
+    if tipo == TITULO:
+        return datos[0]['numero_contrato'], None
+    if tipo == RECIBO:
+        return datos[1]['numero_contrato'], datos[0]['numero_recibo']
+    return datos[1]['numero_contrato'], None
+
+
+class TrabajoDocumento:
+    """Documento solicitado a la cola y su estado"""
+
+    def __init__(self, id, tipo, datos, descripcion='', al_terminar=None):
+        """
+        Args:
+            id: Identificador del trabajo dentro de la cola
+            tipo: RECIBO, TITULO o CONSENTIMIENTO_URNA
+            datos: Argumentos del método de PDFGenerator (diccionarios ya leídos de la base de datos)
+            descripcion: Texto para la barra de estado y los mensajes
+            al_terminar: Función que recibe el trabajo cuando termina o falla
+        """
+        self.id = id
+        self.tipo = tipo
+        self.datos = datos
+        self.descripcion = descripcion
+        self.al_terminar = al_terminar
+        self.estado = PENDIENTE
+        self.intentos = 0
+        self.ruta = None
+        self.error = None
+        self.creado = datetime.now()
+        self.terminado = None
+
+    @property
+    def finalizado(self):
+        return self.estado in (TERMINADO, FALLIDO)
+
+
+class ColaDocumentos:
+    """
+    Genera los documentos uno a uno en un hilo de trabajo
+
+    Los datos se copian a diccionarios antes de encolar, así el hilo no usa la sesión
+    de quien pidió el documento. Los trabajos finalizados se guardan en una cola que
+    la interfaz vacía con entregar_terminados() desde el hilo de Tk, donde se llaman
+    las funciones al_terminar.
+    """
+
+    def __init__(self, max_intentos=MAX_INTENTOS, espera_reintento=ESPERA_REINTENTO):
+        self.max_intentos = max_intentos
+        self.espera_reintento = espera_reintento
+        self._pendientes = queue.Queue()
+        self._terminados = queue.Queue()
+        self._trabajos = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._hilo = None
+
+    def encolar(self, tipo, *datos, descripcion='', al_terminar=None):
+        """
+        Solicitar un documento
+
+        Returns:
+            TrabajoDocumento: El trabajo, para consultar su estado
+        """
+        if tipo not in METODOS_DOCUMENTO:
+            raise ValueError(f"Tipo de documento desconocido: {tipo}")
+
+        with self._lock:
+            trabajo = TrabajoDocumento(next(self._ids), tipo, datos, descripcion, al_terminar)
+            self._trabajos[trabajo.id] = trabajo
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._trabajar, daemon=True)
+                self._hilo.start()
+
+        self._pendientes.put(trabajo)
+        return trabajo
+
+    def estado(self, trabajo_id):
+        """Estado de un trabajo (None si no existe o ya se entregó)"""
+        trabajo = self._trabajos.get(trabajo_id)
+        return trabajo.estado if trabajo else None
+
+    def en_curso(self):
+        """Número de documentos que todavía no terminan"""
+        with self._lock:
+            return sum(1 for trabajo in self._trabajos.values() if not trabajo.finalizado)
+
+    def entregar_terminados(self):
+        """
+        Llamar las funciones al_terminar de los trabajos finalizados (desde el hilo de Tk)
+
+        Returns:
+            list: Trabajos entregados
+        """
+        entregados = []
+        while True:
+            try:
+                trabajo = self._terminados.get_nowait()
+            except queue.Empty:
+                break
+
+            with self._lock:
+                self._trabajos.pop(trabajo.id, None)
+            entregados.append(trabajo)
+
+            if trabajo.al_terminar:
+                try:
+                    trabajo.al_terminar(trabajo)
+                except Exception as e:
+                    print(f"Error al entregar el documento {trabajo.descripcion}: {str(e)}")
+        return entregados
+
+    def _trabajar(self):
+        """Generar los documentos pendientes con un PDFGenerator propio del hilo"""
+        from reports.pdf_generator import PDFGenerator
+        generador = PDFGenerator()
+
+        while True:
+            trabajo = self._pendientes.get()
+            trabajo.estado = EN_PROCESO
+            trabajo.intentos += 1
+            try:
+                metodo = getattr(generador, METODOS_DOCUMENTO[trabajo.tipo])
+                trabajo.ruta = metodo(*trabajo.datos)
+                registrar_documento(trabajo.tipo, trabajo.ruta, *_referencias(trabajo.tipo, trabajo.datos))
+                trabajo.error = None
+                trabajo.estado = TERMINADO
+            except Exception as e:
+                trabajo.error = e
+                if trabajo.intentos < self.max_intentos:
+                    # Reintentar más tarde (por ejemplo, si el visor tiene el archivo abierto)
+                    trabajo.estado = PENDIENTE
+                    espera = self.espera_reintento * 2 ** (trabajo.intentos - 1)
+                    reintento = threading.Timer(espera, self._pendientes.put, args=(trabajo,))
+                    reintento.daemon = True
+                    reintento.start()
+                    continue
+                print(f"Error al generar {trabajo.descripcion or trabajo.tipo}: {str(e)}")
+                trabajo.estado = FALLIDO
+
+            trabajo.terminado = datetime.now()
+            self._terminados.put(trabajo)
+
+
+cola_documentos = ColaDocumentos()
@@ -0,0 +1,234 @@
+# reports/dataset.py
+"""
+Conjuntos de datos tipados para reportes: esquema de columnas y filas recorridas en flujo
+"""
+
+import csv
+from itertools import chain, islice
+from operator import attrgetter
+
+# Tipos de columna
+TEXTO = 'texto'
+ENTERO = 'entero'
+MONEDA = 'moneda'
+FECHA = 'fecha'
+
+TIPOS_NUMERICOS = (ENTERO, MONEDA)
+
+# Formatos de celda de Excel por tipo de columna
+FORMATOS_EXCEL = {
+    ENTERO: '0',
+    MONEDA: '"$"#,##0.00',
+    FECHA: 'DD/MM/YYYY',
+}
+
+# Ancho máximo de una columna de Excel (en caracteres)
+ANCHO_MAXIMO_EXCEL = 50
+
+# Filas iniciales con las que se calculan los anchos de columna de Excel
+MUESTRA_ANCHOS_EXCEL = 1000
+
+# Ancho mínimo por tipo, para que un monto mayor que los de la muestra no se muestre como "###"
+ANCHOS_MINIMOS_EXCEL = {
+    MONEDA: 14,
+    FECHA: 12,
+}
+
+
+class Columna:
+    """Columna de un reporte: nombre, tipo del valor y cómo mostrarlo"""
+
+    def __init__(self, nombre, tipo=TEXTO, titulo=None, campo=None, vacio='', formato=None):
+        """
+        Args:
+            nombre: Identificador de la columna
+            tipo: TEXTO, ENTERO, MONEDA o FECHA
+            titulo: Encabezado visible (por defecto el nombre en formato título)
+            campo: Atributo de la fila de la consulta (por defecto el nombre)
+            vacio: Texto que se muestra cuando el valor es None
+            formato: Función que convierte el valor en texto (reemplaza la del tipo)
+        """
+        self.nombre = nombre
+        self.tipo = tipo
+        self.titulo = titulo or nombre.replace('_', ' ').title()
+        self.campo = campo or nombre
+        self.vacio = vacio
+        self.formato = formato
+
+    @property
+    def numerica(self):
+        return self.tipo in TIPOS_NUMERICOS
+
+    def formatear(self, valor):
+        """Texto que se muestra en la vista previa y en el PDF"""
+        if valor is None:
+            return self.vacio
+        if self.formato:
+            return self.formato(valor)
+        if self.tipo == MONEDA:
+            return f"${valor:,.2f}"
+        if self.tipo == ENTERO:
+            return str(int(valor))
+        if self.tipo == FECHA:
+            return valor.strftime('%d/%m/%Y')
+        return str(valor)
+
+    def valor_exportable(self, valor, conservar_fechas=False):
+        """Valor para CSV o Excel: los números se escriben como números, no como texto con '$'"""
+        if valor is None:
+            return self.vacio
+        if self.tipo == MONEDA:
+            return round(valor, 2)
+        if self.tipo == ENTERO:
+            return int(valor)
+        if self.tipo == FECHA and conservar_fechas:
+            return valor
+        return self.formatear(valor)
+
+
+class DatasetReporte:
+    """
+    Esquema de columnas y una fuente de filas tipadas que se puede recorrer varias veces
+
+    La fuente es una función que devuelve un iterable nuevo en cada llamada (normalmente
+    iterar_filas sobre una consulta), así la vista previa y cada exportación leen la base
+    de datos en flujo sin guardar todas las filas.
+    """
+
+    def __init__(self, titulo, columnas, fuente, total=None, filtro_total=None,
+                 fecha_inicio=None, fecha_fin=None):
+        """
+        Args:
+            titulo: Nombre del reporte
+            columnas: Lista de Columna en el orden de salida
+            fuente: Función sin argumentos que devuelve las filas de la consulta
+            total: Nombre de la columna numérica que se suma en estadísticas y totales
+            filtro_total: Función fila -> bool que indica qué filas suman (por defecto todas)
+            fecha_inicio: Inicio del período del reporte (None = sin límite)
+            fecha_fin: Fin del período del reporte (None = sin límite)
+        """
+        self.titulo = titulo
+        self.columnas = columnas
+        self.fuente = fuente
+        self.fecha_inicio = fecha_inicio
+        self.fecha_fin = fecha_fin
+
+        # Posición de la columna del total dentro de la fila tipada (None si no hay total)
+        self.indice_total = self.nombres.index(total) if total else None
+        self._filtro_total = filtro_total
+        self._obtener = attrgetter(*(columna.campo for columna in columnas))
+
+    @property
+    def nombres(self):
+        return [columna.nombre for columna in self.columnas]
+
+    @property
+    def encabezados(self):
+        return [columna.titulo for columna in self.columnas]
+
+    @property
+    def tiene_total(self):
+        return self.indice_total is not None
+
+    def filas(self):
+        """Tuplas de valores tipados en el orden de las columnas"""
+        for fila in self.fuente():
+            yield self._obtener(fila)
+
+    def formatear(self, fila):
+        """Textos de una fila tipada"""
+        return [columna.formatear(valor) for columna, valor in zip(self.columnas, fila)]
+
+    def filas_formateadas(self):
+        """Filas como textos, para la vista previa y el PDF"""
+        for fila in self.filas():
+            yield self.formatear(fila)
+
+    def monto(self, fila):
+        """Monto con el que la fila contribuye al total (None si no aplica)"""
+        if self.indice_total is None:
+            return None
+        if self._filtro_total and not self._filtro_total(fila):
+            return None
+        return fila[self.indice_total]
+
+
+def exportar_csv(dataset, filename):
+    """
+    Escribir el reporte en CSV recorriendo las filas en flujo
+
+    Returns:
+        int: Número de filas escritas
+    """
+    columnas = dataset.columnas
+    filas_escritas = 0
+    with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(dataset.encabezados)
+        for fila in dataset.filas():
+            writer.writerow([columna.valor_exportable(valor) for columna, valor in zip(columnas, fila)])
+            filas_escritas += 1
+    return filas_escritas
+
+
+def exportar_excel(dataset, filename):
+    """
+    Escribir el reporte en Excel en modo de solo escritura, con memoria acotada
+
+    Las filas se envían al archivo conforme llegan. Los anchos de columna deben fijarse
+    antes de la primera fila, así que se calculan con una muestra inicial de filas.
+
+    Returns:
+        int: Número de filas escritas
+    """
+    import openpyxl
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill
+    from openpyxl.utils import get_column_letter
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Reporte")
+
+    columnas = dataset.columnas
+    filas = dataset.filas()
+
+    # Anchos con el texto formateado del encabezado y de la muestra
+    muestra = list(islice(filas, MUESTRA_ANCHOS_EXCEL))
+    anchos = [max(len(columna.titulo), ANCHOS_MINIMOS_EXCEL.get(columna.tipo, 0)) for columna in columnas]
+    for fila in muestra:
+        for indice, (columna, valor) in enumerate(zip(columnas, fila)):
+            anchos[indice] = max(anchos[indice], len(columna.formatear(valor)))
+    for indice, ancho in enumerate(anchos, 1):
+        ws.column_dimensions[get_column_letter(indice)].width = min(ancho + 2, ANCHO_MAXIMO_EXCEL)
+
+    # Escribir encabezados con formato
+    fuente = Font(bold=True)
+    relleno = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
+    encabezados = []
+    for titulo in dataset.encabezados:
+        cell = WriteOnlyCell(ws, value=titulo)
+        cell.font = fuente
+        cell.fill = relleno
+        encabezados.append(cell)
+    ws.append(encabezados)
+
+    formatos = [FORMATOS_EXCEL.get(columna.tipo) for columna in columnas]
+
+    def celdas(fila):
+        """Números y fechas como celdas tipadas con su formato; el resto como texto"""
+        for columna, formato, valor in zip(columnas, formatos, fila):
+            valor = columna.valor_exportable(valor, conservar_fechas=True)
+            if formato and valor != '':
+                cell = WriteOnlyCell(ws, value=valor)
+                cell.number_format = formato
+                yield cell
+            else:
+                yield valor
+
+    filas_escritas = 0
+    for fila in chain(muestra, filas):
+        ws.append(list(celdas(fila)))
+        filas_escritas += 1
+
+    wb.save(filename)
+    return filas_escritas
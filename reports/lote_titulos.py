@@ -0,0 +1,117 @@
+# reports/lote_titulos.py
+"""
+Generación de títulos de propiedad en lote, repartida entre varios procesos
+"""
+
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, CancelledError, as_completed
+from datetime import datetime
+from config.paths import AppPaths
+from database.documentos import TITULO, registrar_documento
+
+# Generador de PDFs de cada proceso de trabajo (se crea una vez por proceso)
+_generador = None
+
+
+def _iniciar_proceso():
+    """Inicializador de los procesos de trabajo"""
+    global _generador
+    from reports.pdf_generator import PDFGenerator
+    _generador = PDFGenerator()
+
+
+def _renderizar_titulo(datos):
+    """Generar el PDF de un título (se ejecuta en un proceso de trabajo)"""
+    return _generador.generar_titulo_propiedad(
+        datos['venta'], datos['cliente'], datos['nicho'], datos['beneficiarios']
+    )
+
+
+def _renderizar_combinado(titulos_data, output_path):
+    """Generar el PDF con todos los títulos juntos (se ejecuta en un proceso de trabajo)"""
+    return _generador.generar_titulos_combinados(titulos_data, output_path)
+
+
+class LoteTitulos:
+    """
+    Renderiza títulos en un ProcessPoolExecutor desde un hilo de fondo
+
+    El avance se publica en la cola `eventos` para que la interfaz la lea con after():
+    ('progreso', completados, total, mensaje) por cada documento y ('fin', resultado) al terminar.
+    """
+
+    def __init__(self, titulos_data, combinar=False, max_procesos=None):
+        """
+        Args:
+            titulos_data: Lista de obtener_datos_titulos (un diccionario por venta)
+            combinar: Generar además un solo PDF con todos los títulos
+            max_procesos: Procesos de trabajo (por defecto uno por núcleo)
+        """
+        self.titulos_data = titulos_data
+        self.combinar = combinar
+        self.max_procesos = max_procesos or os.cpu_count() or 1
+        self.eventos = queue.Queue()
+        self._cancelado = threading.Event()
+        self._hilo = None
+
+    @property
+    def total(self):
+        return len(self.titulos_data) + (1 if self.combinar else 0)
+
+    def iniciar(self):
+        """Iniciar la generación en segundo plano"""
+        self._hilo = threading.Thread(target=self._ejecutar, daemon=True)
+        self._hilo.start()
+
+    def cancelar(self):
+        """Pedir la cancelación: no se inician más documentos y se esperan los que están en curso"""
+        self._cancelado.set()
+
+    def _ejecutar(self):
+        """Repartir los títulos entre los procesos y publicar el avance"""
+        resultado = {'generados': [], 'combinado': None, 'errores': [], 'cancelado': False}
+        completados = 0
+        try:
+            with ProcessPoolExecutor(max_workers=self.max_procesos,
+                                     initializer=_iniciar_proceso) as executor:
+                futuros = {}
+                # El combinado es el trabajo más largo: se envía primero para que corra en paralelo
+                if self.combinar:
+                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                    ruta = os.path.join(AppPaths.get_titulos_dir(), f"titulos_lote_{timestamp}.pdf")
+                    futuros[executor.submit(_renderizar_combinado, self.titulos_data, ruta)] = None
+                for datos in self.titulos_data:
+                    futuro = executor.submit(_renderizar_titulo, datos)
+                    futuros[futuro] = datos['venta']['numero_contrato']
+
+                for futuro in as_completed(futuros):
+                    numero_contrato = futuros[futuro]
+                    try:
+                        ruta = futuro.result()
+                        if numero_contrato is None:
+                            resultado['combinado'] = ruta
+                            mensaje = "PDF combinado generado"
+                        else:
+                            registrar_documento(TITULO, ruta, numero_contrato)
+                            resultado['generados'].append(ruta)
+                            mensaje = f"Título generado para {numero_contrato}"
+                    except CancelledError:
+                        continue
+                    except Exception as e:
+                        etiqueta = numero_contrato or "PDF combinado"
+                        resultado['errores'].append(f"Error en {etiqueta}: {str(e)}")
+                        mensaje = f"Error en {etiqueta}"
+
+                    completados += 1
+                    self.eventos.put(('progreso', completados, self.total, mensaje))
+
+                    if self._cancelado.is_set():
+                        resultado['cancelado'] = True
+                        executor.shutdown(wait=True, cancel_futures=True)
+                        break
+        except Exception as e:
+            resultado['errores'].append(f"Error en el lote: {str(e)}")
+
+        self.eventos.put(('fin', resultado))
@@ -0,0 +1,144 @@
+"""
+Script para medir el tiempo y la memoria de exportar un reporte de pagos a Excel
+con el libro en memoria anterior y con el libro de solo escritura de exportar_excel
+
+Cada forma se ejecuta en un proceso aparte, porque el pico de memoria (RSS) de un
+proceso nunca baja y la primera medición ocultaría a la segunda.
+
+La forma anterior crece de manera cuadrática (ws.max_row recorre todas las celdas en
+cada fila): con 100000 filas tarda más de una hora. Para una medición rápida se puede
+indicar menos filas, por ejemplo: python reports/medir_excel.py 20000
+"""
+
+import sys
+import os
+import subprocess
+import tempfile
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reports.dataset import (
+    DatasetReporte, Columna, MONEDA, FECHA, FORMATOS_EXCEL, ANCHO_MAXIMO_EXCEL, exportar_excel
+)
+
+FilaPago = namedtuple('FilaPago', 'recibo fecha cliente monto metodo concepto contrato')
+
+COLUMNAS = [
+    Columna('recibo', titulo="N° Recibo"),
+    Columna('fecha', FECHA),
+    Columna('cliente'),
+    Columna('monto', MONEDA),
+    Columna('metodo', titulo="Método"),
+    Columna('concepto'),
+    Columna('contrato'),
+]
+
+
+def reporte_generado(num_filas):
+    """Reporte de pagos cuyas filas se generan al recorrerlo, sin base de datos"""
+    inicio = datetime(2024, 1, 1)
+
+    def fuente():
+        for i in range(num_filas):
+            yield FilaPago(f"R-{i:06d}", inicio + timedelta(minutes=i), f"Cliente {i} Apellido {i}",
+                           1000.0 + i, "efectivo", "Abono", f"CT-{i % 5000:05d}")
+
+    return DatasetReporte("Pagos", COLUMNAS, fuente, total='monto')
+
+
+def exportar_excel_en_memoria(dataset, filename):
+    """
+    Forma anterior de exportar_excel: todas las celdas en un Workbook en memoria
+
+    Returns:
+        int: Número de filas escritas
+    """
+    import openpyxl
+    from openpyxl.styles import Font, PatternFill
+    from openpyxl.utils import get_column_letter
+
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Reporte"
+
+    columnas = dataset.columnas
+    ws.append(dataset.encabezados)
+    for cell in ws[1]:
+        cell.font = Font(bold=True)
+        cell.fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
+
+    anchos = [len(titulo) for titulo in dataset.encabezados]
+    formatos = [FORMATOS_EXCEL.get(columna.tipo) for columna in columnas]
+
+    filas_escritas = 0
+    for fila in dataset.filas():
+        ws.append([columna.valor_exportable(valor, conservar_fechas=True)
+                   for columna, valor in zip(columnas, fila)])
+        for cell, formato in zip(ws[ws.max_row], formatos):
+            if formato and cell.value != '':
+                cell.number_format = formato
+        for indice, (columna, valor) in enumerate(zip(columnas, fila)):
+            anchos[indice] = max(anchos[indice], len(columna.formatear(valor)))
+        filas_escritas += 1
+
+    for indice, ancho in enumerate(anchos, 1):
+        ws.column_dimensions[get_column_letter(indice)].width = min(ancho + 2, ANCHO_MAXIMO_EXCEL)
+
+    wb.save(filename)
+    return filas_escritas
+
+
+# Nombre de cada forma -> función de exportación
+FORMAS = {
+    "Libro en memoria (anterior)": exportar_excel_en_memoria,
+    "Solo escritura (actual)": exportar_excel,
+}
+
+
+def pico_rss_mb():
+    """Pico de memoria residente del proceso en MB, o None si no se puede consultar"""
+    try:
+        import resource
+    except ImportError:  # Windows no tiene el módulo resource
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo da en KB y macOS en bytes
+    return pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024
+
+
+def medir_forma(nombre, num_filas):
+    """Exportar con una forma en este proceso e imprimir segundos y pico de RSS"""
+    salida = os.path.join(tempfile.mkdtemp(), "reporte.xlsx")
+    inicio = time.perf_counter()
+    FORMAS[nombre](reporte_generado(num_filas), salida)
+    segundos = time.perf_counter() - inicio
+    print(f"{segundos}\t{pico_rss_mb()}")
+
+
+def medir_exportaciones(num_filas=100000):
+    """Mostrar tiempo y pico de RSS de cada forma, cada una en un proceso nuevo"""
+    print(f"Filas: {num_filas}, columnas: {len(COLUMNAS)}\n")
+    print(f"{'Forma':<32}{'Tiempo':>10}{'Pico RSS':>12}")
+    for nombre in FORMAS:
+        resultado = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--forma", nombre, str(num_filas)],
+            capture_output=True, text=True, check=True
+        )
+        segundos, pico = resultado.stdout.strip().splitlines()[-1].split("\t")
+        pico = f"{float(pico):>9.1f} MB" if pico != "None" else f"{'n/d':>12}"
+        print(f"{nombre:<32}{float(segundos):>9.2f}s{pico}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 3 and sys.argv[1] == "--forma":
+        medir_forma(sys.argv[2], int(sys.argv[3]))
+        sys.exit(0)
+
+    print("=== Medición de exportación a Excel ===\n")
+
+    medir_exportaciones(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
+
+    print("\n=== Medición completada ===")
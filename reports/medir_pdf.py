@@ -0,0 +1,75 @@
+"""
+Script para medir el tiempo de generación de recibos y títulos con y sin la caché de recursos_pdf
+"""
+
+import sys
+import os
+import tempfile
+import statistics
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reports.pdf_generator import PDFGenerator
+from reports.recursos_pdf import recursos_pdf
+
+# Datos de ejemplo de un pago y de una venta
+PAGO = {'numero_recibo': "R-2024-0001", 'fecha_pago': datetime(2024, 5, 1), 'concepto': "Abono",
+        'metodo_pago': "efectivo", 'monto': 1500.0}
+VENTA = {'numero_contrato': "CT-2024-0001", 'fecha_venta': datetime(2024, 1, 15), 'precio_total': 25000.0,
+         'saldo_restante': 18500.0, 'pagado_completamente': False, 'tipo_pago': "credito", 'observaciones': ""}
+CLIENTE = {'nombre': "Juan", 'apellido': "Pérez López", 'cedula': "ABC123", 'telefono': "3312345678",
+           'email': "", 'direccion': "Calle 1 #100"}
+NICHO = {'numero': "A-101", 'seccion': "A", 'fila': "1", 'columna': "1", 'precio': 25000.0, 'descripcion': ""}
+BENEFICIARIOS = [{'nombre': "María", 'apellido': "Pérez", 'cedula': "DEF456", 'telefono': "3387654321",
+                  'email': "", 'direccion': "Calle 1 #100", 'orden': 1}]
+
+
+def medir(funcion, repeticiones, en_frio=False):
+    """
+    Mediana en milisegundos de cada llamada
+
+    Args:
+        en_frio: Vaciar la caché de recursos antes de cada llamada (como sin caché)
+    """
+    funcion()
+    tiempos = []
+    for _ in range(repeticiones):
+        if en_frio:
+            recursos_pdf.invalidar()
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos) * 1000
+
+
+def medir_documentos(repeticiones=200):
+    """Mostrar el tiempo por documento en frío y con la caché, y cuánto es armar el contenido"""
+    generador = PDFGenerator()
+    salida = os.path.join(tempfile.mkdtemp(), "documento.pdf")
+
+    casos = {
+        "Recibo (documento)": lambda: generador.generar_recibo_pago(PAGO, VENTA, CLIENTE, NICHO, salida),
+        "Recibo (solo contenido, 2 copias)": lambda: [
+            generador._crear_contenido_recibo(PAGO, VENTA, CLIENTE, NICHO, etiqueta)
+            for etiqueta in ("═══ COPIA PARROQUIA ═══", "═══ COPIA TITULAR ═══")
+        ],
+        "Título (documento)": lambda: generador.generar_titulo_propiedad(
+            VENTA, CLIENTE, NICHO, BENEFICIARIOS, salida
+        ),
+        "Título (solo contenido)": lambda: generador._crear_contenido_titulo(VENTA, CLIENTE, NICHO, BENEFICIARIOS),
+    }
+
+    print(f"{'Caso':<36}{'En frío':>10}{'Con caché':>12}{'Ahorro':>9}")
+    for nombre, funcion in casos.items():
+        frio = medir(funcion, repeticiones, en_frio=True)
+        caliente = medir(funcion, repeticiones)
+        print(f"{nombre:<36}{frio:>8.2f}ms{caliente:>10.2f}ms{(1 - caliente / frio) * 100:>8.1f}%")
+
+if __name__ == "__main__":
+    print("=== Medición de generación de PDF ===\n")
+
+    medir_documentos(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
+
+    print("\n=== Medición completada ===")
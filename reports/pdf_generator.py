@@ -3,20 +3,62 @@
 Generador de PDFs para recibos de pago y títulos de propiedad
 """
 
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.pagesizes import letter, A4, landscape
+from reportlab.lib.styles import ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image, Frame, PageTemplate, BaseDocTemplate, KeepTogether
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image, Frame, PageTemplate, BaseDocTemplate, KeepTogether, PageBreak
+from reportlab.pdfbase.pdfmetrics import stringWidth
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT, TA_JUSTIFY
 from datetime import datetime
+from itertools import chain, islice
 import os
 from config.paths import AppPaths
+from reports.recursos_pdf import recursos_pdf, ImagenCacheada
+
+# Reportes tabulares: filas de alto fijo para saber cuántas caben en cada página
+FUENTE_TABLA = 'Helvetica'
+FUENTE_TABLA_NEGRITA = 'Helvetica-Bold'
+TAMANO_LETRA_TABLA = 8
+ALTO_ENCABEZADO_TABLA = 18
+ALTO_FILA_TABLA = 13
+# Relleno izquierdo y derecho de una celda (6 puntos cada uno en ReportLab)
+RELLENO_CELDA_TABLA = 12
+# Filas iniciales con las que se calculan los anchos de columna
+MUESTRA_ANCHOS_PDF = 500
+
+class HistoriaEnFlujo(list):
+    """
+    Story de ReportLab que toma sus elementos de un generador conforme se consumen
+
+    doc.build quita los elementos del frente de la lista; al quitar uno se agrega el
+    siguiente del generador, así solo se guardan unos cuantos y no el reporte completo.
+    """
+
+    def __init__(self, iniciales, siguientes, reserva=2):
+        super().__init__(iniciales)
+        self._siguientes = iter(siguientes)
+        self._reserva = reserva
+        self._rellenar()
+
+    def __delitem__(self, indice):
+        super().__delitem__(indice)
+        self._rellenar()
+
+    def _rellenar(self):
+        """Mantener al menos `reserva` elementos mientras el generador tenga más"""
+        while self._siguientes is not None and len(self) < self._reserva:
+            elemento = next(self._siguientes, None)
+            if elemento is None:
+                self._siguientes = None
+                break
+            self.append(elemento)
+
 
 class PDFGenerator:
     def __init__(self):
-        self.styles = getSampleStyleSheet()
-        self.setup_custom_styles()
+        # La hoja de estilos se crea una vez por proceso y la comparten todos los generadores
+        self.styles = recursos_pdf.estilos(self.setup_custom_styles)
         
         # Configuración de la parroquia (esto podría venir de la base de datos)
         self.parish_config = {
@@ -27,12 +69,12 @@ class PDFGenerator:
             "logo_path": "assets/logo_parroquia.webp"  # Si existe
         }
     
-    def setup_custom_styles(self):
+    def setup_custom_styles(self, styles):
         """Configurar estilos personalizados"""
         # Estilo para títulos principales
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='CustomTitle',
-            parent=self.styles['Title'],
+            parent=styles['Title'],
             fontSize=16,
             spaceAfter=30,
             alignment=TA_CENTER,
@@ -40,9 +82,9 @@ class PDFGenerator:
         ))
         
         # Estilo para subtítulos
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='CustomSubtitle',
-            parent=self.styles['Heading2'],
+            parent=styles['Heading2'],
             fontSize=14,
             spaceAfter=20,
             alignment=TA_CENTER,
@@ -50,32 +92,65 @@ class PDFGenerator:
         ))
         
         # Estilo para texto de información
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='InfoText',
-            parent=self.styles['Normal'],
+            parent=styles['Normal'],
             fontSize=12,
             spaceAfter=12,
             alignment=TA_LEFT
         ))
         
         # Estilo para texto centrado
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='CenteredText',
-            parent=self.styles['Normal'],
+            parent=styles['Normal'],
             fontSize=12,
             alignment=TA_CENTER
         ))
 
         # Estilo para etiqueta de copia
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='CopyLabel',
-            parent=self.styles['Normal'],
+            parent=styles['Normal'],
             fontSize=10,
             alignment=TA_CENTER,
             textColor=colors.grey,
             spaceAfter=10
         ))
 
+        # Estilos compactos de los recibos (dos copias por hoja)
+        styles.add(ParagraphStyle(
+            name='CompactCopyLabel',
+            parent=styles['Normal'],
+            fontSize=8,
+            alignment=TA_CENTER,
+            textColor=colors.grey,
+            spaceAfter=5
+        ))
+
+        styles.add(ParagraphStyle(
+            name='CompactHeader',
+            parent=styles['Normal'],
+            fontSize=8,
+            alignment=TA_CENTER
+        ))
+
+        styles.add(ParagraphStyle(
+            name='CompactTitle',
+            parent=styles['Title'],
+            fontSize=12,
+            spaceAfter=5,
+            alignment=TA_CENTER,
+            textColor=colors.darkblue
+        ))
+
+        styles.add(ParagraphStyle(
+            name='CompactDate',
+            parent=styles['Normal'],
+            fontSize=7,
+            alignment=TA_CENTER
+        ))
+
     def _crear_contenido_recibo(self, pago_data, venta_data, cliente_data, nicho_data, etiqueta_copia):
         """
         Crear contenido de un recibo individual
@@ -92,52 +167,10 @@ class PDFGenerator:
         """
         elementos = []
 
-        # Etiqueta de la copia
-        copy_style = ParagraphStyle(
-            name='CompactCopyLabel',
-            parent=self.styles['Normal'],
-            fontSize=8,
-            alignment=TA_CENTER,
-            textColor=colors.grey,
-            spaceAfter=5
-        )
-        elementos.append(Paragraph(f"<b>{etiqueta_copia}</b>", copy_style))
-
-        # Encabezado con información de la parroquia (versión compacta)
-        header_style = ParagraphStyle(
-            name='CompactHeader',
-            parent=self.styles['Normal'],
-            fontSize=8,
-            alignment=TA_CENTER
-        )
-        info_parroquia = f"""
-        <b>{self.parish_config['nombre']}</b><br/>
-        {self.parish_config['direccion']}<br/>
-        Tel: {self.parish_config['telefono']}
-        """
-        elementos.append(Paragraph(info_parroquia, header_style))
-
-        # Línea separadora
-        line_data = [['_' * 60]]
-        line_table = Table(line_data)
-        line_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTSIZE', (0, 0), (-1, -1), 8),
-        ]))
-        elementos.append(line_table)
-        elementos.append(Spacer(1, 3))
-
-        # Título del documento
-        title_style = ParagraphStyle(
-            name='CompactTitle',
-            parent=self.styles['Title'],
-            fontSize=12,
-            spaceAfter=5,
-            alignment=TA_CENTER,
-            textColor=colors.darkblue
-        )
-        elementos.append(Paragraph("RECIBO DE PAGO", title_style))
-        elementos.append(Spacer(1, 5))
+        # Etiqueta de la copia, encabezado, línea separadora y título: iguales en todos los recibos
+        clave = ('recibo_encabezado', etiqueta_copia, self.parish_config['nombre'],
+                 self.parish_config['direccion'], self.parish_config['telefono'])
+        elementos.extend(recursos_pdf.bloque(clave, lambda: self._construir_encabezado_recibo(etiqueta_copia)))
 
         # Información del recibo (compacta)
         info_recibo = [
@@ -187,17 +220,44 @@ class PDFGenerator:
         elementos.append(Spacer(1, 8))
 
         # Fecha de emisión
-        fecha_style = ParagraphStyle(
-            name='CompactDate',
-            parent=self.styles['Normal'],
-            fontSize=7,
-            alignment=TA_CENTER
-        )
         fecha_emision = datetime.now().strftime("Emitido el %d/%m/%Y a las %H:%M")
-        elementos.append(Paragraph(f"<i>{fecha_emision}</i>", fecha_style))
+        elementos.append(Paragraph(f"<i>{fecha_emision}</i>", self.styles['CompactDate']))
         elementos.append(Spacer(1, 6))
 
         # Línea de firma solo del administrador
+        elementos.extend(recursos_pdf.bloque('recibo_firmas', self._construir_firmas_recibo))
+
+        return elementos
+
+    def _construir_encabezado_recibo(self, etiqueta_copia):
+        """Etiqueta de la copia y encabezado compacto de la parroquia para los recibos"""
+        elementos = [Paragraph(f"<b>{etiqueta_copia}</b>", self.styles['CompactCopyLabel'])]
+
+        info_parroquia = f"""
+        <b>{self.parish_config['nombre']}</b><br/>
+        {self.parish_config['direccion']}<br/>
+        Tel: {self.parish_config['telefono']}
+        """
+        elementos.append(Paragraph(info_parroquia, self.styles['CompactHeader']))
+
+        # Línea separadora
+        line_data = [['_' * 60]]
+        line_table = Table(line_data)
+        line_table.setStyle(TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ]))
+        elementos.append(line_table)
+        elementos.append(Spacer(1, 3))
+
+        # Título del documento
+        elementos.append(Paragraph("RECIBO DE PAGO", self.styles['CompactTitle']))
+        elementos.append(Spacer(1, 5))
+
+        return elementos
+
+    def _construir_firmas_recibo(self):
+        """Línea de firma del administrador en los recibos"""
         firmas_data = [
             ['_' * 30],
             ['Administrador'],
@@ -209,9 +269,7 @@ class PDFGenerator:
             ('FONTSIZE', (0, 0), (-1, -1), 7),
             ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
         ]))
-        elementos.append(tabla_firmas)
-
-        return elementos
+        return [tabla_firmas]
 
     def generar_recibo_pago(self, pago_data, venta_data, cliente_data, nicho_data, output_path=None):
         """
@@ -467,6 +525,37 @@ La parroquia no se responsabiliza por daños causados por eventos naturales, acc
                               rightMargin=25, leftMargin=25,
                               topMargin=25, bottomMargin=25)
         
+        story = self._crear_contenido_titulo(venta_data, cliente_data, nicho_data, beneficiarios_data)
+        
+        # Generar PDF
+        doc.build(story)
+        return output_path
+    
+    def generar_titulos_combinados(self, titulos_data, output_path):
+        """
+        Generar varios títulos de propiedad en un solo PDF para imprimirlos juntos
+        
+        Args:
+            titulos_data: Lista de diccionarios con 'venta', 'cliente', 'nicho' y 'beneficiarios'
+            output_path: Ruta del archivo de salida
+        """
+        doc = SimpleDocTemplate(output_path, pagesize=letter,
+                              rightMargin=25, leftMargin=25,
+                              topMargin=25, bottomMargin=25)
+        
+        story = []
+        for i, datos in enumerate(titulos_data):
+            if i > 0:
+                story.append(PageBreak())
+            story.extend(self._crear_contenido_titulo(
+                datos['venta'], datos['cliente'], datos['nicho'], datos['beneficiarios']
+            ))
+        
+        doc.build(story)
+        return output_path
+    
+    def _crear_contenido_titulo(self, venta_data, cliente_data, nicho_data, beneficiarios_data=None):
+        """Crear los elementos de un título de propiedad"""
         # Contenido del documento
         story = []
         
@@ -539,18 +628,21 @@ La parroquia no se responsabiliza por daños causados por eventos naturales, acc
         # Firmas
         story.extend(self._crear_pie_firmas_titulo())
         
-        # Generar PDF
-        doc.build(story)
-        return output_path
+        return story
     
     def _crear_encabezado_parroquia(self):
         """Crear encabezado con información de la parroquia"""
+        clave = ('encabezado_parroquia', *self.parish_config.values())
+        return recursos_pdf.bloque(clave, self._construir_encabezado_parroquia)
+    
+    def _construir_encabezado_parroquia(self):
+        """Construir el encabezado (una vez por proceso; ver recursos_pdf)"""
         elementos = []
         
-        # Logo si existe
-        if os.path.exists(self.parish_config.get('logo_path', '')):
-            logo = Image(self.parish_config['logo_path'], width=1*inch, height=1*inch)
-            elementos.append(logo)
+        # Logo si existe, decodificado y reducido una sola vez
+        logo = recursos_pdf.logo(self.parish_config.get('logo_path', ''), 1*inch, 1*inch)
+        if logo:
+            elementos.append(ImagenCacheada(logo, width=1*inch, height=1*inch))
         
         # Información de la parroquia
         info_parroquia = f"""
@@ -586,6 +678,12 @@ La parroquia no se responsabiliza por daños causados por eventos naturales, acc
         elementos.append(Spacer(1, 30))
         
         # Líneas de firma
+        elementos.extend(recursos_pdf.bloque('firmas', self._construir_tabla_firmas))
+        
+        return elementos
+    
+    def _construir_tabla_firmas(self):
+        """Tabla de firmas de administrador y cliente"""
         firmas_data = [
             ['_' * 25, '_' * 25],
             ['Administrador', 'Cliente'],
@@ -598,9 +696,7 @@ La parroquia no se responsabiliza por daños causados por eventos naturales, acc
             ('FONTSIZE', (0, 0), (-1, -1), 10),
             ('BOTTOMPADDING', (0, 0), (-1, 0), 20),
         ]))
-        elementos.append(tabla_firmas)
-        
-        return elementos
+        return [tabla_firmas]
     
     def _crear_pie_firmas_titulo(self):
         """Crear pie de página con firmas para títulos"""
@@ -614,6 +710,12 @@ La parroquia no se responsabiliza por daños causados por eventos naturales, acc
         elementos.append(Spacer(1, 40))
         
         # Líneas de firma
+        elementos.extend(recursos_pdf.bloque('firmas_titulo', self._construir_tabla_firmas_titulo))
+        
+        return elementos
+    
+    def _construir_tabla_firmas_titulo(self):
+        """Tabla de firmas de párroco y dueño del nicho"""
         firmas_data = [
             ['_' * 30, '_' * 30],
             ['Párroco', 'Dueño del nicho'],
@@ -626,21 +728,40 @@ La parroquia no se responsabiliza por daños causados por eventos naturales, acc
             ('FONTSIZE', (0, 0), (-1, -1), 12),
             ('BOTTOMPADDING', (0, 0), (-1, 0), 20),
         ]))
-        elementos.append(tabla_firmas)
-        
-        return elementos
+        return [tabla_firmas]
     
-    def generar_reporte_movimientos(self, movimientos_data, fecha_inicio, fecha_fin, output_path=None):
-        """Generar reporte de movimientos en PDF"""
+    def generar_reporte_tabla(self, dataset, output_path=None):
+        """
+        Generar un reporte tabular paginado en PDF a partir de un DatasetReporte
+
+        Cada página es una tabla propia con el encabezado repetido y, si el reporte tiene
+        columna de total, el total de la página; la última incluye el total general. Las
+        tablas tienen un tamaño fijo, así que el tiempo crece de forma lineal con las filas.
+
+        Args:
+            dataset: Reporte con columnas tipadas y fuente de filas
+            output_path: Ruta del archivo (por defecto en la carpeta de reportes)
+        """
         if not output_path:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             reportes_dir = AppPaths.get_reportes_dir()
-            output_path = os.path.join(reportes_dir, f"reporte_movimientos_{timestamp}.pdf")
+            nombre = dataset.titulo.lower().replace(' ', '_')
+            output_path = os.path.join(reportes_dir, f"reporte_{nombre}_{timestamp}.pdf")
+
+        filas = dataset.filas()
+        muestra = list(islice(filas, MUESTRA_ANCHOS_PDF))
+
+        # Orientación horizontal cuando las columnas no caben a lo ancho de la hoja vertical
+        naturales = self._anchos_naturales(dataset, muestra)
+        pagesize = letter
+        if sum(naturales) > letter[0] - 50:
+            pagesize = landscape(letter)
 
         # Crear documento
-        doc = SimpleDocTemplate(output_path, pagesize=letter,
+        doc = SimpleDocTemplate(output_path, pagesize=pagesize,
                               rightMargin=25, leftMargin=25,
                               topMargin=25, bottomMargin=25)
+        anchos = self._ajustar_anchos(naturales, doc.width - 12)
 
         story = []
 
@@ -648,50 +769,149 @@ La parroquia no se responsabiliza por daños causados por eventos naturales, acc
         story.extend(self._crear_encabezado_parroquia())
 
         # Título
-        story.append(Paragraph("REPORTE DE MOVIMIENTOS", self.styles['CustomTitle']))
-        # Formatear fechas solo si son objetos date/datetime
-        fecha_inicio_str = fecha_inicio.strftime('%d/%m/%Y') if hasattr(fecha_inicio, 'strftime') else str(fecha_inicio)
-        fecha_fin_str = fecha_fin.strftime('%d/%m/%Y') if hasattr(fecha_fin, 'strftime') else str(fecha_fin)
-        periodo = f"Período: {fecha_inicio_str} - {fecha_fin_str}"
+        story.append(Paragraph(f"REPORTE DE {dataset.titulo.upper()}", self.styles['CustomTitle']))
+        if dataset.fecha_inicio or dataset.fecha_fin:
+            fecha_inicio_str = dataset.fecha_inicio.strftime('%d/%m/%Y') if dataset.fecha_inicio else "inicio"
+            fecha_fin_str = dataset.fecha_fin.strftime('%d/%m/%Y') if dataset.fecha_fin else "hoy"
+            periodo = f"Período: {fecha_inicio_str} - {fecha_fin_str}"
+        else:
+            periodo = "Período: todos los registros"
         story.append(Paragraph(periodo, self.styles['CustomSubtitle']))
         story.append(Spacer(1, 30))
 
-        # Tabla de movimientos
-        if movimientos_data:
-            # Encabezados de la tabla - usar las claves del primer registro
-            first_item = movimientos_data[0]
-            headers = list(first_item.keys())
-
-            # Crear tabla con encabezados formateados
-            tabla_data = [[h.replace('_', ' ').title() for h in headers]]
-
-            # Agregar datos
-            for mov in movimientos_data:
-                row = [str(mov.get(key, '')) for key in headers]
-                tabla_data.append(row)
-
-            # Calcular anchos de columnas dinámicamente
-            num_cols = len(headers)
-            col_width = 6.5 * inch / num_cols
-
-            # Crear tabla
-            tabla = Table(tabla_data, colWidths=[col_width] * num_cols)
-            tabla.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('FONTSIZE', (0, 1), (-1, -1), 9),
-            ]))
-            story.append(tabla)
-        else:
-            story.append(Paragraph("No se encontraron movimientos en el período seleccionado.",
+        if not muestra:
+            story.append(Paragraph("No se encontraron registros en el período seleccionado.",
                                  self.styles['InfoText']))
+            doc.build(story, onFirstPage=self._pie_pagina_reporte, onLaterPages=self._pie_pagina_reporte)
+            return output_path
+
+        # Filas por página: alto útil del marco (menos su relleno) entre el alto fijo de fila
+        alto_marco = doc.height - 12
+        alto_titulo = sum(self._alto_elemento(elemento, doc.width, doc.height) for elemento in story)
+        reservadas = 2 if dataset.tiene_total else 0
+        capacidad = int((alto_marco - ALTO_ENCABEZADO_TABLA) // ALTO_FILA_TABLA) - reservadas
+        capacidad_primera = int((alto_marco - alto_titulo - ALTO_ENCABEZADO_TABLA) // ALTO_FILA_TABLA) - reservadas
+
+        # Las tablas de las páginas se crean conforme ReportLab las dibuja
+        paginas = self._paginas_reporte(dataset, chain(muestra, filas), anchos, capacidad_primera, capacidad)
 
         # Generar PDF
-        doc.build(story)
-        return output_path
\ No newline at end of file
+        doc.build(HistoriaEnFlujo(story, paginas),
+                  onFirstPage=self._pie_pagina_reporte, onLaterPages=self._pie_pagina_reporte)
+        return output_path
+
+    def _paginas_reporte(self, dataset, filas, anchos, capacidad_primera, capacidad):
+        """Tabla de cada página y los saltos entre ellas; la última lleva además el total general"""
+        # Cada página se convierte en tabla cuando se sabe que no es la última
+        total_general = 0
+        pendiente = None
+        pagina = []
+        limite = max(capacidad_primera, 1)
+        for fila in filas:
+            pagina.append(fila)
+            monto = dataset.monto(fila)
+            if monto:
+                total_general += monto
+            if len(pagina) == limite:
+                if pendiente is not None:
+                    yield self._tabla_pagina(dataset, pendiente, anchos)
+                    yield PageBreak()
+                pendiente, pagina, limite = pagina, [], max(capacidad, 1)
+        if pagina:
+            if pendiente is not None:
+                yield self._tabla_pagina(dataset, pendiente, anchos)
+                yield PageBreak()
+            pendiente = pagina
+
+        yield self._tabla_pagina(dataset, pendiente, anchos, total_general=total_general)
+
+    def _anchos_naturales(self, dataset, muestra):
+        """Ancho que necesita cada columna según su encabezado y las filas de muestra"""
+        anchos = [stringWidth(titulo, FUENTE_TABLA_NEGRITA, TAMANO_LETRA_TABLA)
+                  for titulo in dataset.encabezados]
+        for fila in muestra:
+            for indice, texto in enumerate(dataset.formatear(fila)):
+                anchos[indice] = max(anchos[indice], stringWidth(texto, FUENTE_TABLA, TAMANO_LETRA_TABLA))
+        return [ancho + RELLENO_CELDA_TABLA for ancho in anchos]
+
+    def _ajustar_anchos(self, naturales, disponible):
+        """Escalar los anchos naturales para ocupar exactamente el ancho disponible"""
+        total = sum(naturales)
+        return [ancho * disponible / total for ancho in naturales]
+
+    def _alto_elemento(self, elemento, ancho, alto):
+        """Alto que ocupa un elemento del encabezado, con sus espacios"""
+        _, alto_elemento = elemento.wrap(ancho, alto)
+        return alto_elemento + elemento.getSpaceBefore() + elemento.getSpaceAfter()
+
+    def _recortar_texto(self, texto, ancho):
+        """Recortar el texto con '…' para que no invada la celda vecina"""
+        disponible = ancho - RELLENO_CELDA_TABLA
+        if stringWidth(texto, FUENTE_TABLA, TAMANO_LETRA_TABLA) <= disponible:
+            return texto
+        while texto and stringWidth(texto + "…", FUENTE_TABLA, TAMANO_LETRA_TABLA) > disponible:
+            texto = texto[:-1]
+        return texto + "…"
+
+    def _tabla_pagina(self, dataset, filas, anchos, total_general=None):
+        """
+        Tabla de una página: encabezado, filas y total de la página
+
+        Args:
+            dataset: Reporte al que pertenecen las filas
+            filas: Filas tipadas de la página
+            anchos: Ancho de cada columna
+            total_general: Total del reporte; si se indica se agrega como última fila
+        """
+        tabla_data = [dataset.encabezados]
+        for fila in filas:
+            tabla_data.append([self._recortar_texto(texto, ancho)
+                               for texto, ancho in zip(dataset.formatear(fila), anchos)])
+
+        estilo = [
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('FONTNAME', (0, 0), (-1, 0), FUENTE_TABLA_NEGRITA),
+            ('FONTNAME', (0, 1), (-1, -1), FUENTE_TABLA),
+            ('FONTSIZE', (0, 0), (-1, -1), TAMANO_LETRA_TABLA),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+        ]
+        for indice, columna in enumerate(dataset.columnas):
+            if columna.numerica:
+                estilo.append(('ALIGN', (indice, 1), (indice, -1), 'RIGHT'))
+
+        # Filas de totales: etiqueta en las columnas anteriores a la del total
+        totales = []
+        if dataset.tiene_total:
+            subtotal = sum(monto for monto in map(dataset.monto, filas) if monto)
+            totales.append(("Total página", subtotal))
+            if total_general is not None:
+                totales.append(("TOTAL GENERAL", total_general))
+
+        columna_total = dataset.indice_total
+        for etiqueta, monto in totales:
+            fila_total = [''] * len(dataset.columnas)
+            fila_total[columna_total] = dataset.columnas[columna_total].formatear(monto)
+            if columna_total > 0:
+                fila_total[0] = etiqueta
+                estilo.append(('SPAN', (0, len(tabla_data)), (columna_total - 1, len(tabla_data))))
+                estilo.append(('ALIGN', (0, len(tabla_data)), (0, len(tabla_data)), 'RIGHT'))
+            estilo.append(('FONTNAME', (0, len(tabla_data)), (-1, len(tabla_data)), FUENTE_TABLA_NEGRITA))
+            estilo.append(('BACKGROUND', (0, len(tabla_data)), (-1, len(tabla_data)), colors.lightgrey))
+            tabla_data.append(fila_total)
+
+        alturas = [ALTO_ENCABEZADO_TABLA] + [ALTO_FILA_TABLA] * (len(tabla_data) - 1)
+        tabla = Table(tabla_data, colWidths=anchos, rowHeights=alturas, repeatRows=1)
+        tabla.setStyle(TableStyle(estilo))
+        return tabla
+
+    def _pie_pagina_reporte(self, canvas, doc):
+        """Número de página al pie de los reportes tabulares"""
+        canvas.saveState()
+        canvas.setFont(FUENTE_TABLA, TAMANO_LETRA_TABLA)
+        canvas.drawRightString(doc.pagesize[0] - doc.rightMargin, doc.bottomMargin / 2,
+                               f"Página {doc.page}")
+        canvas.restoreState()
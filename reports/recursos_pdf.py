@@ -0,0 +1,118 @@
+# reports/recursos_pdf.py
+"""
+Recursos de PDF compartidos por todo el proceso: hoja de estilos, logo y bloques fijos
+"""
+
+import copy
+import io
+import os
+import threading
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.utils import ImageReader
+from reportlab.platypus import Flowable
+
+# Resolución con la que se guarda el logo reducido (puntos por pulgada)
+RESOLUCION_LOGO = 200
+
+
+class ImagenCacheada(Flowable):
+    """Imagen que dibuja un ImageReader ya decodificado, sin volver a leer el archivo"""
+
+    def __init__(self, imagen, width, height, hAlign='CENTER'):
+        super().__init__()
+        self.imagen = imagen
+        self.width = width
+        self.height = height
+        self.hAlign = hAlign
+
+    def wrap(self, availWidth, availHeight):
+        return self.width, self.height
+
+    def draw(self):
+        self.canv.drawImage(self.imagen, 0, 0, self.width, self.height, mask='auto')
+
+
+class RecursosPDF:
+    """
+    Caché de recursos que no cambian entre documentos
+
+    Los bloques se construyen una sola vez y cada documento recibe copias superficiales,
+    así el marcado de los párrafos y los estilos de las tablas no se procesan de nuevo.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._estilos = None
+        self._logos = {}
+        self._bloques = {}
+
+    def estilos(self, configurar=None):
+        """
+        Hoja de estilos compartida
+
+        Args:
+            configurar: Función que agrega los estilos propios a la hoja; solo se llama
+                        la primera vez
+        """
+        with self._lock:
+            if self._estilos is None:
+                estilos = getSampleStyleSheet()
+                if configurar:
+                    configurar(estilos)
+                self._estilos = estilos
+            return self._estilos
+
+    def logo(self, ruta, ancho, alto):
+        """
+        Logo decodificado y reducido a su tamaño de impresión
+
+        Returns:
+            ImageReader en memoria, o None si el archivo no existe o no se puede leer
+        """
+        clave = (ruta, ancho, alto)
+        with self._lock:
+            if clave not in self._logos:
+                self._logos[clave] = self._cargar_logo(ruta, ancho, alto)
+            return self._logos[clave]
+
+    def _cargar_logo(self, ruta, ancho, alto):
+        """Leer el logo una vez, reducirlo y guardarlo como PNG en memoria"""
+        if not ruta or not os.path.exists(ruta):
+            return None
+        try:
+            from PIL import Image as PILImage
+
+            with PILImage.open(ruta) as imagen:
+                imagen = imagen.convert('RGBA')
+                tamano = (max(1, int(ancho / 72 * RESOLUCION_LOGO)), max(1, int(alto / 72 * RESOLUCION_LOGO)))
+                imagen.thumbnail(tamano)
+                buffer = io.BytesIO()
+                imagen.save(buffer, format='PNG')
+            buffer.seek(0)
+            return ImageReader(buffer)
+        except Exception as e:
+            print(f"Error al cargar el logo '{ruta}': {str(e)}")
+            return None
+
+    def bloque(self, clave, construir):
+        """
+        Copias de una lista de elementos que se construye una sola vez
+
+        Args:
+            clave: Identificador del bloque (debe incluir los datos de los que depende)
+            construir: Función sin argumentos que devuelve la lista de elementos
+        """
+        with self._lock:
+            elementos = self._bloques.get(clave)
+            if elementos is None:
+                elementos = self._bloques[clave] = construir()
+        return [copy.copy(elemento) for elemento in elementos]
+
+    def invalidar(self):
+        """Descartar el logo y los bloques (por ejemplo, si cambia el logo o los datos de la parroquia)"""
+        with self._lock:
+            self._logos.clear()
+            self._bloques.clear()
+
+
+recursos_pdf = RecursosPDF()
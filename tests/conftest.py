@@ -0,0 +1,84 @@
+"""
+Configuración común de las pruebas: base de datos temporal con el esquema completo
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+# La ruta de la base de datos sale de HOME al importar database.models: apuntarla a una carpeta temporal
+os.environ['HOME'] = tempfile.mkdtemp(prefix="criptas_pruebas_")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from database.models import (
+    Base, engine, get_db_session, crear_indices_faltantes,
+    Cliente, Nicho, Venta, Pago, Beneficiario, Urna
+)
+from database.busqueda_fts import crear_indice_busqueda
+from database.contador_escrituras import crear_contador_escrituras
+
+
+def crear_esquema():
+    """Mismos pasos que main.init_database para el esquema"""
+    Base.metadata.create_all(bind=engine)
+    crear_indices_faltantes()
+    crear_indice_busqueda()
+    crear_contador_escrituras()
+
+
+def vaciar_tablas():
+    """Borrar los datos de todas las tablas sin tocar el esquema"""
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+
+
+def sembrar_datos(num_ventas):
+    """
+    Crear `num_ventas` ventas con su cliente, nicho, pagos, beneficiarios y urna
+
+    Returns:
+        int: Número de ventas creadas
+    """
+    db = get_db_session()
+    try:
+        inicio = datetime(2024, 1, 1)
+        for i in range(num_ventas):
+            cliente = Cliente(nombre=f"Juan{i}", apellido=f"Pérez{i}", cedula=f"C{i:06d}")
+            beneficiario = Cliente(nombre=f"María{i}", apellido=f"López{i}", cedula=f"B{i:06d}")
+            nicho = Nicho(numero=f"N-{i:04d}", seccion=f"S{i % 4}", fila=str(i % 10), columna=str(i // 10),
+                          precio=10000.0, disponible=False)
+            venta = Venta(numero_contrato=f"CT-{i:05d}", cliente=cliente, nicho=nicho, precio_total=10000.0,
+                          enganche=2000.0, saldo_restante=6000.0, tipo_pago="credito",
+                          pagado_completamente=i % 2 == 0, fecha_venta=inicio + timedelta(days=i))
+            db.add_all([cliente, beneficiario, nicho, venta])
+            db.add(Pago(venta=venta, numero_recibo=f"R-{i:05d}", monto=1000.0, metodo_pago="efectivo",
+                        concepto="Abono", fecha_pago=inicio + timedelta(days=i, hours=1)))
+            db.add(Pago(venta=venta, numero_recibo=f"R-{i:05d}-M", monto=500.0, metodo_pago="efectivo",
+                        concepto="Mantenimiento", fecha_pago=inicio + timedelta(days=i, hours=2)))
+            db.add(Beneficiario(venta=venta, titular=cliente, beneficiario_persona=beneficiario, orden=1))
+            db.add(Urna(venta=venta, numero_urna=1, nombre_difunto=f"Difunto {i}",
+                        fecha_defuncion=inicio + timedelta(days=i), fecha_deposito_urna=inicio + timedelta(days=i + 3),
+                        nombre_depositante=f"Depositante {i}"))
+        db.commit()
+        return num_ventas
+    finally:
+        db.close()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def esquema():
+    """Crear el esquema una vez por sesión de pruebas"""
+    crear_esquema()
+
+
+@pytest.fixture
+def datos():
+    """Tablas con unas cuantas ventas; se vacían al terminar la prueba"""
+    vaciar_tablas()
+    sembrar_datos(20)
+    yield
+    vaciar_tablas()
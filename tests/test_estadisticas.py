@@ -0,0 +1,35 @@
+"""
+Cifras del dashboard
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from database.models import get_db_session, Venta, Pago
+from database.estadisticas import Estadisticas
+
+
+def _agregar_pago(db, venta_id, recibo, fecha, monto, metodo):
+    db.add(Pago(venta_id=venta_id, numero_recibo=recibo, monto=monto, metodo_pago=metodo,
+                concepto="Abono", fecha_pago=fecha))
+
+
+def test_pagos_de_hoy_no_incluyen_pagos_con_fecha_futura(datos):
+    """Un pago fechado mañana no cuenta en pagos, monto ni método de hoy"""
+    ahora = datetime.now()
+    db = get_db_session()
+    try:
+        venta_id = db.execute(select(Venta.id).limit(1)).scalar_one()
+        _agregar_pago(db, venta_id, "R-HOY", ahora, 300.0, "transferencia")
+        _agregar_pago(db, venta_id, "R-MANANA-1", ahora + timedelta(days=1), 700.0, "cheque")
+        _agregar_pago(db, venta_id, "R-MANANA-2", ahora + timedelta(days=1, hours=1), 800.0, "cheque")
+        db.commit()
+    finally:
+        db.close()
+
+    cifras = Estadisticas().obtener()
+
+    assert cifras['pagos_hoy'] == 1
+    assert cifras['monto_hoy'] == 300.0
+    assert cifras['metodo_principal_hoy'] == "transferencia"
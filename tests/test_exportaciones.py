@@ -0,0 +1,90 @@
+"""
+Memoria de las exportaciones de reportes con un conjunto de datos generado
+
+Las filas se recorren en flujo: CSV y Excel no deben crecer con el número de filas,
+y el PDF solo con lo que ReportLab guarda de cada página hasta escribir el archivo.
+"""
+
+import os
+import tracemalloc
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import pytest
+
+from reports import dataset as modulo_dataset
+from reports import pdf_generator
+from reports.dataset import DatasetReporte, Columna, MONEDA, FECHA, exportar_csv, exportar_excel
+from reports.pdf_generator import PDFGenerator
+
+FilaPago = namedtuple('FilaPago', 'recibo fecha cliente monto metodo concepto contrato')
+
+COLUMNAS = [
+    Columna('recibo', titulo="N° Recibo"),
+    Columna('fecha', FECHA),
+    Columna('cliente'),
+    Columna('monto', MONEDA),
+    Columna('metodo', titulo="Método"),
+    Columna('concepto'),
+    Columna('contrato'),
+]
+
+# Crecimiento máximo de la memoria del PDF por fila (lo que ReportLab guarda de cada página)
+BYTES_POR_FILA_PDF = 1500
+
+
+def reporte_generado(num_filas):
+    """Reporte de pagos cuyas filas se generan al recorrerlo, sin base de datos"""
+    inicio = datetime(2024, 1, 1)
+
+    def fuente():
+        for i in range(num_filas):
+            yield FilaPago(f"R-{i:06d}", inicio + timedelta(minutes=i), f"Cliente {i} Apellido {i}",
+                           1000.0 + i, "efectivo", "Abono", f"CT-{i % 5000:05d}")
+
+    return DatasetReporte("Pagos", COLUMNAS, fuente, total='monto')
+
+
+def pico_memoria(exportar, num_filas, ruta):
+    """Bytes máximos reservados por Python durante la exportación"""
+    tracemalloc.start()
+    try:
+        exportar(reporte_generado(num_filas), ruta)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.fixture
+def muestras_pequenas(monkeypatch):
+    """Muestras de anchos cortas, para que ambos tamaños de prueba las superen"""
+    monkeypatch.setattr(modulo_dataset, 'MUESTRA_ANCHOS_EXCEL', 50)
+    monkeypatch.setattr(pdf_generator, 'MUESTRA_ANCHOS_PDF', 50)
+
+
+@pytest.mark.parametrize("exportar, extension, pocas, muchas", [
+    (exportar_csv, "csv", 200, 5000),
+    (exportar_excel, "xlsx", 200, 2000),
+])
+def test_exportacion_con_memoria_acotada(muestras_pequenas, tmp_path, exportar, extension, pocas, muchas):
+    """Diez o más veces las filas no deben pedir más memoria que la mitad extra"""
+    ruta = str(tmp_path / f"reporte.{extension}")
+    exportar(reporte_generado(10), ruta)  # Importaciones y cachés fuera de la medición
+
+    pico_pocas = pico_memoria(exportar, pocas, ruta)
+    pico_muchas = pico_memoria(exportar, muchas, ruta)
+
+    assert pico_muchas < pico_pocas * 1.5 + 256 * 1024, (pico_pocas, pico_muchas)
+
+
+def test_pdf_no_guarda_las_tablas_de_todas_las_paginas(muestras_pequenas, tmp_path):
+    """El PDF crece solo con el contenido de las páginas ya dibujadas, no con las tablas"""
+    generador = PDFGenerator()
+    ruta = str(tmp_path / "reporte.pdf")
+    generador.generar_reporte_tabla(reporte_generado(10), ruta)
+
+    pico_pocas = pico_memoria(generador.generar_reporte_tabla, 200, ruta)
+    pico_muchas = pico_memoria(generador.generar_reporte_tabla, 1200, ruta)
+
+    assert (pico_muchas - pico_pocas) / 1000 < BYTES_POR_FILA_PDF, (pico_pocas, pico_muchas)
+    assert os.path.getsize(ruta) > 0
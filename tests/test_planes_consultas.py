@@ -0,0 +1,148 @@
+"""
+Planes de ejecución de las consultas de database/consultas.py
+
+Cada consulta se ejecuta una vez dentro de ContadorSentencias y la sentencia que
+emitió se repite con EXPLAIN QUERY PLAN. Un SCAN de una tabla solo se acepta si
+recorre el índice esperado, o si la consulta es un listado completo de esa tabla.
+"""
+
+import re
+from datetime import date
+
+import pytest
+
+from database.models import engine, get_db_session
+from database import consultas
+from tests.conftest import vaciar_tablas, sembrar_datos
+
+# Valor de la tabla en los casos: el listado lee todas sus filas y el recorrido completo es el esperado.
+# Solo se usa en listados sin ningún filtro; una consulta filtrada siempre declara sus índices.
+TABLA_COMPLETA = None
+
+DESDE = date(2024, 1, 1)
+HASTA = date(2024, 3, 31)
+
+_SCAN = re.compile(r"^SCAN (\w+)(?: USING (?:COVERING )?INDEX (\w+))?")
+
+# nombre -> (consulta, tabla -> índice esperado, tupla de índices esperados o TABLA_COMPLETA)
+CASOS = {
+    # Listado completo ordenado por el número del nicho (otra tabla): se leen todas las ventas
+    'ventas': (lambda: consultas.consulta_ventas(), {'ventas': TABLA_COMPLETA}),
+    'ventas_pagadas': (lambda: consultas.consulta_ventas(pagado=True), {'ventas': 'ix_ventas_pagado_fecha'}),
+    'ventas_periodo': (lambda: consultas.consulta_ventas(desde=DESDE, hasta=HASTA), {'ventas': 'ix_ventas_fecha_venta'}),
+    # La búsqueda sin otro filtro une por OR los ids del índice FTS: un índice por condición
+    'ventas_busqueda': (
+        lambda: consultas.consulta_ventas(busqueda="juan1"),
+        {'ventas': ('ix_ventas_cliente_id', 'ix_ventas_nicho_id')}
+    ),
+    'ventas_busqueda_pagadas': (
+        lambda: consultas.consulta_ventas(busqueda="juan1", pagado=False),
+        {'ventas': 'ix_ventas_pagado_fecha'}
+    ),
+    'ventas_titulos': (
+        lambda: consultas.consulta_ventas_titulos(),
+        {'ventas': 'ix_ventas_fecha_venta', 'beneficiarios': 'ix_beneficiarios_venta_id',
+         'documentos': 'ix_documentos_tipo_contrato_fecha'}
+    ),
+    'ventas_titulos_pagadas': (
+        lambda: consultas.consulta_ventas_titulos(pagado=True),
+        {'ventas': 'ix_ventas_pagado_fecha', 'beneficiarios': 'ix_beneficiarios_venta_id'}
+    ),
+    'datos_titulos': (
+        lambda: consultas.consulta_datos_titulos(),
+        {'ventas': 'ix_ventas_fecha_venta', 'beneficiarios': 'ix_beneficiarios_venta_id'}
+    ),
+    'datos_titulos_periodo': (
+        lambda: consultas.consulta_datos_titulos(desde=DESDE, hasta=HASTA),
+        {'ventas': 'ix_ventas_fecha_venta', 'beneficiarios': 'ix_beneficiarios_venta_id'}
+    ),
+    'datos_titulos_pagadas': (
+        lambda: consultas.consulta_datos_titulos(solo_pagadas=True),
+        {'ventas': 'ix_ventas_pagado_fecha', 'beneficiarios': 'ix_beneficiarios_venta_id'}
+    ),
+    'saldos_pendientes': (lambda: consultas.consulta_saldos_pendientes(), {'ventas': 'ix_ventas_pagado_fecha'}),
+    'pagos': (lambda: consultas.consulta_pagos(), {'pagos': 'ix_pagos_fecha_resumen'}),
+    'pagos_periodo': (lambda: consultas.consulta_pagos(desde=DESDE, hasta=HASTA), {'pagos': 'ix_pagos_fecha_pago'}),
+    'pagos_busqueda': (lambda: consultas.consulta_pagos(busqueda="R-0001"), {'pagos': 'ix_pagos_fecha_resumen'}),
+    'nichos': (lambda: consultas.consulta_nichos(), {'nichos': 'ix_nichos_ubicacion'}),
+    'nichos_disponibles': (lambda: consultas.consulta_nichos(disponible=True), {'nichos': 'ix_nichos_disponible'}),
+    # Los nichos se leen por rowid desde el índice FTS
+    'nichos_busqueda': (lambda: consultas.consulta_nichos(busqueda="N-00"), {}),
+    # Listado completo ordenado por el número del nicho (otra tabla): se leen todas las urnas
+    'urnas': (lambda: consultas.consulta_urnas(), {'urnas': TABLA_COMPLETA}),
+    # Nombre del difunto por prefijo, id desde el índice FTS y venta del nicho encontrado: un índice por condición
+    'urnas_busqueda': (
+        lambda: consultas.consulta_urnas(busqueda="difunto"),
+        {'urnas': ('ix_urnas_nombre_difunto_normalizado', 'ix_urnas_venta_numero'), 'ventas': 'ix_ventas_nicho_id'}
+    ),
+    'movimientos': (
+        lambda: consultas.consulta_movimientos(DESDE, HASTA),
+        {'ventas': 'ix_ventas_fecha_venta', 'pagos': 'ix_pagos_fecha_pago'}
+    ),
+    'clientes_ventas': (
+        lambda: consultas.consulta_clientes_ventas(DESDE, HASTA),
+        {'ventas': 'ix_ventas_cliente_id', 'clientes': 'ix_clientes_fecha_registro'}
+    ),
+    'clientes_ventas_todos': (
+        lambda: consultas.consulta_clientes_ventas(),
+        {'ventas': 'ix_ventas_cliente_id', 'clientes': 'ix_clientes_fecha_registro'}
+    ),
+    'nichos_ocupacion': (
+        lambda: consultas.consulta_nichos_ocupacion(),
+        {'ventas': 'ix_ventas_nicho_id', 'nichos': 'ix_nichos_ubicacion'}
+    ),
+}
+
+
+def _indices(esperado):
+    """Índices esperados de una tabla como tupla"""
+    return esperado if isinstance(esperado, tuple) else (esperado,)
+
+
+def plan_consulta(stmt):
+    """Filas de EXPLAIN QUERY PLAN de la sentencia que emite la consulta"""
+    db = get_db_session()
+    try:
+        with consultas.ContadorSentencias() as contador:
+            db.execute(stmt).all()
+    finally:
+        db.close()
+
+    assert contador.total == 1
+    with engine.connect() as conn:
+        filas = conn.exec_driver_sql(
+            "EXPLAIN QUERY PLAN " + contador.sentencias[0], contador.parametros[0]
+        ).all()
+    return [fila[3] for fila in filas]
+
+
+@pytest.fixture(scope="module")
+def datos_planes():
+    """Datos suficientes para que el planificador elija como lo haría en uso"""
+    vaciar_tablas()
+    sembrar_datos(200)
+    yield
+    vaciar_tablas()
+
+
+@pytest.mark.parametrize("nombre", sorted(CASOS))
+def test_plan_usa_indices(datos_planes, nombre):
+    """Ningún SCAN fuera del índice esperado y cada índice esperado aparece en el plan"""
+    crear_consulta, esperados = CASOS[nombre]
+    plan = plan_consulta(crear_consulta())
+
+    for detalle in plan:
+        coincidencia = _SCAN.match(detalle)
+        if not coincidencia or "VIRTUAL TABLE" in detalle:
+            continue
+        tabla, indice = coincidencia.groups()
+        assert tabla in esperados, f"{nombre}: recorrido no esperado '{detalle}' en {plan}"
+        if esperados[tabla] is not TABLA_COMPLETA:
+            assert indice in _indices(esperados[tabla]), f"{nombre}: '{detalle}' no usa {esperados[tabla]} en {plan}"
+
+    for tabla, indices in esperados.items():
+        if indices is TABLA_COMPLETA:
+            continue
+        for indice in _indices(indices):
+            assert any(f"{tabla} USING" in detalle and f"INDEX {indice}" in detalle for detalle in plan), \
+                f"{nombre}: {tabla} no usa {indice} en {plan}"
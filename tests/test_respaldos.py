@@ -0,0 +1,73 @@
+"""
+Respaldo de seguridad al restaurar
+"""
+
+import os
+import shutil
+
+import pytest
+
+from database.models import engine, get_db_session, Nicho
+from database.busqueda_fts import TABLA_FTS
+from database.contador_escrituras import TABLA_CONTADOR
+from backup.backup_manager import BackupManager, PREFIJO_SEGURIDAD
+
+
+@pytest.fixture
+def gestor(datos, tmp_path, monkeypatch):
+    """BackupManager sin respaldos previos; las carpetas relativas de assets quedan vacías"""
+    monkeypatch.chdir(tmp_path)
+    manager = BackupManager()
+    shutil.rmtree(manager.backup_dir, ignore_errors=True)
+    os.makedirs(manager.backup_dir)
+    yield manager
+    shutil.rmtree(manager.backup_dir, ignore_errors=True)
+
+
+def _respaldos_seguridad(manager):
+    return [nombre for nombre in os.listdir(manager.backup_dir)
+            if nombre.startswith(PREFIJO_SEGURIDAD) and nombre.endswith(".zip")]
+
+
+def test_restaurar_justo_despues_de_respaldar_reutiliza_el_respaldo(gestor):
+    """Sin escrituras desde el último respaldo no se crea un respaldo de seguridad"""
+    backup_path = gestor.create_backup("respaldo_prueba")
+
+    gestor.restore_backup(backup_path)
+
+    assert _respaldos_seguridad(gestor) == []
+
+
+def test_restaurar_con_escrituras_pendientes_crea_respaldo_de_seguridad(gestor):
+    """Una escritura después del último respaldo obliga a respaldar antes de restaurar"""
+    backup_path = gestor.create_backup("respaldo_prueba")
+    db = get_db_session()
+    try:
+        db.add(Nicho(numero="N-NUEVO", seccion="S9", fila="1", columna="1", precio=5000.0))
+        db.commit()
+    finally:
+        db.close()
+
+    gestor.restore_backup(backup_path)
+
+    assert len(_respaldos_seguridad(gestor)) == 1
+
+
+def test_restaurar_recrea_indice_busqueda_y_contador(gestor):
+    """La base restaurada vuelve a tener la tabla FTS y los triggers aunque el respaldo no los traiga"""
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"DROP TABLE {TABLA_FTS}")
+        for (nombre,) in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'trigger'").all():
+            conn.exec_driver_sql(f"DROP TRIGGER {nombre}")
+    backup_path = gestor.create_backup("respaldo_sin_triggers")
+
+    gestor.restore_backup(backup_path)
+
+    with engine.connect() as conn:
+        triggers = {nombre for (nombre,) in conn.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger'"
+        ).all()}
+        indexados = conn.exec_driver_sql(f"SELECT count(*) FROM {TABLA_FTS}").scalar()
+    assert f"{TABLA_CONTADOR}_ventas_ai" in triggers
+    assert any(nombre.startswith(f"{TABLA_FTS}_") for nombre in triggers)
+    assert indexados > 0
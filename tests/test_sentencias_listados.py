@@ -0,0 +1,64 @@
+"""
+Número de sentencias SQL de los listados de cada pantalla
+
+Un listado que vuelve a consultar la base por cada fila (N+1) emite más
+sentencias al crecer los datos; aquí el número debe ser el mismo con pocas y
+con muchas ventas.
+"""
+
+import pytest
+
+from database.models import get_db_session, Venta, Nicho, Pago, Urna
+from database.consultas import (
+    consulta_ventas, consulta_nichos, consulta_pagos, consulta_urnas, consulta_ventas_titulos,
+    obtener_filas, obtener_datos_titulos, ConsultaPaginada, ContadorSentencias,
+    ORDEN_VENTAS, ORDEN_NICHOS, ORDEN_PAGOS, ORDEN_URNAS
+)
+from tests.conftest import vaciar_tablas, sembrar_datos
+
+# Filas por página de VirtualTreeview
+TAMANO_PAGINA = 200
+
+
+def _primera_pagina(fuente):
+    """Lo que hace VirtualTreeview al recibir una fuente: contar y leer la primera página"""
+    return fuente.count(), fuente.fetch(0, TAMANO_PAGINA)
+
+
+def _listado_titulos():
+    """Carga de la pantalla de títulos: ventas elegibles y datos para generar en lote"""
+    db = get_db_session()
+    try:
+        return obtener_filas(db, consulta_ventas_titulos()), obtener_datos_titulos(db)
+    finally:
+        db.close()
+
+
+# Pantalla -> (carga del listado, sentencias esperadas)
+LISTADOS = {
+    'ventas': (lambda: _primera_pagina(ConsultaPaginada(consulta_ventas(), ORDEN_VENTAS, Venta.id)), 2),
+    'nichos': (lambda: _primera_pagina(ConsultaPaginada(consulta_nichos(), ORDEN_NICHOS, Nicho.id)), 2),
+    'pagos': (lambda: _primera_pagina(ConsultaPaginada(consulta_pagos(), ORDEN_PAGOS, Pago.id)), 2),
+    'urnas': (lambda: _primera_pagina(ConsultaPaginada(consulta_urnas(), ORDEN_URNAS, Urna.id)), 2),
+    'titulos': (_listado_titulos, 2),
+}
+
+
+def _contar_sentencias(cargar, num_ventas):
+    """Sentencias que emite la carga con `num_ventas` ventas en la base"""
+    vaciar_tablas()
+    sembrar_datos(num_ventas)
+    try:
+        with ContadorSentencias() as contador:
+            cargar()
+        return contador.total
+    finally:
+        vaciar_tablas()
+
+
+@pytest.mark.parametrize("pantalla", sorted(LISTADOS))
+def test_listado_con_sentencias_constantes(pantalla):
+    """Mismo número de sentencias con 5 y con 60 ventas"""
+    cargar, esperadas = LISTADOS[pantalla]
+    assert _contar_sentencias(cargar, 5) == esperadas
+    assert _contar_sentencias(cargar, 60) == esperadas
@@ -7,6 +7,9 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime
 from database.models import get_db_session, Cliente, Nicho, Venta, Pago
+from database.busqueda_fts import expresion_busqueda, coincidencias
+from database.consultas import (filtro_busqueda_ventas, filtro_busqueda_pagos,
+                                filtro_nombre_cliente, filtro_numero_nicho)
 from ui.ventas_manager import VentaDetailsDialog
 
 class BusquedaManager:
@@ -287,31 +290,17 @@ class BusquedaManager:
         """Búsqueda en clientes"""
         db = get_db_session()
         
-        # Construir query base
-        query = db.query(Cliente)
-        
-        # Aplicar filtros de búsqueda
+        # Aplicar filtros de búsqueda (un solo MATCH sobre el índice de texto completo)
+        field = None
         if hasattr(self, 'cliente_field') and self.cliente_field.get():
             field = self.cliente_field.get()
-            if field == 'nombre':
-                query = query.filter(Cliente.nombre.contains(term))
-            elif field == 'apellido':
-                query = query.filter(Cliente.apellido.contains(term))
-            elif field == 'cedula':
-                query = query.filter(Cliente.cedula.contains(term))
-            elif field == 'telefono':
-                query = query.filter(Cliente.telefono.contains(term))
-            elif field == 'email':
-                query = query.filter(Cliente.email.contains(term))
-        else:
-            # Búsqueda general en todos los campos
-            query = query.filter(
-                Cliente.nombre.contains(term) |
-                Cliente.apellido.contains(term) |
-                Cliente.cedula.contains(term) |
-                Cliente.telefono.contains(term) |
-                Cliente.email.contains(term)
-            )
+        expresion = expresion_busqueda(term, field)
+        if expresion is None:
+            db.close()
+            return []
+
+        coincide = coincidencias('cliente', expresion)
+        query = db.query(Cliente).join(coincide, Cliente.id == coincide.c.ref_id)
         
         # Aplicar filtros de fecha si están configurados
         if self.fecha_desde.get():
@@ -322,7 +311,7 @@ class BusquedaManager:
             fecha_hasta = datetime.strptime(self.fecha_hasta.get(), "%Y-%m-%d")
             query = query.filter(Cliente.fecha_registro <= fecha_hasta)
         
-        clientes = query.limit(100).all()  # Limitar resultados
+        clientes = query.order_by(coincide.c.relevancia).limit(100).all()  # Limitar resultados
         
         results = []
         for cliente in clientes:
@@ -344,30 +333,17 @@ class BusquedaManager:
         """Búsqueda en nichos"""
         db = get_db_session()
         
-        query = db.query(Nicho)
-        
         # Aplicar filtros de búsqueda
+        field = None
         if hasattr(self, 'nicho_field') and self.nicho_field.get():
             field = self.nicho_field.get()
-            if field == 'numero':
-                query = query.filter(Nicho.numero.contains(term))
-            elif field == 'seccion':
-                query = query.filter(Nicho.seccion.contains(term))
-            elif field == 'fila':
-                query = query.filter(Nicho.fila.contains(term))
-            elif field == 'columna':
-                query = query.filter(Nicho.columna.contains(term))
-            elif field == 'descripcion':
-                query = query.filter(Nicho.descripcion.contains(term))
-        else:
-            # Búsqueda general
-            query = query.filter(
-                Nicho.numero.contains(term) |
-                Nicho.seccion.contains(term) |
-                Nicho.fila.contains(term) |
-                Nicho.columna.contains(term) |
-                Nicho.descripcion.contains(term)
-            )
+        expresion = expresion_busqueda(term, field)
+        if expresion is None:
+            db.close()
+            return []
+
+        coincide = coincidencias('nicho', expresion)
+        query = db.query(Nicho).join(coincide, Nicho.id == coincide.c.ref_id)
         
         # Aplicar filtro de estado
         if self.filter_estado.get() == 'disponibles':
@@ -375,7 +351,7 @@ class BusquedaManager:
         elif self.filter_estado.get() == 'vendidos':
             query = query.filter(Nicho.disponible == False)
         
-        nichos = query.limit(100).all()
+        nichos = query.order_by(coincide.c.relevancia).limit(100).all()
         
         results = []
         for nicho in nichos:
@@ -406,22 +382,15 @@ class BusquedaManager:
         
         # Aplicar filtros de búsqueda
         if hasattr(self, 'venta_field') and self.venta_field.get():
-            field = self.venta_field.get()
-            if field == 'numero_contrato':
-                query = query.filter(Venta.numero_contrato.contains(term))
-            elif field == 'tipo_pago':
-                query = query.filter(Venta.tipo_pago.contains(term))
-            elif field == 'observaciones':
-                query = query.filter(Venta.observaciones.contains(term))
+            expresion = expresion_busqueda(term, self.venta_field.get())
+            if expresion is None:
+                db.close()
+                return []
+            coincide = coincidencias('venta', expresion)
+            query = query.join(coincide, Venta.id == coincide.c.ref_id).order_by(coincide.c.relevancia)
         else:
-            # Búsqueda general
-            query = query.filter(
-                Venta.numero_contrato.contains(term) |
-                Cliente.nombre.contains(term) |
-                Cliente.apellido.contains(term) |
-                Cliente.cedula.contains(term) |
-                Nicho.numero.contains(term)
-            )
+            # Búsqueda general: contrato, titular o nicho
+            query = query.filter(filtro_busqueda_ventas(term)).order_by(Venta.fecha_venta.desc())
         
         # Aplicar filtros de estado
         if self.filter_estado.get() == 'pagados':
@@ -465,24 +434,15 @@ class BusquedaManager:
         
         # Aplicar filtros de búsqueda
         if hasattr(self, 'pago_field') and self.pago_field.get():
-            field = self.pago_field.get()
-            if field == 'numero_recibo':
-                query = query.filter(Pago.numero_recibo.contains(term))
-            elif field == 'metodo_pago':
-                query = query.filter(Pago.metodo_pago.contains(term))
-            elif field == 'concepto':
-                query = query.filter(Pago.concepto.contains(term))
-            elif field == 'observaciones':
-                query = query.filter(Pago.observaciones.contains(term))
+            expresion = expresion_busqueda(term, self.pago_field.get())
+            if expresion is None:
+                db.close()
+                return []
+            coincide = coincidencias('pago', expresion)
+            query = query.join(coincide, Pago.id == coincide.c.ref_id).order_by(coincide.c.relevancia)
         else:
-            # Búsqueda general
-            query = query.filter(
-                Pago.numero_recibo.contains(term) |
-                Pago.concepto.contains(term) |
-                Venta.numero_contrato.contains(term) |
-                Cliente.nombre.contains(term) |
-                Cliente.apellido.contains(term)
-            )
+            # Búsqueda general: recibo, concepto, contrato o titular
+            query = query.filter(filtro_busqueda_pagos(term)).order_by(Pago.fecha_pago.desc())
         
         # Aplicar filtros de fecha
         if self.fecha_desde.get():
@@ -609,9 +569,13 @@ class BusquedaManager:
         
         try:
             db = get_db_session()
-            venta = db.query(Venta).join(Cliente).join(Nicho).filter(
-                Venta.numero_contrato.contains(contrato)
-            ).first()
+            venta = None
+            expresion = expresion_busqueda(contrato, 'numero_contrato')
+            if expresion:
+                coincide = coincidencias('venta', expresion)
+                venta = db.query(Venta).join(coincide, Venta.id == coincide.c.ref_id).order_by(
+                    coincide.c.relevancia
+                ).first()
             
             if venta:
                 # Mostrar resultado
@@ -647,8 +611,9 @@ class BusquedaManager:
         
         try:
             db = get_db_session()
-            nicho = db.query(Nicho).filter(
-                Nicho.numero.contains(cripta)
+            # Prefijo sobre el número normalizado: una búsqueda en ix_nichos_numero_normalizado
+            nicho = db.query(Nicho).filter(filtro_numero_nicho(cripta)).order_by(
+                Nicho.numero_normalizado
             ).first()
             
             if nicho:
@@ -688,11 +653,10 @@ class BusquedaManager:
         
         try:
             db = get_db_session()
+            # Prefijo sin acentos ni mayúsculas sobre nombre/apellido, o cédula exacta
             clientes = db.query(Cliente).filter(
-                Cliente.nombre.contains(cliente) |
-                Cliente.apellido.contains(cliente) |
-                Cliente.cedula.contains(cliente)
-            ).limit(10).all()
+                filtro_nombre_cliente(cliente) | (Cliente.cedula == cliente)
+            ).order_by(Cliente.apellido_normalizado, Cliente.nombre_normalizado).limit(10).all()
             
             if clientes:
                 results = []
@@ -18,6 +18,10 @@ from ui.titulos_manager import TitulosManager
 from ui.urnas_manager import UrnasManager
 from backup.backup_manager import BackupManager
 from backup.scheduler import BackupScheduler
+from reports.cola_documentos import cola_documentos
+
+# Milisegundos entre revisiones de los documentos generados en segundo plano
+INTERVALO_COLA_DOCUMENTOS = 200
 
 class MainWindow:
     def __init__(self, root):
@@ -33,6 +37,9 @@ class MainWindow:
         
         # Inicializar managers
         self.init_managers()
+
+        # Entregar en el hilo de Tk los documentos que termina la cola
+        self.root.after(INTERVALO_COLA_DOCUMENTOS, self.check_document_queue)
     
     def create_main_interface(self):
         """Crear la interfaz principal"""
@@ -132,6 +139,11 @@ class MainWindow:
         for widget in self.content_frame.winfo_children():
             widget.destroy()
     
+    def check_document_queue(self):
+        """Llamar los avisos de los documentos terminados y volver a programar la revisión"""
+        cola_documentos.entregar_terminados()
+        self.root.after(INTERVALO_COLA_DOCUMENTOS, self.check_document_queue)
+
     def update_status(self, message):
         """Actualizar la barra de estado"""
         self.status_var.set(message)
@@ -156,16 +168,11 @@ class MainWindow:
     
     def create_stats_widgets(self, parent):
         """Crear widgets de estadísticas"""
-        from database.models import get_db_session, Nicho, Venta, Pago
+        from database.estadisticas import estadisticas
         
-        db = get_db_session()
         try:
-            # Obtener estadísticas
-            total_nichos = db.query(Nicho).count()
-            nichos_disponibles = db.query(Nicho).filter(Nicho.disponible == True).count()
-            nichos_vendidos = total_nichos - nichos_disponibles
-            total_ventas = db.query(Venta).count()
-            ventas_pendientes = db.query(Venta).filter(Venta.pagado_completamente == False).count()
+            # Obtener estadísticas (una sola consulta; en caché mientras no haya cambios)
+            cifras = estadisticas.obtener()
             
             # Frame de estadísticas
             stats_frame = ttk.LabelFrame(parent, text="Estadísticas", padding="10")
@@ -173,11 +180,11 @@ class MainWindow:
             
             # Crear tarjetas de estadísticas
             stats = [
-                ("Total Nichos", total_nichos, "#3498db"),
-                ("Nichos Disponibles", nichos_disponibles, "#2ecc71"),
-                ("Nichos Vendidos", nichos_vendidos, "#e74c3c"),
-                ("Total Ventas", total_ventas, "#9b59b6"),
-                ("Ventas Pendientes", ventas_pendientes, "#f39c12")
+                ("Total Nichos", cifras['total_nichos'], "#3498db"),
+                ("Nichos Disponibles", cifras['nichos_disponibles'], "#2ecc71"),
+                ("Nichos Vendidos", cifras['nichos_vendidos'], "#e74c3c"),
+                ("Total Ventas", cifras['total_ventas'], "#9b59b6"),
+                ("Ventas Pendientes", cifras['ventas_pendientes'], "#f39c12")
             ]
             
             for i, (label, value, color) in enumerate(stats):
@@ -201,8 +208,6 @@ class MainWindow:
             
         except Exception as e:
             messagebox.showerror("Error", f"Error al cargar estadísticas: {str(e)}")
-        finally:
-            db.close()
     
     def create_quick_actions(self, parent):
         """Crear acciones rápidas"""
@@ -300,6 +305,7 @@ class MainWindow:
         # Información de respaldos
         info_label = ttk.Label(backup_frame,
                               text=f"Los respaldos automáticos se realizan cada semana a las {schedule_info['time']}\n"
+                                   "y también cuando se registran cambios (pagos, ventas, titulares).\n"
                                    "También puedes crear respaldos manuales cuando lo necesites.",
                               font=("Arial", 11))
         info_label.grid(row=0, column=0, columnspan=3, pady=(0, 20))
@@ -478,6 +484,9 @@ class MainWindow:
         if file_path:
             try:
                 self.backup_manager.restore_backup(file_path)
+                # La base de datos cambió por debajo del ORM: descartar las cifras en caché
+                from database.estadisticas import estadisticas
+                estadisticas.invalidar()
                 messagebox.showinfo("Éxito", "Base de datos restaurada exitosamente")
                 self.update_status("Base de datos restaurada")
                 # Reiniciar la aplicación o recargar datos
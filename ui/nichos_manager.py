@@ -6,6 +6,10 @@ Interfaz para la gestión de nichos
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 from database.models import get_db_session, Nicho
+from database.consultas import consulta_nichos, ConsultaPaginada, ORDEN_NICHOS
+from database.estadisticas import estadisticas
+from ui.virtual_treeview import VirtualTreeview
+from ui.search_dispatcher import SearchDispatcher
 from sqlalchemy.exc import IntegrityError
 
 class NichosManager:
@@ -13,6 +17,8 @@ class NichosManager:
         self.parent = parent
         self.update_status = update_status_callback
         self.tree = None
+        self.virtual_tree = None
+        self.search_dispatcher = SearchDispatcher(self.parent)
         self.search_var = tk.StringVar()
         
     def show(self):
@@ -78,7 +84,7 @@ class NichosManager:
         self.update_info_display(info_frame)
     
     def create_nichos_tree(self, parent):
-        """Crear TreeView para mostrar nichos"""
+        """Crear TreeView virtual para mostrar nichos"""
         tree_frame = ttk.Frame(parent)
         tree_frame.grid(row=2, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         tree_frame.columnconfigure(0, weight=1)
@@ -86,16 +92,19 @@ class NichosManager:
         
         # TreeView
         columns = ('numero', 'seccion', 'fila', 'columna', 'precio', 'disponible', 'descripcion')
-        self.tree = ttk.Treeview(tree_frame, columns=columns, show='headings', height=15)
+        self.virtual_tree = VirtualTreeview(tree_frame, columns, format_row=self.format_nicho_row,
+                                            row_id=lambda nicho: nicho.id)
+        self.virtual_tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.tree = self.virtual_tree.tree
         
         # Configurar columnas
-        self.tree.heading('numero', text='Número')
-        self.tree.heading('seccion', text='Sección')
-        self.tree.heading('fila', text='Fila')
-        self.tree.heading('columna', text='Columna')
-        self.tree.heading('precio', text='Precio')
-        self.tree.heading('disponible', text='Estado')
-        self.tree.heading('descripcion', text='Descripción')
+        self.virtual_tree.heading('numero', text='Número')
+        self.virtual_tree.heading('seccion', text='Sección')
+        self.virtual_tree.heading('fila', text='Fila')
+        self.virtual_tree.heading('columna', text='Columna')
+        self.virtual_tree.heading('precio', text='Precio')
+        self.virtual_tree.heading('disponible', text='Estado')
+        self.virtual_tree.heading('descripcion', text='Descripción')
         
         self.tree.column('numero', width=100)
         self.tree.column('seccion', width=100)
@@ -105,60 +114,46 @@ class NichosManager:
         self.tree.column('disponible', width=100)
         self.tree.column('descripcion', width=200)
         
-        # Scrollbars
-        v_scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree.yview)
-        h_scrollbar = ttk.Scrollbar(tree_frame, orient=tk.HORIZONTAL, command=self.tree.xview)
-        self.tree.configure(yscrollcommand=v_scrollbar.set, xscrollcommand=h_scrollbar.set)
-        
-        # Grid
-        self.tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        v_scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
-        h_scrollbar.grid(row=1, column=0, sticky=(tk.W, tk.E))
-        
         # Eventos
         self.tree.bind('<Double-1>', self.on_double_click)
         self.tree.bind('<Button-3>', self.show_context_menu)
     
     def load_nichos(self):
         """Cargar nichos desde la base de datos"""
+        total = self.show_nichos()
+        self.update_status(f"Nichos cargados: {total}")
+    
+    def show_nichos(self, busqueda=None, disponible=None):
+        """Mostrar los nichos que cumplen los filtros; devuelve el total de filas"""
+        # Una carga directa reemplaza cualquier búsqueda en curso
+        self.search_dispatcher.cancel()
         try:
-            db = get_db_session()
-            nichos = db.query(Nicho).order_by(Nicho.seccion, Nicho.fila, Nicho.columna).all()
-            
-            # Limpiar TreeView
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-            
-            # Agregar nichos
-            for nicho in nichos:
-                estado = "Disponible" if nicho.disponible else "Vendido"
-                precio_formatted = f"${nicho.precio:,.2f}" if nicho.precio is not None else "Sin precio"
-
-                values = (
-                    nicho.numero,
-                    nicho.seccion,
-                    nicho.fila,
-                    nicho.columna,
-                    precio_formatted,
-                    estado,
-                    nicho.descripcion or ""
-                )
-                
-                item = self.tree.insert('', 'end', values=values)
-                
-                # Colorear según disponibilidad
-                if not nicho.disponible:
-                    self.tree.set(item, 'disponible', 'Vendido')
-                    # self.tree.item(item, tags=('vendido',))
+            self.virtual_tree.set_data_source(ConsultaPaginada(
+                consulta_nichos(busqueda=busqueda, disponible=disponible), ORDEN_NICHOS, Nicho.id
+            ))
             
             # Configurar tags para colores
             self.tree.tag_configure('vendido', background='#ffcccc')
             
-            db.close()
-            self.update_status(f"Nichos cargados: {len(nichos)}")
+            return self.virtual_tree.total
             
         except Exception as e:
             messagebox.showerror("Error", f"Error al cargar nichos: {str(e)}")
+            return 0
+    
+    def format_nicho_row(self, nicho):
+        """Formatear una fila de nicho para el TreeView"""
+        estado = "Disponible" if nicho.disponible else "Vendido"
+        precio_formatted = f"${nicho.precio:,.2f}" if nicho.precio is not None else "Sin precio"
+        return (
+            nicho.numero,
+            nicho.seccion,
+            nicho.fila,
+            nicho.columna,
+            precio_formatted,
+            estado,
+            nicho.descripcion or ""
+        )
     
     def new_nicho(self):
         """Crear nuevo nicho"""
@@ -356,54 +351,24 @@ class NichosManager:
         return [chr(i) for i in range(inicio, fin + 1)]
 
     def on_search(self, event=None):
-        """Filtrar nichos según búsqueda"""
+        """Filtrar nichos según búsqueda (con retardo y en segundo plano)"""
         search_term = self.search_var.get().lower()
         
         # Si no hay término de búsqueda, mostrar todos
-        if not search_term:
-            self.load_nichos()
-            return
+        fuente = ConsultaPaginada(consulta_nichos(busqueda=search_term or None), ORDEN_NICHOS, Nicho.id)
         
-        try:
-            db = get_db_session()
-            query = db.query(Nicho)
-            
-            # Filtrar por término de búsqueda
-            query = query.filter(
-                Nicho.numero.contains(search_term) |
-                Nicho.seccion.contains(search_term) |
-                Nicho.fila.contains(search_term) |
-                Nicho.columna.contains(search_term) |
-                Nicho.descripcion.contains(search_term)
-            )
-            
-            nichos = query.order_by(Nicho.seccion, Nicho.fila, Nicho.columna).all()
-            
-            # Actualizar TreeView
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-            
-            for nicho in nichos:
-                estado = "Disponible" if nicho.disponible else "Vendido"
-                precio_formatted = f"${nicho.precio:,.2f}" if nicho.precio is not None else "Sin precio"
-
-                values = (
-                    nicho.numero,
-                    nicho.seccion,
-                    nicho.fila,
-                    nicho.columna,
-                    precio_formatted,
-                    estado,
-                    nicho.descripcion or ""
-                )
-
-                self.tree.insert('', 'end', values=values)
-
-            db.close()
-            self.update_status(f"Búsqueda: {len(nichos)} resultados")
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Error en búsqueda: {str(e)}")
+        def mostrar(resultado):
+            self.virtual_tree.set_data_source(fuente, resultado)
+            if search_term:
+                self.update_status(f"Búsqueda: {resultado[0]} resultados")
+            else:
+                self.update_status(f"Nichos cargados: {resultado[0]}")
+        
+        self.search_dispatcher.submit(
+            lambda db: self.virtual_tree.prefetch(fuente, db),
+            mostrar,
+            lambda e: messagebox.showerror("Error", f"Error en búsqueda: {str(e)}")
+        )
     
     def clear_search(self):
         """Limpiar búsqueda"""
@@ -415,67 +380,25 @@ class NichosManager:
         """Aplicar filtros de disponibilidad"""
         filter_value = self.filter_disponible.get()
         
-        try:
-            db = get_db_session()
-            query = db.query(Nicho)
-            
-            # Aplicar filtro de búsqueda si existe
-            search_term = self.search_var.get().lower()
-            if search_term:
-                query = query.filter(
-                    Nicho.numero.contains(search_term) |
-                    Nicho.seccion.contains(search_term) |
-                    Nicho.fila.contains(search_term) |
-                    Nicho.columna.contains(search_term) |
-                    Nicho.descripcion.contains(search_term)
-                )
-            
-            # Aplicar filtro de disponibilidad
-            if filter_value == "Disponibles":
-                query = query.filter(Nicho.disponible == True)
-            elif filter_value == "Vendidos":
-                query = query.filter(Nicho.disponible == False)
-            
-            nichos = query.order_by(Nicho.seccion, Nicho.fila, Nicho.columna).all()
-            
-            # Actualizar TreeView
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-            
-            for nicho in nichos:
-                estado = "Disponible" if nicho.disponible else "Vendido"
-                precio_formatted = f"${nicho.precio:,.2f}" if nicho.precio is not None else "Sin precio"
-
-                values = (
-                    nicho.numero,
-                    nicho.seccion,
-                    nicho.fila,
-                    nicho.columna,
-                    precio_formatted,
-                    estado,
-                    nicho.descripcion or ""
-                )
-
-                self.tree.insert('', 'end', values=values)
-
-            db.close()
-            self.update_status(f"Filtro aplicado: {len(nichos)} resultados")
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Error al aplicar filtros: {str(e)}")
+        # Aplicar filtro de disponibilidad
+        disponible = None
+        if filter_value == "Disponibles":
+            disponible = True
+        elif filter_value == "Vendidos":
+            disponible = False
+        
+        total = self.show_nichos(busqueda=self.search_var.get().lower() or None,
+                                 disponible=disponible)
+        self.update_status(f"Filtro aplicado: {total} resultados")
     
     def update_info_display(self, parent):
         """Actualizar display de información"""
         try:
-            db = get_db_session()
-            
-            total_nichos = db.query(Nicho).count()
-            disponibles = db.query(Nicho).filter(Nicho.disponible == True).count()
-            vendidos = total_nichos - disponibles
-            
-            db.close()
+            cifras = estadisticas.obtener()
             
-            info_text = f"Total: {total_nichos} nichos | Disponibles: {disponibles} | Vendidos: {vendidos}"
+            info_text = (f"Total: {cifras['total_nichos']} nichos | "
+                        f"Disponibles: {cifras['nichos_disponibles']} | "
+                        f"Vendidos: {cifras['nichos_vendidos']}")
             ttk.Label(parent, text=info_text, font=("Arial", 11)).pack()
             
         except Exception as e:
@@ -7,19 +7,70 @@ import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from datetime import datetime, timedelta
 import os
-from sqlalchemy import func
 from database.models import (get_db_session, Venta, Pago, Cliente, Nicho,
                            generar_numero_recibo, buscar_venta_por_contrato)
-from reports.pdf_generator import PDFGenerator
+from database.consultas import (consulta_pagos, consulta_ventas, obtener_filas,
+                                ConsultaPaginada, ORDEN_PAGOS)
+from database.estadisticas import estadisticas
+from ui.virtual_treeview import VirtualTreeview
+from ui.search_dispatcher import SearchDispatcher
+from reports.cola_documentos import cola_documentos, RECIBO, TERMINADO
 from tkcalendar import DateEntry
 
+
+def datos_recibo(pago, venta):
+    """
+    Copiar los datos del recibo mientras la sesión sigue abierta
+
+    Returns:
+        tuple: (pago_data, venta_data, cliente_data, nicho_data) para generar_recibo_pago
+    """
+    pago_data = {
+        'numero_recibo': pago.numero_recibo,
+        'fecha_pago': pago.fecha_pago,
+        'monto': pago.monto,
+        'metodo_pago': pago.metodo_pago,
+        'concepto': pago.concepto,
+        'observaciones': pago.observaciones
+    }
+
+    # Si es pago de mantenimiento, no afecta el saldo de la venta
+    saldo_anterior = venta.saldo_restante if pago.concepto == 'Mantenimiento' else venta.saldo_restante + pago.monto
+
+    venta_data = {
+        'numero_contrato': venta.numero_contrato,
+        'precio_total': venta.precio_total,
+        'saldo_anterior': saldo_anterior,
+        'saldo_restante': venta.saldo_restante,
+        'pagado_completamente': venta.pagado_completamente
+    }
+
+    cliente_data = {
+        'nombre': venta.cliente.nombre,
+        'apellido': venta.cliente.apellido,
+        'cedula': venta.cliente.cedula,
+        'telefono': venta.cliente.telefono,
+        'direccion': venta.cliente.direccion
+    }
+
+    nicho_data = {
+        'numero': venta.nicho.numero,
+        'seccion': venta.nicho.seccion,
+        'fila': venta.nicho.fila,
+        'columna': venta.nicho.columna
+    }
+
+    return pago_data, venta_data, cliente_data, nicho_data
+
+
 class PagosManager:
     def __init__(self, parent, update_status_callback):
         self.parent = parent
         self.update_status = update_status_callback
         self.tree = None
+        self.virtual_tree = None
+        self.search_dispatcher = SearchDispatcher(self.parent)
         self.search_var = tk.StringVar()
-        self.pdf_generator = PDFGenerator()
         
     def show(self):
         """Mostrar interfaz de gestión de pagos"""
@@ -87,7 +138,7 @@ class PagosManager:
         self.update_info_display(info_frame)
     
     def create_payments_tree(self, parent):
-        """Crear TreeView para mostrar pagos"""
+        """Crear TreeView virtual para mostrar pagos"""
         tree_frame = ttk.Frame(parent)
         tree_frame.grid(row=2, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         tree_frame.columnconfigure(0, weight=1)
@@ -95,16 +146,19 @@ class PagosManager:
         
         # TreeView
         columns = ('fecha', 'recibo', 'contrato', 'cliente', 'monto', 'metodo', 'concepto')
-        self.tree = ttk.Treeview(tree_frame, columns=columns, show='headings', height=15)
+        self.virtual_tree = VirtualTreeview(tree_frame, columns, format_row=self.format_payment_row,
+                                            row_id=lambda pago: pago.id)
+        self.virtual_tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.tree = self.virtual_tree.tree
         
         # Configurar columnas
-        self.tree.heading('fecha', text='Fecha')
-        self.tree.heading('recibo', text='N° Recibo')
-        self.tree.heading('contrato', text='Contrato')
-        self.tree.heading('cliente', text='Titular')
-        self.tree.heading('monto', text='Monto')
-        self.tree.heading('metodo', text='Método')
-        self.tree.heading('concepto', text='Concepto')
+        self.virtual_tree.heading('fecha', text='Fecha')
+        self.virtual_tree.heading('recibo', text='N° Recibo')
+        self.virtual_tree.heading('contrato', text='Contrato')
+        self.virtual_tree.heading('cliente', text='Titular')
+        self.virtual_tree.heading('monto', text='Monto')
+        self.virtual_tree.heading('metodo', text='Método')
+        self.virtual_tree.heading('concepto', text='Concepto')
         
         self.tree.column('fecha', width=100)
         self.tree.column('recibo', width=120)
@@ -114,51 +168,40 @@ class PagosManager:
         self.tree.column('metodo', width=100)
         self.tree.column('concepto', width=200)
         
-        # Scrollbars
-        v_scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree.yview)
-        h_scrollbar = ttk.Scrollbar(tree_frame, orient=tk.HORIZONTAL, command=self.tree.xview)
-        self.tree.configure(yscrollcommand=v_scrollbar.set, xscrollcommand=h_scrollbar.set)
-        
-        # Grid
-        self.tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        v_scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
-        h_scrollbar.grid(row=1, column=0, sticky=(tk.W, tk.E))
-        
         # Eventos
         self.tree.bind('<Double-1>', self.on_double_click)
         self.tree.bind('<Button-3>', self.show_context_menu)
     
     def load_payments(self):
         """Cargar pagos desde la base de datos"""
+        total = self.show_payments()
+        self.update_status(f"Pagos cargados: {total}")
+    
+    def show_payments(self, busqueda=None, desde=None, hasta=None):
+        """Mostrar los pagos que cumplen los filtros; devuelve el total de filas"""
+        # Una carga directa reemplaza cualquier búsqueda en curso
+        self.search_dispatcher.cancel()
         try:
-            db = get_db_session()
-            pagos = db.query(Pago).join(Venta).join(Cliente).order_by(Pago.fecha_pago.desc()).all()
-            
-            # Limpiar TreeView
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-            
-            # Agregar pagos
-            for pago in pagos:
-                cliente_nombre = pago.venta.cliente.nombre_completo if pago.venta.cliente else "N/A"
-                
-                values = (
-                    pago.fecha_pago.strftime("%d/%m/%Y"),
-                    pago.numero_recibo,
-                    pago.venta.numero_contrato,
-                    cliente_nombre,
-                    f"${pago.monto:,.2f}",
-                    pago.metodo_pago,
-                    pago.concepto
-                )
-                
-                self.tree.insert('', 'end', values=values)
-            
-            db.close()
-            self.update_status(f"Pagos cargados: {len(pagos)}")
+            self.virtual_tree.set_data_source(ConsultaPaginada(
+                consulta_pagos(busqueda=busqueda, desde=desde, hasta=hasta), ORDEN_PAGOS, Pago.id
+            ))
+            return self.virtual_tree.total
             
         except Exception as e:
             messagebox.showerror("Error", f"Error al cargar pagos: {str(e)}")
+            return 0
+    
+    def format_payment_row(self, pago):
+        """Formatear una fila de pago para el TreeView"""
+        return (
+            pago.fecha_pago.strftime("%d/%m/%Y"),
+            pago.numero_recibo,
+            pago.numero_contrato,
+            pago.cliente_nombre or "N/A",
+            f"${pago.monto:,.2f}",
+            pago.metodo_pago,
+            pago.concepto
+        )
     
     def new_payment(self):
         """Registrar nuevo pago"""
@@ -185,7 +228,7 @@ class PagosManager:
                         return
                 
                 # Generar número de recibo
-                numero_recibo = generar_numero_recibo()
+                numero_recibo = generar_numero_recibo(db)
                 
                 # Crear pago
                 pago = Pago(
@@ -202,9 +245,8 @@ class PagosManager:
                 # Hacer flush para que el pago esté disponible en la sesión
                 db.flush()
 
-                # Actualizar saldo de la venta
+                # Actualizar saldo de la venta (la fecha del último pago se mantiene al guardar el pago)
                 venta.actualizar_saldo()
-                venta.fecha_ultimo_pago = datetime.now()
 
                 # Manejar pago de mantenimiento
                 if dialog.result['concepto'] == 'Mantenimiento':
@@ -212,17 +254,15 @@ class PagosManager:
                     # Calcular próxima fecha de mantenimiento (1 año desde ahora)
                     venta.fecha_proximo_mantenimiento = datetime.now() + timedelta(days=365)
 
-                # Cargar todas las relaciones necesarias antes de cerrar la sesión
-                cliente = venta.cliente
-                nicho = venta.nicho
+                # Copiar los datos del recibo antes de que el commit expire los objetos
+                recibo = datos_recibo(pago, venta)
 
                 db.commit()
+                db.close()
 
-                # Generar recibo PDF automáticamente
-                self.generate_receipt_pdf(pago, venta)
+                # El recibo se genera en segundo plano; al terminar se ofrece abrirlo
+                self.queue_receipt(recibo)
 
-                db.close()
-                
                 self.load_payments()
                 self.update_status("Pago registrado exitosamente")
                 messagebox.showinfo("Éxito", 
@@ -231,59 +271,30 @@ class PagosManager:
             except Exception as e:
                 messagebox.showerror("Error", f"Error al registrar pago: {str(e)}")
     
-    def generate_receipt_pdf(self, pago, venta):
-        """Generar PDF del recibo"""
-        try:
-            # Preparar datos para el PDF
-            pago_data = {
-                'numero_recibo': pago.numero_recibo,
-                'fecha_pago': pago.fecha_pago,
-                'monto': pago.monto,
-                'metodo_pago': pago.metodo_pago,
-                'concepto': pago.concepto,
-                'observaciones': pago.observaciones
-            }
-            
-            # Si es pago de mantenimiento, no afecta el saldo de la venta
-            saldo_anterior = venta.saldo_restante if pago.concepto == 'Mantenimiento' else venta.saldo_restante + pago.monto
-
-            venta_data = {
-                'numero_contrato': venta.numero_contrato,
-                'precio_total': venta.precio_total,
-                'saldo_anterior': saldo_anterior,
-                'saldo_restante': venta.saldo_restante,
-                'pagado_completamente': venta.pagado_completamente
-            }
-            
-            cliente_data = {
-                'nombre': venta.cliente.nombre,
-                'apellido': venta.cliente.apellido,
-                'cedula': venta.cliente.cedula,
-                'telefono': venta.cliente.telefono,
-                'direccion': venta.cliente.direccion
-            }
-            
-            nicho_data = {
-                'numero': venta.nicho.numero,
-                'seccion': venta.nicho.seccion,
-                'fila': venta.nicho.fila,
-                'columna': venta.nicho.columna
-            }
-            
-            # Generar PDF
-            pdf_path = self.pdf_generator.generar_recibo_pago(
-                pago_data, venta_data, cliente_data, nicho_data
-            )
-            
-            # Preguntar si desea abrir el PDF
-            response = messagebox.askyesno("PDF Generado",
-                f"Recibo generado exitosamente:\n{pdf_path}\n\n¿Desea abrirlo ahora?")
+    def queue_receipt(self, recibo):
+        """Encolar la generación del recibo (datos de datos_recibo)"""
+        numero_recibo = recibo[0]['numero_recibo']
+        cola_documentos.encolar(
+            RECIBO, *recibo,
+            descripcion=f"recibo {numero_recibo}",
+            al_terminar=self.on_receipt_ready
+        )
+        self.update_status(f"Generando recibo {numero_recibo}...")
 
-            if response:
-                self.open_pdf_file(pdf_path)
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Error al generar PDF: {str(e)}")
+    def on_receipt_ready(self, trabajo):
+        """Avisar que el recibo terminó (se llama en el hilo de Tk)"""
+        if trabajo.estado != TERMINADO:
+            messagebox.showerror("Error", f"Error al generar PDF: {str(trabajo.error)}")
+            return
+
+        self.update_status(f"Recibo generado: {os.path.basename(trabajo.ruta)}")
+
+        # Preguntar si desea abrir el PDF
+        response = messagebox.askyesno("PDF Generado",
+            f"Recibo generado exitosamente:\n{trabajo.ruta}\n\n¿Desea abrirlo ahora?")
+
+        if response:
+            self.open_pdf_file(trabajo.ruta)
 
     def open_pdf_file(self, pdf_path):
         """Abrir archivo PDF de manera segura multiplataforma"""
@@ -475,10 +486,7 @@ class PagosManager:
             pago = db.query(Pago).filter(Pago.numero_recibo == numero_recibo).first()
 
             if pago:
-                # Cargar relaciones lazy-loaded antes de cerrar la sesión
-                _ = pago.venta.cliente.nombre_completo  # Forzar carga del cliente
-                _ = pago.venta.nicho.numero             # Forzar carga del nicho
-                self.generate_receipt_pdf(pago, pago.venta)
+                self.queue_receipt(datos_recibo(pago, pago.venta))
 
             db.close()
             
@@ -486,53 +494,22 @@ class PagosManager:
             messagebox.showerror("Error", f"Error al generar recibo: {str(e)}")
     
     def on_search(self, event=None):
-        """Filtrar pagos según búsqueda"""
+        """Filtrar pagos según búsqueda (con retardo y en segundo plano)"""
         search_term = self.search_var.get().lower()
+        fuente = ConsultaPaginada(consulta_pagos(busqueda=search_term or None), ORDEN_PAGOS, Pago.id)
         
-        if not search_term:
-            self.load_payments()
-            return
+        def mostrar(resultado):
+            self.virtual_tree.set_data_source(fuente, resultado)
+            if search_term:
+                self.update_status(f"Búsqueda: {resultado[0]} resultados")
+            else:
+                self.update_status(f"Pagos cargados: {resultado[0]}")
         
-        try:
-            db = get_db_session()
-            query = db.query(Pago).join(Venta).join(Cliente)
-            
-            # Filtrar por término de búsqueda
-            query = query.filter(
-                Pago.numero_recibo.contains(search_term) |
-                Venta.numero_contrato.contains(search_term) |
-                Cliente.nombre.contains(search_term) |
-                Cliente.apellido.contains(search_term) |
-                Cliente.cedula.contains(search_term) |
-                Pago.concepto.contains(search_term)
-            )
-            
-            pagos = query.order_by(Pago.fecha_pago.desc()).all()
-            
-            # Actualizar TreeView
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-            
-            for pago in pagos:
-                cliente_nombre = pago.venta.cliente.nombre_completo if pago.venta.cliente else "N/A"
-                
-                values = (
-                    pago.fecha_pago.strftime("%d/%m/%Y"),
-                    pago.numero_recibo,
-                    pago.venta.numero_contrato,
-                    cliente_nombre,
-                    f"${pago.monto:,.2f}",
-                    pago.metodo_pago,
-                    pago.concepto
-                )
-                
-                self.tree.insert('', 'end', values=values)
-            
-            db.close()
-            self.update_status(f"Búsqueda: {len(pagos)} resultados")
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Error en búsqueda: {str(e)}")
+        self.search_dispatcher.submit(
+            lambda db: self.virtual_tree.prefetch(fuente, db),
+            mostrar,
+            lambda e: messagebox.showerror("Error", f"Error en búsqueda: {str(e)}")
+        )
     
     def clear_search(self):
         """Limpiar búsqueda"""
@@ -544,75 +521,26 @@ class PagosManager:
         """Aplicar filtros de fecha"""
         filter_value = self.filter_fecha.get()
         
-        try:
-            db = get_db_session()
-            query = db.query(Pago).join(Venta).join(Cliente)
-            
-            # Aplicar filtro de búsqueda si existe
-            search_term = self.search_var.get().lower()
-            if search_term:
-                query = query.filter(
-                    Pago.numero_recibo.contains(search_term) |
-                    Venta.numero_contrato.contains(search_term) |
-                    Cliente.nombre.contains(search_term) |
-                    Cliente.apellido.contains(search_term) |
-                    Cliente.cedula.contains(search_term) |
-                    Pago.concepto.contains(search_term)
-                )
-            
-            # Aplicar filtro de fecha
-            today = datetime.now().date()
-            if filter_value == "Hoy":
-                query = query.filter(func.date(Pago.fecha_pago) == today)
-            elif filter_value == "Semana":
-                week_start = today - timedelta(days=today.weekday())
-                query = query.filter(func.date(Pago.fecha_pago) >= week_start)
-            elif filter_value == "Mes":
-                month_start = today.replace(day=1)
-                query = query.filter(func.date(Pago.fecha_pago) >= month_start)
-            
-            pagos = query.order_by(Pago.fecha_pago.desc()).all()
-            
-            # Actualizar TreeView
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-            
-            for pago in pagos:
-                cliente_nombre = pago.venta.cliente.nombre_completo if pago.venta.cliente else "N/A"
-                
-                values = (
-                    pago.fecha_pago.strftime("%d/%m/%Y"),
-                    pago.numero_recibo,
-                    pago.venta.numero_contrato,
-                    cliente_nombre,
-                    f"${pago.monto:,.2f}",
-                    pago.metodo_pago,
-                    pago.concepto
-                )
-                
-                self.tree.insert('', 'end', values=values)
-            
-            db.close()
-            self.update_status(f"Filtro aplicado: {len(pagos)} resultados")
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Error al aplicar filtros: {str(e)}")
+        # Aplicar filtro de fecha
+        today = datetime.now().date()
+        desde = None
+        if filter_value == "Hoy":
+            desde = today
+        elif filter_value == "Semana":
+            desde = today - timedelta(days=today.weekday())
+        elif filter_value == "Mes":
+            desde = today.replace(day=1)
+        hasta = today if filter_value == "Hoy" else None
+        
+        total = self.show_payments(busqueda=self.search_var.get().lower() or None,
+                                   desde=desde, hasta=hasta)
+        self.update_status(f"Filtro aplicado: {total} resultados")
     
     def update_info_display(self, parent):
         """Actualizar display de información del día"""
         try:
-            db = get_db_session()
-
-            today = datetime.now().date()
-
-            # Pagos del día
-            pagos_hoy = db.query(Pago).filter(
-                func.date(Pago.fecha_pago) == today
-            ).all()
-
-            total_pagos = len(pagos_hoy)
-
-            db.close()
+            cifras = estadisticas.obtener()
+            total_pagos = cifras['pagos_hoy']
 
             # Si no hay pagos del día, mostrar mensaje especial
             if total_pagos == 0:
@@ -620,18 +548,9 @@ class PagosManager:
                 ttk.Label(parent, text=info_text, font=("Arial", 10),
                          foreground="gray").pack()
             else:
-                monto_total = sum(pago.monto for pago in pagos_hoy)
-
-                # Métodos de pago más usados
-                metodos = {}
-                for pago in pagos_hoy:
-                    metodos[pago.metodo_pago] = metodos.get(pago.metodo_pago, 0) + 1
-
-                metodo_principal = max(metodos, key=metodos.get) if metodos else "N/A"
-
                 info_text = (f"Pagos Hoy: {total_pagos} | "
-                            f"Monto Total: ${monto_total:,.2f} | "
-                            f"Método Principal: {metodo_principal}")
+                            f"Monto Total: ${cifras['monto_hoy']:,.2f} | "
+                            f"Método Principal: {cifras['metodo_principal_hoy'] or 'N/A'}")
 
                 ttk.Label(parent, text=info_text, font=("Arial", 10)).pack()
 
@@ -1090,6 +1009,7 @@ class VentaSelectionDialog:
         self.dialog.grab_set()
         
         # Variables para búsqueda
+        self.search_dispatcher = SearchDispatcher(self.dialog)
         self.search_var = tk.StringVar()
         self.filter_var = tk.StringVar(value="pendientes")
         
@@ -1194,53 +1114,22 @@ class VentaSelectionDialog:
     
     def load_ventas(self):
         """Cargar todas las ventas"""
+        self.search_dispatcher.cancel()
         try:
             db = get_db_session()
             
-            # Query base
-            query = db.query(Venta).join(Cliente).join(Nicho)
-            
-            # Aplicar filtro por estado
-            filter_value = self.filter_var.get()
-            if filter_value == "pendientes":
-                query = query.filter(Venta.pagado_completamente == False)
-            elif filter_value == "pagadas":
-                query = query.filter(Venta.pagado_completamente == True)
-            # "todas" no aplica filtro
-            
             # Ordenar por fecha de venta (más recientes primero)
-            ventas = query.order_by(Venta.fecha_venta.desc()).all()
-            
-            # Limpiar TreeView
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-            self.venta_ids.clear()
+            ventas = obtener_filas(db, consulta_ventas(
+                pagado=self.get_estado_filter(), orden=[Venta.fecha_venta.desc()]
+            ))
+            db.close()
             
-            # Agregar ventas
-            for venta in ventas:
-                estado = "Pagado" if venta.pagado_completamente else "Pendiente"
-                
-                # Colorear según estado
-                tag = 'pagado' if venta.pagado_completamente else 'pendiente'
-                
-                values = (
-                    venta.numero_contrato,
-                    venta.cliente.nombre_completo,
-                    venta.nicho.numero,
-                    f"${venta.precio_total:,.2f}",
-                    f"${venta.saldo_restante:,.2f}",
-                    estado
-                )
-                
-                item = self.tree.insert('', 'end', values=values, tags=(tag,))
-                self.venta_ids[item] = venta.id
+            self.display_ventas(ventas)
             
             # Configurar colores para las tags
             self.tree.tag_configure('pagado', background='#d4edda')
             self.tree.tag_configure('pendiente', background='#fff3cd')
             
-            db.close()
-            
             # Actualizar información
             total_ventas = len(ventas)
             pendientes = len([v for v in ventas if not v.pagado_completamente])
@@ -1251,64 +1140,63 @@ class VentaSelectionDialog:
         except Exception as e:
             messagebox.showerror("Error", f"Error al cargar ventas: {str(e)}")
     
+    def get_estado_filter(self):
+        """Traducir el filtro de estado a un valor de pagado_completamente"""
+        filter_value = self.filter_var.get()
+        if filter_value == "pendientes":
+            return False
+        elif filter_value == "pagadas":
+            return True
+        # "todas" no aplica filtro
+        return None
+    
+    def display_ventas(self, ventas):
+        """Mostrar filas de ventas en el TreeView"""
+        # Limpiar TreeView
+        for item in self.tree.get_children():
+            self.tree.delete(item)
+        self.venta_ids.clear()
+        
+        for venta in ventas:
+            estado = "Pagado" if venta.pagado_completamente else "Pendiente"
+            
+            # Colorear según estado
+            tag = 'pagado' if venta.pagado_completamente else 'pendiente'
+            
+            values = (
+                venta.numero_contrato,
+                venta.cliente_nombre,
+                venta.nicho_numero,
+                f"${venta.precio_total:,.2f}",
+                f"${venta.saldo_restante:,.2f}",
+                estado
+            )
+            
+            item = self.tree.insert('', 'end', values=values, tags=(tag,))
+            self.venta_ids[item] = venta.id
+    
     def on_search(self, event=None):
-        """Filtrar ventas según búsqueda"""
+        """Filtrar ventas según búsqueda (con retardo y en segundo plano)"""
         search_term = self.search_var.get().strip().lower()
         
         if not search_term:
             self.load_ventas()
             return
         
-        try:
-            db = get_db_session()
-            
-            # Query con búsqueda
-            query = db.query(Venta).join(Cliente).join(Nicho).filter(
-                Venta.numero_contrato.contains(search_term) |
-                Cliente.nombre.contains(search_term) |
-                Cliente.apellido.contains(search_term) |
-                Cliente.cedula.contains(search_term) |
-                Nicho.numero.contains(search_term)
-            )
-            
-            # Aplicar filtro por estado
-            filter_value = self.filter_var.get()
-            if filter_value == "pendientes":
-                query = query.filter(Venta.pagado_completamente == False)
-            elif filter_value == "pagadas":
-                query = query.filter(Venta.pagado_completamente == True)
-            
-            ventas = query.order_by(Venta.fecha_venta.desc()).limit(100).all()
-            
-            # Limpiar TreeView
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-            self.venta_ids.clear()
-
-            # Agregar resultados
-            for venta in ventas:
-                estado = "Pagado" if venta.pagado_completamente else "Pendiente"
-                tag = 'pagado' if venta.pagado_completamente else 'pendiente'
-
-                values = (
-                    venta.numero_contrato,
-                    venta.cliente.nombre_completo,
-                    venta.nicho.numero,
-                    f"${venta.precio_total:,.2f}",
-                    f"${venta.saldo_restante:,.2f}",
-                    estado
-                )
-
-                item = self.tree.insert('', 'end', values=values, tags=(tag,))
-                self.venta_ids[item] = venta.id
-            
-            db.close()
+        consulta = consulta_ventas(busqueda=search_term, pagado=self.get_estado_filter(),
+                                   orden=[Venta.fecha_venta.desc()])
+        
+        def mostrar(ventas):
+            self.display_ventas(ventas)
             
             # Actualizar información
             self.info_label.config(text=f"Encontradas {len(ventas)} ventas")
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Error en la búsqueda: {str(e)}")
+        
+        self.search_dispatcher.submit(
+            lambda db: obtener_filas(db, consulta, limite=100),
+            mostrar,
+            lambda e: messagebox.showerror("Error", f"Error en la búsqueda: {str(e)}")
+        )
     
     def on_filter_change(self, event=None):
         """Manejar cambio de filtro"""
@@ -1342,6 +1230,7 @@ class VentaSelectionDialog:
                 _ = venta.cliente.nombre_completo  # Forzar carga del cliente
                 _ = venta.nicho.numero             # Forzar carga del nicho
                 self.result = venta
+                self.search_dispatcher.cancel()
                 self.dialog.destroy()
             else:
                 messagebox.showerror("Error", "No se pudo cargar la venta seleccionada")
@@ -1353,6 +1242,7 @@ class VentaSelectionDialog:
     
     def cancel(self):
         """Cancelar selección"""
+        self.search_dispatcher.cancel()
         self.dialog.destroy()
     
     def center_window(self):
@@ -1440,59 +1330,27 @@ OBSERVACIONES
     def print_receipt(self):
         """Imprimir recibo del pago"""
         try:
-            pdf_generator = PDFGenerator()
-            
-            # Preparar datos
-            pago_data = {
-                'numero_recibo': self.pago.numero_recibo,
-                'fecha_pago': self.pago.fecha_pago,
-                'monto': self.pago.monto,
-                'metodo_pago': self.pago.metodo_pago,
-                'concepto': self.pago.concepto,
-                'observaciones': self.pago.observaciones
-            }
-            
-            # Si es pago de mantenimiento, no afecta el saldo de la venta
-            saldo_anterior = self.pago.venta.saldo_restante if self.pago.concepto == 'Mantenimiento' else self.pago.venta.saldo_restante + self.pago.monto
-
-            venta_data = {
-                'numero_contrato': self.pago.venta.numero_contrato,
-                'precio_total': self.pago.venta.precio_total,
-                'saldo_anterior': saldo_anterior,
-                'saldo_restante': self.pago.venta.saldo_restante,
-                'pagado_completamente': self.pago.venta.pagado_completamente
-            }
-            
-            cliente_data = {
-                'nombre': self.pago.venta.cliente.nombre,
-                'apellido': self.pago.venta.cliente.apellido,
-                'cedula': self.pago.venta.cliente.cedula,
-                'telefono': self.pago.venta.cliente.telefono,
-                'direccion': self.pago.venta.cliente.direccion
-            }
-            
-            nicho_data = {
-                'numero': self.pago.venta.nicho.numero,
-                'seccion': self.pago.venta.nicho.seccion,
-                'fila': self.pago.venta.nicho.fila,
-                'columna': self.pago.venta.nicho.columna
-            }
-            
-            # Generar PDF
-            pdf_path = pdf_generator.generar_recibo_pago(
-                pago_data, venta_data, cliente_data, nicho_data
+            cola_documentos.encolar(
+                RECIBO, *datos_recibo(self.pago, self.pago.venta),
+                descripcion=f"recibo {self.pago.numero_recibo}",
+                al_terminar=self.on_receipt_ready
             )
-            
-            # Preguntar si desea abrir el PDF
-            response = messagebox.askyesno("PDF Generado",
-                f"Recibo generado exitosamente:\n{pdf_path}\n\n¿Desea abrirlo ahora?")
-
-            if response:
-                self.open_pdf_file(pdf_path)
-            
         except Exception as e:
             messagebox.showerror("Error", f"Error al generar recibo: {str(e)}")
 
+    def on_receipt_ready(self, trabajo):
+        """Avisar que el recibo terminó (se llama en el hilo de Tk)"""
+        if trabajo.estado != TERMINADO:
+            messagebox.showerror("Error", f"Error al generar recibo: {str(trabajo.error)}")
+            return
+
+        # Preguntar si desea abrir el PDF
+        response = messagebox.askyesno("PDF Generado",
+            f"Recibo generado exitosamente:\n{trabajo.ruta}\n\n¿Desea abrirlo ahora?")
+
+        if response:
+            self.open_pdf_file(trabajo.ruta)
+
     def open_pdf_file(self, pdf_path):
         """Abrir archivo PDF de manera segura multiplataforma"""
         import subprocess
@@ -7,15 +7,27 @@ import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from datetime import datetime, timedelta
 import os
-import csv
-from database.models import get_db_session, Venta, Pago, Cliente, Nicho
+from collections import namedtuple
+from database.models import get_db_session, Venta
+from database.consultas import (consulta_movimientos, consulta_ventas, consulta_pagos, consulta_clientes_ventas,
+                                consulta_nichos_ocupacion, consulta_saldos_pendientes, iterar_filas)
+from database.resumen_financiero import obtener_resumen_financiero
+from reports.dataset import DatasetReporte, Columna, ENTERO, MONEDA, FECHA, exportar_csv, exportar_excel
 from reports.pdf_generator import PDFGenerator
 
+# Filas que se insertan en la vista previa; las estadísticas y exportaciones usan todas
+LIMITE_VISTA_PREVIA = 500
+
+# Fila del resumen financiero; es_ingreso marca las que suman al total de la vista previa
+FilaResumen = namedtuple('FilaResumen', ['concepto', 'cantidad', 'monto', 'es_ingreso'])
+
 class ReportesManager:
     def __init__(self, parent, update_status_callback):
         self.parent = parent
         self.update_status = update_status_callback
         self.pdf_generator = PDFGenerator()
+        # Reporte de la vista previa actual (None hasta generarla)
+        self.dataset = None
         
     def show(self):
         """Mostrar interfaz de gestión de reportes"""
@@ -235,368 +247,216 @@ class ReportesManager:
             # Limpiar vista previa anterior
             self.clear_preview()
             
-            # Generar datos según el tipo de reporte
+            # Construir el dataset según el tipo de reporte
             if tipo == 'movimientos':
-                data, columns = self.get_movimientos_data(fecha_inicio, fecha_fin)
+                dataset = self.get_movimientos_data(fecha_inicio, fecha_fin)
             elif tipo == 'ventas':
-                data, columns = self.get_ventas_data(fecha_inicio, fecha_fin)
+                dataset = self.get_ventas_data(fecha_inicio, fecha_fin)
             elif tipo == 'pagos':
-                data, columns = self.get_pagos_data(fecha_inicio, fecha_fin)
+                dataset = self.get_pagos_data(fecha_inicio, fecha_fin)
             elif tipo == 'clientes':
-                data, columns = self.get_clientes_data(fecha_inicio, fecha_fin)
+                dataset = self.get_clientes_data(fecha_inicio, fecha_fin)
             elif tipo == 'nichos':
-                data, columns = self.get_nichos_data()
+                dataset = self.get_nichos_data()
             elif tipo == 'saldos_pendientes':
-                data, columns = self.get_saldos_pendientes_data()
+                dataset = self.get_saldos_pendientes_data()
             elif tipo == 'resumen_financiero':
-                data, columns = self.get_resumen_financiero_data(fecha_inicio, fecha_fin)
+                dataset = self.get_resumen_financiero_data(fecha_inicio, fecha_fin)
             else:
                 messagebox.showerror("Error", "Tipo de reporte no implementado")
                 return
             
             # Configurar TreeView
-            self.preview_tree['columns'] = columns
-            for col in columns:
-                self.preview_tree.heading(col, text=col.replace('_', ' ').title())
-                self.preview_tree.column(col, width=100)
+            self.preview_tree['columns'] = dataset.nombres
+            for columna in dataset.columnas:
+                self.preview_tree.heading(columna.nombre, text=columna.titulo)
+                self.preview_tree.column(columna.nombre, width=100)
             
-            # Agregar datos
-            for row in data:
-                self.preview_tree.insert('', 'end', values=row)
+            # Un solo recorrido: se muestran las primeras filas y se suman todas
+            total_registros = 0
+            total_monto = 0
+            for fila in dataset.filas():
+                if total_registros < LIMITE_VISTA_PREVIA:
+                    self.preview_tree.insert('', 'end', values=dataset.formatear(fila))
+                monto = dataset.monto(fila)
+                if monto:
+                    total_monto += monto
+                total_registros += 1
+            
+            self.dataset = dataset
             
             # Actualizar estadísticas
-            self.update_stats(data, tipo)
+            self.update_stats(dataset, total_registros, total_monto)
             
-            self.update_status(f"Vista previa generada: {len(data)} registros")
+            self.update_status(f"Vista previa generada: {total_registros} registros")
             
         except Exception as e:
             messagebox.showerror("Error", f"Error al generar vista previa: {str(e)}")
     
     def get_movimientos_data(self, fecha_inicio, fecha_fin):
         """Obtener datos de movimientos (ventas y pagos)"""
-        db = get_db_session()
-        
-        movimientos = []
-        columns = ['fecha', 'tipo', 'numero', 'cliente', 'concepto', 'monto', 'estado']
-        
-        # Obtener ventas
-        query_ventas = db.query(Venta).join(Cliente)
-        if fecha_inicio and fecha_fin:
-            query_ventas = query_ventas.filter(
-                Venta.fecha_venta.between(
-                    datetime.combine(fecha_inicio, datetime.min.time()),
-                    datetime.combine(fecha_fin, datetime.max.time())
-                )
-            )
-        
-        for venta in query_ventas.all():
-            estado = "Pagado" if venta.pagado_completamente else "Pendiente"
-            movimientos.append([
-                venta.fecha_venta.strftime('%d/%m/%Y'),
-                'Venta',
-                venta.numero_contrato,
-                venta.cliente.nombre_completo,
-                f"Venta nicho {venta.nicho.numero}",
-                f"${venta.precio_total:,.2f}",
-                estado
-            ])
-        
-        # Obtener pagos
-        query_pagos = db.query(Pago).join(Venta).join(Cliente)
-        if fecha_inicio and fecha_fin:
-            query_pagos = query_pagos.filter(
-                Pago.fecha_pago.between(
-                    datetime.combine(fecha_inicio, datetime.min.time()),
-                    datetime.combine(fecha_fin, datetime.max.time())
-                )
-            )
-        
-        for pago in query_pagos.all():
-            movimientos.append([
-                pago.fecha_pago.strftime('%d/%m/%Y'),
-                'Pago',
-                pago.numero_recibo,
-                pago.venta.cliente.nombre_completo,
-                pago.concepto,
-                f"${pago.monto:,.2f}",
-                "Procesado"
-            ])
-        
-        db.close()
-        
-        # Ordenar por fecha
-        movimientos.sort(key=lambda x: datetime.strptime(x[0], '%d/%m/%Y'), reverse=True)
-        
-        return movimientos, columns
+        columnas = [
+            Columna('fecha', FECHA),
+            Columna('tipo'),
+            Columna('numero'),
+            Columna('cliente', campo='cliente_nombre'),
+            Columna('concepto'),
+            Columna('monto', MONEDA),
+            Columna('estado')
+        ]
+        stmt = consulta_movimientos(fecha_inicio, fecha_fin)
+        return DatasetReporte("Movimientos", columnas, lambda: iterar_filas(stmt),
+                              total='monto', fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
     
     def get_ventas_data(self, fecha_inicio, fecha_fin):
         """Obtener datos de ventas"""
-        db = get_db_session()
-        
-        query = db.query(Venta).join(Cliente).join(Nicho)
-        
-        if fecha_inicio and fecha_fin:
-            query = query.filter(
-                Venta.fecha_venta.between(
-                    datetime.combine(fecha_inicio, datetime.min.time()),
-                    datetime.combine(fecha_fin, datetime.max.time())
-                )
-            )
-        
-        if self.solo_pagados.get():
-            query = query.filter(Venta.pagado_completamente == True)
-        
-        ventas = query.order_by(Venta.fecha_venta.desc()).all()
-        
-        columns = ['fecha', 'contrato', 'cliente', 'nicho', 'precio', 'tipo_pago', 'saldo', 'estado']
-        
-        data = []
-        for venta in ventas:
-            estado = "Pagado" if venta.pagado_completamente else "Pendiente"
-            data.append([
-                venta.fecha_venta.strftime('%d/%m/%Y'),
-                venta.numero_contrato,
-                venta.cliente.nombre_completo,
-                venta.nicho.numero,
-                f"${venta.precio_total:,.2f}",
-                venta.tipo_pago.title(),
-                f"${venta.saldo_restante:,.2f}",
-                estado
-            ])
-        
-        db.close()
-        return data, columns
+        pagado = True if self.solo_pagados.get() else None
+        stmt = consulta_ventas(pagado=pagado, orden=[Venta.fecha_venta.desc()],
+                               desde=fecha_inicio, hasta=fecha_fin)
+        
+        columnas = [
+            Columna('fecha', FECHA, campo='fecha_venta'),
+            Columna('contrato', campo='numero_contrato'),
+            Columna('cliente', campo='cliente_nombre'),
+            Columna('nicho', campo='nicho_numero'),
+            Columna('precio', MONEDA, campo='precio_total'),
+            Columna('tipo_pago', formato=str.title),
+            Columna('saldo', MONEDA, campo='saldo_restante'),
+            Columna('estado', campo='pagado_completamente',
+                    formato=lambda pagado: "Pagado" if pagado else "Pendiente")
+        ]
+        return DatasetReporte("Ventas", columnas, lambda: iterar_filas(stmt),
+                              total='precio', fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
     
     def get_pagos_data(self, fecha_inicio, fecha_fin):
         """Obtener datos de pagos"""
-        db = get_db_session()
-        
-        query = db.query(Pago).join(Venta).join(Cliente)
-        
-        if fecha_inicio and fecha_fin:
-            query = query.filter(
-                Pago.fecha_pago.between(
-                    datetime.combine(fecha_inicio, datetime.min.time()),
-                    datetime.combine(fecha_fin, datetime.max.time())
-                )
-            )
-        
-        pagos = query.order_by(Pago.fecha_pago.desc()).all()
-        
-        columns = ['fecha', 'recibo', 'contrato', 'cliente', 'monto', 'metodo', 'concepto']
-        
-        data = []
-        for pago in pagos:
-            data.append([
-                pago.fecha_pago.strftime('%d/%m/%Y'),
-                pago.numero_recibo,
-                pago.venta.numero_contrato,
-                pago.venta.cliente.nombre_completo,
-                f"${pago.monto:,.2f}",
-                pago.metodo_pago.title(),
-                pago.concepto
-            ])
-        
-        db.close()
-        return data, columns
+        stmt = consulta_pagos(desde=fecha_inicio, hasta=fecha_fin)
+        
+        columnas = [
+            Columna('fecha', FECHA, campo='fecha_pago'),
+            Columna('recibo', campo='numero_recibo'),
+            Columna('contrato', campo='numero_contrato'),
+            Columna('cliente', campo='cliente_nombre'),
+            Columna('monto', MONEDA),
+            Columna('metodo', campo='metodo_pago', formato=str.title),
+            Columna('concepto')
+        ]
+        return DatasetReporte("Pagos", columnas, lambda: iterar_filas(stmt),
+                              total='monto', fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
     
     def get_clientes_data(self, fecha_inicio, fecha_fin):
         """Obtener datos de clientes"""
-        db = get_db_session()
-        
-        query = db.query(Cliente)
-        
-        if fecha_inicio and fecha_fin:
-            query = query.filter(
-                Cliente.fecha_registro.between(
-                    datetime.combine(fecha_inicio, datetime.min.time()),
-                    datetime.combine(fecha_fin, datetime.max.time())
-                )
-            )
-        
-        clientes = query.order_by(Cliente.fecha_registro.desc()).all()
-        
-        columns = ['nombre', 'cedula', 'telefono', 'email', 'ventas', 'monto_total', 'fecha_registro']
-        
-        data = []
-        for cliente in clientes:
-            total_ventas = len(cliente.ventas)
-            monto_total = sum(venta.precio_total for venta in cliente.ventas)
-            
-            data.append([
-                cliente.nombre_completo,
-                cliente.cedula,
-                cliente.telefono or 'N/A',
-                cliente.email or 'N/A',
-                str(total_ventas),
-                f"${monto_total:,.2f}",
-                cliente.fecha_registro.strftime('%d/%m/%Y')
-            ])
-        
-        db.close()
-        return data, columns
+        stmt = consulta_clientes_ventas(fecha_inicio, fecha_fin)
+        
+        columnas = [
+            Columna('nombre', campo='cliente_nombre'),
+            Columna('cedula'),
+            Columna('telefono', vacio='N/A'),
+            Columna('email', vacio='N/A'),
+            Columna('ventas', ENTERO, campo='num_ventas'),
+            Columna('monto_total', MONEDA),
+            Columna('fecha_registro', FECHA)
+        ]
+        return DatasetReporte("Clientes", columnas, lambda: iterar_filas(stmt),
+                              fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
     
     def get_nichos_data(self):
         """Obtener datos de nichos"""
-        db = get_db_session()
-        
-        nichos = db.query(Nicho).order_by(Nicho.seccion, Nicho.fila, Nicho.columna).all()
-        
-        columns = ['numero', 'seccion', 'ubicacion', 'precio', 'estado', 'cliente', 'fecha_venta']
-        
-        data = []
-        for nicho in nichos:
-            estado = "Disponible" if nicho.disponible else "Vendido"
-            cliente = ""
-            fecha_venta = ""
-            
-            if nicho.ventas:
-                venta = nicho.ventas[0]  # Última venta
-                cliente = venta.cliente.nombre_completo
-                fecha_venta = venta.fecha_venta.strftime('%d/%m/%Y')
-            
-            precio_text = f"${nicho.precio:,.2f}" if nicho.precio is not None else "Sin precio"
-            data.append([
-                nicho.numero,
-                nicho.seccion,
-                f"F{nicho.fila}-C{nicho.columna}",
-                precio_text,
-                estado,
-                cliente,
-                fecha_venta
-            ])
-        
-        db.close()
-        return data, columns
+        stmt = consulta_nichos_ocupacion()
+        
+        columnas = [
+            Columna('numero'),
+            Columna('seccion'),
+            Columna('ubicacion'),
+            Columna('precio', MONEDA, vacio='Sin precio'),
+            Columna('estado', campo='disponible',
+                    formato=lambda disponible: "Disponible" if disponible else "Vendido"),
+            Columna('cliente', campo='cliente_nombre'),
+            Columna('fecha_venta', FECHA)
+        ]
+        return DatasetReporte("Nichos", columnas, lambda: iterar_filas(stmt))
     
     def get_saldos_pendientes_data(self):
         """Obtener datos de saldos pendientes"""
-        db = get_db_session()
-        
-        ventas = db.query(Venta).join(Cliente).filter(
-            Venta.pagado_completamente == False
-        ).order_by(Venta.saldo_restante.desc()).all()
-        
-        columns = ['contrato', 'cliente', 'nicho', 'precio_total', 'pagado', 'saldo', 'dias_vencido']
-        
-        data = []
-        for venta in ventas:
-            dias_vencido = (datetime.now().date() - venta.fecha_venta.date()).days
-            
-            data.append([
-                venta.numero_contrato,
-                venta.cliente.nombre_completo,
-                venta.nicho.numero,
-                f"${venta.precio_total:,.2f}",
-                f"${venta.total_pagado:,.2f}",
-                f"${venta.saldo_restante:,.2f}",
-                str(dias_vencido)
-            ])
-        
-        db.close()
-        return data, columns
+        # Una fila plana por venta: el total pagado viene de los acumulados de ventas
+        stmt = consulta_saldos_pendientes()
+        
+        columnas = [
+            Columna('contrato', campo='numero_contrato'),
+            Columna('cliente', campo='cliente_nombre'),
+            Columna('nicho', campo='nicho_numero'),
+            Columna('precio_total', MONEDA),
+            Columna('pagado', MONEDA, campo='total_pagado'),
+            Columna('saldo', MONEDA, campo='saldo_restante'),
+            Columna('dias_vencido', ENTERO)
+        ]
+        return DatasetReporte("Saldos Pendientes", columnas, lambda: iterar_filas(stmt))
     
     def get_resumen_financiero_data(self, fecha_inicio, fecha_fin):
-        """Obtener resumen financiero"""
+        """Obtener resumen financiero (agregados agrupados en SQL)"""
         db = get_db_session()
+        try:
+            resumen = obtener_resumen_financiero(db, fecha_inicio, fecha_fin)
+        finally:
+            db.close()
         
-        # Calcular totales
-        total_ventas = 0
-        total_pagos = 0
-        total_mantenimiento = 0
-        ventas_count = 0
-        pagos_count = 0
-        mantenimiento_count = 0
-
-        # Ventas en el período
-        query_ventas = db.query(Venta)
-        if fecha_inicio and fecha_fin:
-            query_ventas = query_ventas.filter(
-                Venta.fecha_venta.between(
-                    datetime.combine(fecha_inicio, datetime.min.time()),
-                    datetime.combine(fecha_fin, datetime.max.time())
-                )
-            )
-
-        ventas = query_ventas.all()
-        for venta in ventas:
-            total_ventas += venta.precio_total
-            ventas_count += 1
-
-        # Pagos en el período (separando mantenimiento de pagos normales)
-        query_pagos = db.query(Pago)
-        if fecha_inicio and fecha_fin:
-            query_pagos = query_pagos.filter(
-                Pago.fecha_pago.between(
-                    datetime.combine(fecha_inicio, datetime.min.time()),
-                    datetime.combine(fecha_fin, datetime.max.time())
-                )
-            )
-
-        pagos = query_pagos.all()
-        for pago in pagos:
-            if pago.concepto == 'Mantenimiento':
-                total_mantenimiento += pago.monto
-                mantenimiento_count += 1
-            else:
-                total_pagos += pago.monto
-                pagos_count += 1
-        
-        # Saldos pendientes (total)
-        saldo_pendiente = db.query(Venta).filter(
-            Venta.pagado_completamente == False
-        ).with_entities(db.func.sum(Venta.saldo_restante)).scalar() or 0
-        
-        db.close()
-        
-        columns = ['concepto', 'cantidad', 'monto']
+        totales = resumen['totales']
 
+        # El resumen es pequeño: se guarda completo y se recorre desde la lista
         data = [
-            ['Ventas del Período', str(ventas_count), f"${total_ventas:,.2f}"],
-            ['Pagos del Período (sin mantenimiento)', str(pagos_count), f"${total_pagos:,.2f}"],
-            ['Pagos de Mantenimiento', str(mantenimiento_count), f"${total_mantenimiento:,.2f}"],
-            ['Saldos Pendientes', '-', f"${saldo_pendiente:,.2f}"],
-            ['Diferencia (Pagos - Ventas)', '-', f"${total_pagos - total_ventas:,.2f}"]
+            FilaResumen('Ventas del Período', totales['ventas_count'], totales['ventas_monto'], False),
+            FilaResumen('Pagos del Período (sin mantenimiento)', totales['pagos_count'],
+                        totales['pagos_monto'], True),
+            FilaResumen('Pagos de Mantenimiento', totales['mantenimiento_count'],
+                        totales['mantenimiento_monto'], True),
+            FilaResumen('Saldos Pendientes', None, totales['saldo_pendiente'], False),
+            FilaResumen('Diferencia (Pagos - Ventas)', None,
+                        totales['pagos_monto'] - totales['ventas_monto'], False)
         ]
-        
-        return data, columns
+
+        # Desgloses: (origen, dimensión) -> título de las filas
+        periodo = 'Día' if resumen['periodo'] == 'dia' else 'Mes'
+        secciones = [
+            (('pagos', resumen['periodo']), f"Ingresos por {periodo}"),
+            (('pagos', 'metodo'), "Ingresos por Método"),
+            (('pagos', 'seccion'), "Ingresos por Sección"),
+            (('ventas', resumen['periodo']), f"Ventas por {periodo}"),
+            (('ventas', 'seccion'), "Ventas por Sección"),
+            (('saldos', 'seccion'), "Saldos por Sección"),
+        ]
+        for clave, titulo in secciones:
+            for fila in resumen['desgloses'].get(clave, []):
+                # Los ingresos incluyen mantenimiento; ventas y saldos no lo tienen
+                monto = fila.monto + fila.mantenimiento
+                data.append(FilaResumen(f"{titulo}: {fila.clave or 'N/A'}", fila.cantidad, monto, False))
+        
+        columnas = [
+            Columna('concepto'),
+            Columna('cantidad', ENTERO, vacio='-'),
+            Columna('monto', MONEDA)
+        ]
+        # Solo los ingresos del período (pagos y mantenimiento) suman al total
+        ingresos = {fila.concepto for fila in data if fila.es_ingreso}
+        return DatasetReporte("Resumen Financiero", columnas, lambda: data,
+                              total='monto', filtro_total=lambda fila: fila[0] in ingresos,
+                              fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
     
-    def update_stats(self, data, tipo):
+    def update_stats(self, dataset, total_registros, total_monto):
         """Actualizar estadísticas de la vista previa"""
-        total_registros = len(data)
-        
-        if tipo in ['movimientos', 'ventas', 'pagos', 'resumen_financiero']:
-            # Calcular totales monetarios
-            total_monto = 0
-            for row in data:
-                monto_str = None
-                if tipo == 'movimientos':
-                    monto_str = row[5]  # columna monto
-                elif tipo == 'ventas':
-                    monto_str = row[4]  # columna precio
-                elif tipo == 'pagos':
-                    monto_str = row[4]  # columna monto
-                elif tipo == 'resumen_financiero':
-                    monto_str = row[2]  # columna monto
-                
-                if monto_str and monto_str.startswith('$'):
-                    try:
-                        monto = float(monto_str.replace('$', '').replace(',', ''))
-                        total_monto += monto
-                    except ValueError:
-                        pass
-            
-            stats_text = f"Total de registros: {total_registros} | Monto total: ${total_monto:,.2f}"
-        else:
-            stats_text = f"Total de registros: {total_registros}"
+        stats_text = f"Total de registros: {total_registros}"
+        if dataset.tiene_total:
+            stats_text += f" | Monto total: ${total_monto:,.2f}"
+        if total_registros > LIMITE_VISTA_PREVIA:
+            stats_text += f" | Vista previa: primeros {LIMITE_VISTA_PREVIA} (la exportación incluye todos)"
         
         self.stats_label.config(text=stats_text)
     
     def clear_preview(self):
         """Limpiar vista previa"""
+        self.dataset = None
+        
         # Limpiar TreeView
-        for item in self.preview_tree.get_children():
-            self.preview_tree.delete(item)
+        self.preview_tree.delete(*self.preview_tree.get_children())
         
         # Limpiar columnas
         self.preview_tree['columns'] = ()
@@ -606,8 +466,8 @@ class ReportesManager:
     
     def export_report(self):
         """Exportar reporte"""
-        # Verificar que hay datos en la vista previa
-        if not self.preview_tree.get_children():
+        # Verificar que se generó la vista previa
+        if self.dataset is None:
             messagebox.showwarning("Advertencia", "Genere primero la vista previa del reporte")
             return
         
@@ -651,22 +511,8 @@ class ReportesManager:
     
     def export_to_pdf(self, filename):
         """Exportar a PDF"""
-        # Obtener datos de la vista previa
-        columns = self.preview_tree['columns']
-        data = []
-        
-        for item in self.preview_tree.get_children():
-            values = self.preview_tree.item(item)['values']
-            data.append(dict(zip(columns, values)))
-        
-        # Obtener rango de fechas
-        fecha_inicio, fecha_fin = self.get_date_range()
-        
-        # Generar PDF usando el generador de reportes
-        pdf_path = self.pdf_generator.generar_reporte_movimientos(
-            data, fecha_inicio or datetime.now().date(), 
-            fecha_fin or datetime.now().date(), filename
-        )
+        # Las filas se vuelven a leer de la base de datos, no de la vista previa
+        pdf_path = self.pdf_generator.generar_reporte_tabla(self.dataset, filename)
         
         messagebox.showinfo("Éxito", f"Reporte exportado exitosamente a:\n{pdf_path}")
         
@@ -676,59 +522,14 @@ class ReportesManager:
     
     def export_to_csv(self, filename):
         """Exportar a CSV"""
-        columns = self.preview_tree['columns']
-        
-        with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile)
-            
-            # Escribir encabezados
-            writer.writerow([col.replace('_', ' ').title() for col in columns])
-            
-            # Escribir datos
-            for item in self.preview_tree.get_children():
-                values = self.preview_tree.item(item)['values']
-                writer.writerow(values)
+        exportar_csv(self.dataset, filename)
         
         messagebox.showinfo("Éxito", f"Reporte exportado exitosamente a:\n{filename}")
     
     def export_to_excel(self, filename):
         """Exportar a Excel"""
         try:
-            import openpyxl
-            from openpyxl.styles import Font, PatternFill
-            
-            wb = openpyxl.Workbook()
-            ws = wb.active
-            ws.title = "Reporte"
-            
-            columns = self.preview_tree['columns']
-            
-            # Escribir encabezados con formato
-            for col_num, column in enumerate(columns, 1):
-                cell = ws.cell(row=1, column=col_num, value=column.replace('_', ' ').title())
-                cell.font = Font(bold=True)
-                cell.fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
-            
-            # Escribir datos
-            for row_num, item in enumerate(self.preview_tree.get_children(), 2):
-                values = self.preview_tree.item(item)['values']
-                for col_num, value in enumerate(values, 1):
-                    ws.cell(row=row_num, column=col_num, value=value)
-            
-            # Ajustar ancho de columnas
-            for column in ws.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)
-                ws.column_dimensions[column_letter].width = adjusted_width
-            
-            wb.save(filename)
+            exportar_excel(self.dataset, filename)
             messagebox.showinfo("Éxito", f"Reporte exportado exitosamente a:\n{filename}")
             
         except ImportError:
@@ -740,7 +541,7 @@ class ReportesManager:
     def print_report(self):
         """Imprimir reporte"""
         # Verificar que hay datos
-        if not self.preview_tree.get_children():
+        if self.dataset is None:
             messagebox.showwarning("Advertencia", "Genere primero la vista previa del reporte")
             return
         
@@ -0,0 +1,126 @@
+# ui/search_dispatcher.py
+"""
+Despachador de búsquedas: retrasa las pulsaciones y ejecuta la consulta en un hilo de trabajo
+"""
+
+import queue
+import threading
+import sqlite3
+from database.models import get_db_session
+
+
+class SearchDispatcher:
+    """
+    Ejecuta una búsqueda a la vez fuera del hilo de Tk.
+
+    Cada envío reemplaza al anterior: se cancela el retardo pendiente, se interrumpe
+    la consulta en curso y cualquier resultado viejo se descarta al llegar.
+    """
+
+    def __init__(self, widget, delay_ms=300, poll_ms=30):
+        self.widget = widget
+        self.delay_ms = delay_ms
+        self.poll_ms = poll_ms
+
+        self._after_id = None
+        self._generation = 0
+        self._results = queue.Queue()
+        self._running = 0
+        self._polling = False
+        self._lock = threading.Lock()
+        self._active_connection = None
+
+    def submit(self, work, on_result, on_error=None):
+        """
+        Programar una búsqueda
+
+        Args:
+            work: Función que recibe una sesión propia y devuelve el resultado (corre en el hilo)
+            on_result: Función que recibe el resultado en el hilo de Tk
+            on_error: Función opcional que recibe la excepción en el hilo de Tk
+        """
+        self.cancel()
+        generation = self._generation
+        self._after_id = self.widget.after(
+            self.delay_ms, lambda: self._start(generation, work, on_result, on_error)
+        )
+
+    def cancel(self):
+        """Descartar la búsqueda pendiente y detener la que esté en curso"""
+        self._generation += 1
+        if self._after_id:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+
+        with self._lock:
+            if self._active_connection is not None:
+                try:
+                    self._active_connection.interrupt()
+                except Exception:
+                    pass
+
+    def _start(self, generation, work, on_result, on_error):
+        """Lanzar el hilo de trabajo cuando termina el retardo"""
+        self._after_id = None
+        if generation != self._generation:
+            return
+
+        self._running += 1
+        thread = threading.Thread(
+            target=self._run, args=(generation, work, on_result, on_error), daemon=True
+        )
+        thread.start()
+
+        if not self._polling:
+            self._polling = True
+            self.widget.after(self.poll_ms, self._poll)
+
+    def _run(self, generation, work, on_result, on_error):
+        """Ejecutar la consulta con una sesión exclusiva del hilo"""
+        db = get_db_session()
+        result, error = None, None
+        raw_connection = None
+        try:
+            # Guardar la conexión cruda para poder interrumpirla desde el hilo de Tk
+            raw_connection = db.connection().connection.dbapi_connection
+            with self._lock:
+                if generation != self._generation:
+                    return
+                self._active_connection = raw_connection
+
+            result = work(db)
+        except Exception as e:
+            error = e
+        finally:
+            # Una búsqueda más nueva pudo registrar ya su propia conexión
+            with self._lock:
+                if self._active_connection is raw_connection:
+                    self._active_connection = None
+            db.close()
+            self._results.put((generation, result, error, on_result, on_error))
+
+    def _poll(self):
+        """Entregar en el hilo de Tk los resultados que siguen vigentes"""
+        while True:
+            try:
+                generation, result, error, on_result, on_error = self._results.get_nowait()
+            except queue.Empty:
+                break
+
+            self._running -= 1
+            if generation != self._generation:
+                continue
+            if error is None:
+                on_result(result)
+            elif on_error and not self._is_interrupted(error):
+                on_error(error)
+
+        if self._running > 0:
+            self.widget.after(self.poll_ms, self._poll)
+        else:
+            self._polling = False
+
+    def _is_interrupted(self, error):
+        """Indica si el error proviene de una consulta interrumpida"""
+        original = getattr(error, 'orig', error)
+        return isinstance(original, sqlite3.OperationalError) and 'interrupted' in str(original)
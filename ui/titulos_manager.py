@@ -6,18 +6,26 @@ Interfaz para la gestión de títulos de propiedad
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import os
-import glob
+import queue
 from datetime import datetime
-from database.models import get_db_session, Venta, Cliente, Nicho, Beneficiario
-from reports.pdf_generator import PDFGenerator
+from database.models import get_db_session, Venta, Beneficiario
+from database.consultas import consulta_ventas_titulos, obtener_filas, obtener_datos_titulos
+from database.estadisticas import estadisticas
+from database.documentos import buscar_documento
+from ui.search_dispatcher import SearchDispatcher
+from reports.lote_titulos import LoteTitulos
+from reports.cola_documentos import cola_documentos, TITULO, TERMINADO
+
+# Milisegundos entre lecturas del avance de un lote de títulos
+INTERVALO_PROGRESO_LOTE = 100
 
 class TitulosManager:
     def __init__(self, parent, update_status_callback):
         self.parent = parent
         self.update_status = update_status_callback
         self.tree = None
+        self.search_dispatcher = SearchDispatcher(self.parent)
         self.search_var = tk.StringVar()
-        self.pdf_generator = PDFGenerator()
         
     def show(self):
         """Mostrar interfaz de gestión de títulos"""
@@ -126,68 +134,60 @@ class TitulosManager:
     
     def load_eligible_sales(self):
         """Cargar ventas elegibles para generar títulos"""
+        # Una carga directa reemplaza cualquier búsqueda en curso
+        self.search_dispatcher.cancel()
         try:
             db = get_db_session()
             
             # Obtener todas las ventas
-            ventas = db.query(Venta).join(Cliente).join(Nicho).order_by(
-                Venta.fecha_venta.desc()
-            ).all()
-            
-            # Limpiar TreeView
-            for item in self.tree.get_children():
-                self.tree.delete(item)
+            ventas = obtener_filas(db, consulta_ventas_titulos())
+            db.close()
             
-            # Agregar ventas
-            for venta in ventas:
-                cliente_nombre = venta.cliente.nombre_completo if venta.cliente else "N/A"
-                nicho_numero = venta.nicho.numero if venta.nicho else "N/A"
-                estado_pago = "Pagado" if venta.pagado_completamente else "Pendiente"
-                
-                # Contar beneficiarios
-                num_beneficiarios = len(venta.beneficiarios)
-                beneficiarios_text = f"{num_beneficiarios} registrados" if num_beneficiarios > 0 else "Sin beneficiarios"
-                
-                # Verificar si ya se generó título
-                existing_title = self.find_existing_title(venta.numero_contrato)
-                if existing_title and os.path.exists(existing_title):
-                    titulo_generado = "Generado"
-                elif venta.pagado_completamente:
-                    titulo_generado = "Listo"
-                else:
-                    titulo_generado = "Pendiente"
-                
-                values = (
-                    venta.numero_contrato,
-                    venta.fecha_venta.strftime("%d/%m/%Y"),
-                    cliente_nombre,
-                    nicho_numero,
-                    f"${venta.precio_total:,.2f}",
-                    estado_pago,
-                    beneficiarios_text,
-                    titulo_generado
-                )
-                
-                item = self.tree.insert('', 'end', values=values)
-                
-                # Colorear según estado
-                if venta.pagado_completamente:
-                    # self.tree.item(item, tags=('listo',))
-                    pass
-                else:
-                    # self.tree.item(item, tags=('pendiente',))
-                    pass
+            self.display_sales(ventas)
             
             # Configurar tags para colores
             self.tree.tag_configure('listo', background='#d4edda')
             self.tree.tag_configure('pendiente', background='#fff3cd')
             
-            db.close()
             self.update_status(f"Ventas cargadas: {len(ventas)}")
             
         except Exception as e:
             messagebox.showerror("Error", f"Error al cargar ventas: {str(e)}")
     
+    def display_sales(self, ventas):
+        """Mostrar filas de ventas en el TreeView"""
+        # Limpiar TreeView
+        for item in self.tree.get_children():
+            self.tree.delete(item)
+        
+        for venta in ventas:
+            estado_pago = "Pagado" if venta.pagado_completamente else "Pendiente"
+            
+            # Contar beneficiarios
+            num_beneficiarios = venta.num_beneficiarios
+            beneficiarios_text = f"{num_beneficiarios} registrados" if num_beneficiarios > 0 else "Sin beneficiarios"
+            
+            # La consulta indica si ya se generó título (índice de documentos)
+            if venta.titulo_generado:
+                titulo_generado = "Generado"
+            elif venta.pagado_completamente:
+                titulo_generado = "Listo"
+            else:
+                titulo_generado = "Pendiente"
+            
+            values = (
+                venta.numero_contrato,
+                venta.fecha_venta.strftime("%d/%m/%Y"),
+                venta.cliente_nombre or "N/A",
+                venta.nicho_numero or "N/A",
+                f"${venta.precio_total:,.2f}",
+                estado_pago,
+                beneficiarios_text,
+                titulo_generado
+            )
+            
+            self.tree.insert('', 'end', values=values)
+    
     def generate_title(self):
         """Generar título de propiedad para la venta seleccionada"""
         selected = self.tree.selection()
@@ -225,21 +225,13 @@ class TitulosManager:
             messagebox.showerror("Error", f"Error al generar título: {str(e)}")
     
     def find_existing_title(self, numero_contrato):
-        """Buscar títulos existentes para un contrato"""
+        """Buscar el título más reciente de un contrato en el índice de documentos"""
         try:
-            # Crear directorio si no existe
-            titulos_dir = os.path.abspath("titulos")
-            os.makedirs(titulos_dir, exist_ok=True)
-
-            # Buscar archivos con el patrón titulo_{numero_contrato}_*.pdf
-            pattern = os.path.join(titulos_dir, f"titulo_{numero_contrato}_*.pdf")
-            existing_files = glob.glob(pattern)
-
-            if existing_files:
-                # Retornar el archivo más reciente (ruta absoluta)
-                return max(existing_files, key=os.path.getctime)
+            db = get_db_session()
+            documento = buscar_documento(db, TITULO, numero_contrato=numero_contrato)
+            db.close()
 
-            return None
+            return documento.ruta if documento else None
 
         except Exception as e:
             print(f"Error buscando título existente: {str(e)}")
@@ -291,31 +283,43 @@ class TitulosManager:
                         'orden': beneficiario.orden
                     })
             
-            # Generar PDF del título
-            pdf_path = self.pdf_generator.generar_titulo_propiedad(
-                venta_data, cliente_data, nicho_data, beneficiarios_data
+            # El título se genera en segundo plano; al terminar se ofrece abrirlo
+            cola_documentos.encolar(
+                TITULO, venta_data, cliente_data, nicho_data, beneficiarios_data,
+                descripcion=f"título {venta.numero_contrato}",
+                al_terminar=self.on_title_ready
             )
-
-            # Convertir a ruta absoluta y verificar que existe
-            absolute_pdf_path = os.path.abspath(pdf_path)
-
-            # Preguntar si desea abrir el PDF
-            response = messagebox.askyesno("Título Generado",
-                f"Título de propiedad generado exitosamente:\n{os.path.basename(pdf_path)}\n\n¿Desea abrirlo ahora?")
-
-            if response:
-                if os.path.exists(absolute_pdf_path):
-                    try:
-                        os.startfile(absolute_pdf_path)  # Windows
-                    except Exception as open_error:
-                        messagebox.showerror("Error", f"Error al abrir el archivo: {str(open_error)}")
-                else:
-                    messagebox.showerror("Error", f"No se puede encontrar el archivo generado: {absolute_pdf_path}")
-            
-            self.update_status("Título de propiedad generado exitosamente")
+            self.update_status(f"Generando título de propiedad {venta.numero_contrato}...")
             
         except Exception as e:
             messagebox.showerror("Error", f"Error al generar título: {str(e)}")
+
+    def on_title_ready(self, trabajo):
+        """Avisar que el título terminó (se llama en el hilo de Tk)"""
+        if trabajo.estado != TERMINADO:
+            messagebox.showerror("Error", f"Error al generar título: {str(trabajo.error)}")
+            return
+
+        # Convertir a ruta absoluta y verificar que existe
+        absolute_pdf_path = os.path.abspath(trabajo.ruta)
+
+        self.update_status("Título de propiedad generado exitosamente")
+
+        # El título nuevo cambia la columna de estado
+        self.load_eligible_sales()
+
+        # Preguntar si desea abrir el PDF
+        response = messagebox.askyesno("Título Generado",
+            f"Título de propiedad generado exitosamente:\n{os.path.basename(trabajo.ruta)}\n\n¿Desea abrirlo ahora?")
+
+        if response:
+            if os.path.exists(absolute_pdf_path):
+                try:
+                    os.startfile(absolute_pdf_path)  # Windows
+                except Exception as open_error:
+                    messagebox.showerror("Error", f"Error al abrir el archivo: {str(open_error)}")
+            else:
+                messagebox.showerror("Error", f"No se puede encontrar el archivo generado: {absolute_pdf_path}")
     
     def view_title(self):
         """Ver título existente o generar vista previa"""
@@ -388,133 +392,109 @@ class TitulosManager:
         dialog = BatchTitulosDialog(self.parent)
         if dialog.result:
             try:
-                db = get_db_session()
-                
-                # Obtener ventas según criterios
-                query = db.query(Venta).join(Cliente).join(Nicho)
-                
-                if dialog.result['solo_pagadas']:
-                    query = query.filter(Venta.pagado_completamente == True)
-                
+                fecha_desde = None
+                fecha_hasta = None
                 if dialog.result['fecha_desde']:
-                    fecha_desde = datetime.strptime(dialog.result['fecha_desde'], "%Y-%m-%d")
-                    query = query.filter(Venta.fecha_venta >= fecha_desde)
-                
+                    fecha_desde = datetime.strptime(dialog.result['fecha_desde'], "%Y-%m-%d").date()
                 if dialog.result['fecha_hasta']:
-                    fecha_hasta = datetime.strptime(dialog.result['fecha_hasta'], "%Y-%m-%d")
-                    query = query.filter(Venta.fecha_venta <= fecha_hasta)
+                    fecha_hasta = datetime.strptime(dialog.result['fecha_hasta'], "%Y-%m-%d").date()
                 
-                ventas = query.all()
+                # Instantánea de todos los datos en una sola consulta
+                db = get_db_session()
+                try:
+                    titulos_data = obtener_datos_titulos(
+                        db, dialog.result['solo_pagadas'], fecha_desde, fecha_hasta
+                    )
+                finally:
+                    db.close()
                 
-                if not ventas:
+                if not titulos_data:
                     messagebox.showinfo("Información", "No se encontraron ventas que cumplan los criterios")
-                    db.close()
                     return
                 
                 # Confirmar generación
                 response = messagebox.askyesno("Confirmación", 
-                    f"Se generarán {len(ventas)} títulos de propiedad.\n¿Desea continuar?")
+                    f"Se generarán {len(titulos_data)} títulos de propiedad.\n¿Desea continuar?")
                 
                 if not response:
-                    db.close()
                     return
                 
-                # Generar títulos
-                generated_count = 0
-                errors = []
-                
-                progress_dialog = ProgressDialog(self.parent, "Generando Títulos", len(ventas))
-                
-                for i, venta in enumerate(ventas):
-                    try:
-                        progress_dialog.update_progress(i + 1, f"Generando título para {venta.numero_contrato}")
-                        self.create_title_pdf(venta)
-                        generated_count += 1
-                    except Exception as e:
-                        errors.append(f"Error en {venta.numero_contrato}: {str(e)}")
-                    
-                    if progress_dialog.cancelled:
-                        break
-                
-                progress_dialog.close()
-                
-                # Mostrar resultado
-                message = f"Se generaron {generated_count} títulos exitosamente"
-                if errors:
-                    message += f"\n\nErrores ({len(errors)}):\n" + "\n".join(errors[:5])
-                    if len(errors) > 5:
-                        message += f"\n... y {len(errors) - 5} errores más"
-                
-                messagebox.showinfo("Resultado", message)
-                self.update_status(f"Lote generado: {generated_count} títulos")
-                
-                db.close()
+                # Generar títulos en varios procesos; la interfaz solo muestra el avance
+                lote = LoteTitulos(titulos_data, combinar=dialog.result['combinar'])
+                progress_dialog = ProgressDialog(self.parent, "Generando Títulos", lote.total)
+                lote.iniciar()
+                self.parent.after(INTERVALO_PROGRESO_LOTE, self._check_batch_progress, lote, progress_dialog)
                 
             except Exception as e:
                 messagebox.showerror("Error", f"Error al generar lote: {str(e)}")
     
+    def _check_batch_progress(self, lote, progress_dialog):
+        """Leer los eventos del lote y reflejarlos en el diálogo de progreso"""
+        if progress_dialog.cancelled:
+            lote.cancelar()
+            progress_dialog.progress_label.config(text="Cancelando... esperando los títulos en curso")
+        
+        try:
+            while True:
+                evento = lote.eventos.get_nowait()
+                if evento[0] == 'progreso':
+                    _, completados, _, mensaje = evento
+                    if not progress_dialog.cancelled:
+                        progress_dialog.update_progress(completados, mensaje)
+                elif evento[0] == 'fin':
+                    progress_dialog.close()
+                    self._show_batch_result(evento[1])
+                    return
+        except queue.Empty:
+            pass
+        
+        self.parent.after(INTERVALO_PROGRESO_LOTE, self._check_batch_progress, lote, progress_dialog)
+    
+    def _show_batch_result(self, resultado):
+        """Mostrar el resultado del lote"""
+        generated_count = len(resultado['generados'])
+        errors = resultado['errores']
+        
+        message = f"Se generaron {generated_count} títulos exitosamente"
+        if resultado['cancelado']:
+            message += " (generación cancelada)"
+        if errors:
+            message += f"\n\nErrores ({len(errors)}):\n" + "\n".join(errors[:5])
+            if len(errors) > 5:
+                message += f"\n... y {len(errors) - 5} errores más"
+        
+        self.update_status(f"Lote generado: {generated_count} títulos")
+        
+        combinado = resultado['combinado']
+        if combinado and os.path.exists(combinado):
+            message += f"\n\nPDF para imprimir: {os.path.basename(combinado)}\n¿Desea abrirlo ahora?"
+            if messagebox.askyesno("Resultado", message):
+                try:
+                    os.startfile(combinado)  # Windows
+                except Exception as e:
+                    messagebox.showerror("Error", f"Error al abrir el archivo: {str(e)}")
+        else:
+            messagebox.showinfo("Resultado", message)
+        
+        # Los títulos nuevos cambian la columna de estado
+        self.load_eligible_sales()
+    
     def on_search(self, event=None):
-        """Filtrar ventas según búsqueda"""
+        """Filtrar ventas según búsqueda (con retardo y en segundo plano)"""
         search_term = self.search_var.get().lower()
         
-        if not search_term:
-            self.load_eligible_sales()
-            return
-        
-        try:
-            db = get_db_session()
-            query = db.query(Venta).join(Cliente).join(Nicho)
-            
-            # Filtrar por término de búsqueda
-            query = query.filter(
-                Venta.numero_contrato.contains(search_term) |
-                Cliente.nombre.contains(search_term) |
-                Cliente.apellido.contains(search_term) |
-                Cliente.cedula.contains(search_term) |
-                Nicho.numero.contains(search_term)
-            )
-            
-            ventas = query.order_by(Venta.fecha_venta.desc()).all()
-            
-            # Actualizar TreeView
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-            
-            for venta in ventas:
-                cliente_nombre = venta.cliente.nombre_completo if venta.cliente else "N/A"
-                nicho_numero = venta.nicho.numero if venta.nicho else "N/A"
-                estado_pago = "Pagado" if venta.pagado_completamente else "Pendiente"
-                
-                num_beneficiarios = len(venta.beneficiarios)
-                beneficiarios_text = f"{num_beneficiarios} registrados" if num_beneficiarios > 0 else "Sin beneficiarios"
-                
-                # Verificar si ya se generó título
-                existing_title = self.find_existing_title(venta.numero_contrato)
-                if existing_title and os.path.exists(existing_title):
-                    titulo_generado = "Generado"
-                elif venta.pagado_completamente:
-                    titulo_generado = "Listo"
-                else:
-                    titulo_generado = "Pendiente"
-                
-                values = (
-                    venta.numero_contrato,
-                    venta.fecha_venta.strftime("%d/%m/%Y"),
-                    cliente_nombre,
-                    nicho_numero,
-                    f"${venta.precio_total:,.2f}",
-                    estado_pago,
-                    beneficiarios_text,
-                    titulo_generado
-                )
-                
-                self.tree.insert('', 'end', values=values)
-            
-            db.close()
-            self.update_status(f"Búsqueda: {len(ventas)} resultados")
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Error en búsqueda: {str(e)}")
+        def mostrar(ventas):
+            self.display_sales(ventas)
+            if search_term:
+                self.update_status(f"Búsqueda: {len(ventas)} resultados")
+            else:
+                self.update_status(f"Ventas cargadas: {len(ventas)}")
+        
+        self.search_dispatcher.submit(
+            lambda db: obtener_filas(db, consulta_ventas_titulos(busqueda=search_term or None)),
+            mostrar,
+            lambda e: messagebox.showerror("Error", f"Error en búsqueda: {str(e)}")
+        )
     
     def clear_search(self):
         """Limpiar búsqueda"""
@@ -525,65 +505,23 @@ class TitulosManager:
     def apply_filters(self):
         """Aplicar filtros de estado"""
         filter_value = self.filter_estado.get()
+        self.search_dispatcher.cancel()
         
         try:
-            db = get_db_session()
-            query = db.query(Venta).join(Cliente).join(Nicho)
-            
-            # Aplicar filtro de búsqueda si existe
-            search_term = self.search_var.get().lower()
-            if search_term:
-                query = query.filter(
-                    Venta.numero_contrato.contains(search_term) |
-                    Cliente.nombre.contains(search_term) |
-                    Cliente.apellido.contains(search_term) |
-                    Cliente.cedula.contains(search_term) |
-                    Nicho.numero.contains(search_term)
-                )
-            
             # Aplicar filtro de estado
+            pagado = None
             if filter_value == "Listos":
-                query = query.filter(Venta.pagado_completamente == True)
+                pagado = True
             elif filter_value == "Pendientes":
-                query = query.filter(Venta.pagado_completamente == False)
-            
-            ventas = query.order_by(Venta.fecha_venta.desc()).all()
-            
-            # Actualizar TreeView
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-            
-            for venta in ventas:
-                cliente_nombre = venta.cliente.nombre_completo if venta.cliente else "N/A"
-                nicho_numero = venta.nicho.numero if venta.nicho else "N/A"
-                estado_pago = "Pagado" if venta.pagado_completamente else "Pendiente"
-                
-                num_beneficiarios = len(venta.beneficiarios)
-                beneficiarios_text = f"{num_beneficiarios} registrados" if num_beneficiarios > 0 else "Sin beneficiarios"
-                
-                # Verificar si ya se generó título
-                existing_title = self.find_existing_title(venta.numero_contrato)
-                if existing_title and os.path.exists(existing_title):
-                    titulo_generado = "Generado"
-                elif venta.pagado_completamente:
-                    titulo_generado = "Listo"
-                else:
-                    titulo_generado = "Pendiente"
-                
-                values = (
-                    venta.numero_contrato,
-                    venta.fecha_venta.strftime("%d/%m/%Y"),
-                    cliente_nombre,
-                    nicho_numero,
-                    f"${venta.precio_total:,.2f}",
-                    estado_pago,
-                    beneficiarios_text,
-                    titulo_generado
-                )
-                
-                self.tree.insert('', 'end', values=values)
+                pagado = False
             
+            db = get_db_session()
+            ventas = obtener_filas(db, consulta_ventas_titulos(
+                busqueda=self.search_var.get().lower() or None, pagado=pagado
+            ))
             db.close()
+            
+            self.display_sales(ventas)
             self.update_status(f"Filtro aplicado: {len(ventas)} resultados")
             
         except Exception as e:
@@ -592,17 +530,11 @@ class TitulosManager:
     def update_info_display(self, parent):
         """Actualizar display de información"""
         try:
-            db = get_db_session()
-            
-            total_ventas = db.query(Venta).count()
-            ventas_pagadas = db.query(Venta).filter(Venta.pagado_completamente == True).count()
-            ventas_pendientes = total_ventas - ventas_pagadas
+            cifras = estadisticas.obtener()
             
-            db.close()
-            
-            info_text = (f"Total Ventas: {total_ventas} | "
-                        f"Listas para Título: {ventas_pagadas} | "
-                        f"Pendientes: {ventas_pendientes}")
+            info_text = (f"Total Ventas: {cifras['total_ventas']} | "
+                        f"Listas para Título: {cifras['ventas_pagadas']} | "
+                        f"Pendientes: {cifras['ventas_pendientes']}")
             
             ttk.Label(parent, text=info_text, font=("Arial", 10)).pack()
             
@@ -633,13 +565,14 @@ class BatchTitulosDialog:
         # Crear ventana modal
         self.dialog = tk.Toplevel(parent)
         self.dialog.title("Generación de Títulos en Lote")
-        self.dialog.geometry("400x300")
+        self.dialog.geometry("400x340")
         self.dialog.resizable(False, False)
         self.dialog.transient(parent)
         self.dialog.grab_set()
         
         # Variables
         self.solo_pagadas = tk.BooleanVar(value=True)
+        self.combinar = tk.BooleanVar(value=False)
         self.fecha_desde = tk.StringVar()
         self.fecha_hasta = tk.StringVar()
         
@@ -679,9 +612,13 @@ class BatchTitulosDialog:
         ttk.Label(main_frame, text="Formato de fecha: YYYY-MM-DD", 
                  font=("Arial", 9), foreground="gray").grid(row=6, column=0, columnspan=2, pady=5)
         
+        # PDF único para imprimir
+        ttk.Checkbutton(main_frame, text="Generar también un PDF con todos los títulos",
+                       variable=self.combinar).grid(row=7, column=0, columnspan=2, sticky=tk.W, pady=5)
+        
         # Botones
         button_frame = ttk.Frame(main_frame)
-        button_frame.grid(row=7, column=0, columnspan=2, pady=20)
+        button_frame.grid(row=8, column=0, columnspan=2, pady=20)
         
         ttk.Button(button_frame, text="Generar", command=self.save).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="Cancelar", command=self.cancel).pack(side=tk.LEFT, padx=5)
@@ -716,7 +653,8 @@ class BatchTitulosDialog:
         self.result = {
             'solo_pagadas': self.solo_pagadas.get(),
             'fecha_desde': fecha_desde if fecha_desde else None,
-            'fecha_hasta': fecha_hasta if fecha_hasta else None
+            'fecha_hasta': fecha_hasta if fecha_hasta else None,
+            'combinar': self.combinar.get()
         }
         
         self.dialog.destroy()
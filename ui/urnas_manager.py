@@ -10,18 +10,63 @@ from database.models import (
     get_db_session, Urna, Venta, Nicho,
     generar_numero_urna_para_nicho
 )
+from database.consultas import (consulta_urnas, consulta_ventas, obtener_filas,
+                                ConsultaPaginada, ORDEN_URNAS)
+from database.estadisticas import estadisticas
+from ui.virtual_treeview import VirtualTreeview
+from ui.search_dispatcher import SearchDispatcher
 from datetime import datetime, timedelta
 from sqlalchemy import and_
-from reports.pdf_generator import PDFGenerator
+from reports.cola_documentos import cola_documentos, CONSENTIMIENTO_URNA, TERMINADO
+
+
+def datos_consentimiento(urna, venta):
+    """
+    Copiar los datos del consentimiento mientras la sesión sigue abierta
+
+    Returns:
+        tuple: (urna_data, venta_data, cliente_data, nicho_data) para generar_consentimiento_urna
+    """
+    cliente = venta.cliente
+    nicho = venta.nicho
+
+    urna_data = {
+        'numero_urna': urna.numero_urna,
+        'nombre_difunto': urna.nombre_difunto,
+        'fecha_defuncion': urna.fecha_defuncion.strftime('%d/%m/%Y') if urna.fecha_defuncion else 'N/A',
+        'fecha_deposito_urna': urna.fecha_deposito_urna.strftime('%d/%m/%Y') if urna.fecha_deposito_urna else 'N/A',
+    }
+
+    venta_data = {
+        'numero_contrato': venta.numero_contrato,
+        'saldo_restante': venta.saldo_restante,
+    }
+
+    cliente_data = {
+        'nombre': cliente.nombre,
+        'apellido': cliente.apellido,
+        'cedula': cliente.cedula,
+    }
+
+    nicho_data = {
+        'numero': nicho.numero,
+        'seccion': nicho.seccion,
+        'fila': nicho.fila,
+        'columna': nicho.columna,
+    }
+
+    return urna_data, venta_data, cliente_data, nicho_data
+
 
 class UrnasManager:
     def __init__(self, parent, update_status_callback):
         self.parent = parent
         self.update_status = update_status_callback
         self.tree = None
+        self.virtual_tree = None
+        self.search_dispatcher = SearchDispatcher(self.parent)
         self.search_var = tk.StringVar()
         self.filter_var = tk.StringVar(value="Todos")
-        self.pdf_generator = PDFGenerator()
 
     def show(self):
         """Mostrar interfaz de gestión de urnas"""
@@ -76,7 +121,7 @@ class UrnasManager:
         self.update_info_display(info_frame)
 
     def create_urnas_tree(self, parent):
-        """Crear TreeView para mostrar urnas"""
+        """Crear TreeView virtual para mostrar urnas"""
         tree_frame = ttk.Frame(parent)
         tree_frame.grid(row=2, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         tree_frame.columnconfigure(0, weight=1)
@@ -84,16 +129,19 @@ class UrnasManager:
 
         # TreeView
         columns = ('nicho', 'urna_num', 'difunto', 'defuncion', 'deposito', 'depositante', 'crematorio')
-        self.tree = ttk.Treeview(tree_frame, columns=columns, show='headings', height=15)
+        self.virtual_tree = VirtualTreeview(tree_frame, columns, format_row=self.format_urna_row,
+                                            row_id=lambda urna: urna.id)
+        self.virtual_tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.tree = self.virtual_tree.tree
 
         # Configurar columnas
-        self.tree.heading('nicho', text='Nicho')
-        self.tree.heading('urna_num', text='Urna #')
-        self.tree.heading('difunto', text='Nombre del Difunto')
-        self.tree.heading('defuncion', text='Fecha Defuncion')
-        self.tree.heading('deposito', text='Fecha Deposito')
-        self.tree.heading('depositante', text='Depositante')
-        self.tree.heading('crematorio', text='Crematorio')
+        self.virtual_tree.heading('nicho', text='Nicho')
+        self.virtual_tree.heading('urna_num', text='Urna #')
+        self.virtual_tree.heading('difunto', text='Nombre del Difunto')
+        self.virtual_tree.heading('defuncion', text='Fecha Defuncion')
+        self.virtual_tree.heading('deposito', text='Fecha Deposito')
+        self.virtual_tree.heading('depositante', text='Depositante')
+        self.virtual_tree.heading('crematorio', text='Crematorio')
 
         self.tree.column('nicho', width=80)
         self.tree.column('urna_num', width=60)
@@ -103,103 +151,63 @@ class UrnasManager:
         self.tree.column('depositante', width=150)
         self.tree.column('crematorio', width=150)
 
-        # Scrollbars
-        v_scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree.yview)
-        h_scrollbar = ttk.Scrollbar(tree_frame, orient=tk.HORIZONTAL, command=self.tree.xview)
-        self.tree.configure(yscrollcommand=v_scrollbar.set, xscrollcommand=h_scrollbar.set)
-
-        # Grid
-        self.tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        v_scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
-        h_scrollbar.grid(row=1, column=0, sticky=(tk.W, tk.E))
-
         # Eventos
         self.tree.bind('<Double-1>', self.on_double_click)
 
     def load_urnas(self):
         """Cargar urnas desde la base de datos"""
-        try:
-            db = get_db_session()
-            urnas = db.query(Urna).join(Venta).join(Nicho).order_by(
-                Nicho.numero, Urna.fecha_deposito_urna
-            ).all()
-
-            # Limpiar TreeView
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-
-            # Agregar urnas
-            for urna in urnas:
-                venta = urna.venta
-                nicho = venta.nicho
-                valores = (
-                    nicho.numero,
-                    urna.numero_urna,
-                    urna.nombre_difunto,
-                    urna.fecha_defuncion.strftime("%d/%m/%Y"),
-                    urna.fecha_deposito_urna.strftime("%d/%m/%Y"),
-                    urna.nombre_depositante,
-                    urna.nombre_crematorio or "N/A"
-                )
+        total = self.show_urnas()
+        self.update_status(f"Total urnas: {total}")
 
-                self.tree.insert('', 'end', values=valores)
-
-            self.update_status(f"Total urnas: {len(urnas)}")
-            db.close()
+    def show_urnas(self, busqueda=None):
+        """Mostrar las urnas que cumplen la búsqueda; devuelve el total de filas"""
+        # Una carga directa reemplaza cualquier búsqueda en curso
+        self.search_dispatcher.cancel()
+        try:
+            self.virtual_tree.set_data_source(ConsultaPaginada(
+                consulta_urnas(busqueda=busqueda), ORDEN_URNAS, Urna.id
+            ))
+            return self.virtual_tree.total
         except Exception as e:
             messagebox.showerror("Error", f"Error al cargar urnas: {str(e)}")
             self.update_status("Error al cargar urnas")
+            return 0
+
+    def format_urna_row(self, urna):
+        """Formatear una fila de urna para el TreeView"""
+        return (
+            urna.nicho_numero,
+            urna.numero_urna,
+            urna.nombre_difunto,
+            urna.fecha_defuncion.strftime("%d/%m/%Y"),
+            urna.fecha_deposito_urna.strftime("%d/%m/%Y"),
+            urna.nombre_depositante,
+            urna.nombre_crematorio or "N/A"
+        )
 
     def on_search(self, event):
-        """Buscar urnas mientras se escribe"""
-        self.load_filtered_urnas()
+        """Buscar urnas mientras se escribe (con retardo y en segundo plano)"""
+        search_text = self.search_var.get().lower()
+        fuente = ConsultaPaginada(consulta_urnas(busqueda=search_text or None), ORDEN_URNAS, Urna.id)
+
+        def mostrar(resultado):
+            self.virtual_tree.set_data_source(fuente, resultado)
+            if search_text:
+                self.update_status(f"Resultados encontrados: {resultado[0]}")
+            else:
+                self.update_status(f"Total urnas: {resultado[0]}")
+
+        self.search_dispatcher.submit(
+            lambda db: self.virtual_tree.prefetch(fuente, db),
+            mostrar,
+            lambda e: messagebox.showerror("Error", f"Error en la búsqueda: {str(e)}")
+        )
 
     def clear_search(self):
         """Limpiar búsqueda"""
         self.search_var.set("")
         self.load_urnas()
 
-    def load_filtered_urnas(self):
-        """Cargar urnas filtradas por búsqueda"""
-        search_text = self.search_var.get().lower()
-        if not search_text:
-            self.load_urnas()
-            return
-
-        try:
-            db = get_db_session()
-            urnas = db.query(Urna).join(Venta).join(Nicho).filter(
-                (Urna.nombre_difunto.ilike(f"%{search_text}%")) |
-                (Urna.nombre_depositante.ilike(f"%{search_text}%")) |
-                (Nicho.numero.ilike(f"%{search_text}%")) |
-                (Urna.nombre_crematorio.ilike(f"%{search_text}%"))
-            ).order_by(Nicho.numero, Urna.fecha_deposito_urna).all()
-
-            # Limpiar TreeView
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-
-            # Agregar urnas filtradas
-            for urna in urnas:
-                venta = urna.venta
-                nicho = venta.nicho
-                valores = (
-                    nicho.numero,
-                    urna.numero_urna,
-                    urna.nombre_difunto,
-                    urna.fecha_defuncion.strftime("%d/%m/%Y"),
-                    urna.fecha_deposito_urna.strftime("%d/%m/%Y"),
-                    urna.nombre_depositante,
-                    urna.nombre_crematorio or "N/A"
-                )
-
-                self.tree.insert('', 'end', values=valores)
-
-            self.update_status(f"Resultados encontrados: {len(urnas)}")
-            db.close()
-        except Exception as e:
-            messagebox.showerror("Error", f"Error en la búsqueda: {str(e)}")
-
     def on_double_click(self, event):
         """Editar urna con doble click"""
         self.edit_urna()
@@ -226,7 +234,7 @@ class UrnasManager:
                     return
 
                 # Generar número de urna automático
-                numero_urna = generar_numero_urna_para_nicho(venta.nicho_id)
+                numero_urna = generar_numero_urna_para_nicho(venta.nicho_id, db)
 
                 urna = Urna(
                     venta_id=dialog.result['venta_id'],
@@ -244,68 +252,18 @@ class UrnasManager:
                 )
 
                 db.add(urna)
+
+                # Copiar los datos del consentimiento antes de que el commit expire los objetos
+                consentimiento = datos_consentimiento(urna, venta)
+
                 db.commit()
 
-                # Preparar datos para generar consentimiento
-                cliente = venta.cliente
-                nicho = venta.nicho
-
-                # Diccionarios con datos para el PDF
-                urna_data = {
-                    'numero_urna': numero_urna,
-                    'nombre_difunto': urna.nombre_difunto,
-                    'fecha_defuncion': urna.fecha_defuncion.strftime('%d/%m/%Y') if urna.fecha_defuncion else 'N/A',
-                    'fecha_deposito_urna': urna.fecha_deposito_urna.strftime('%d/%m/%Y') if urna.fecha_deposito_urna else 'N/A',
-                }
-
-                venta_data = {
-                    'numero_contrato': venta.numero_contrato,
-                    'saldo_restante': venta.saldo_restante,
-                }
-
-                cliente_data = {
-                    'nombre': cliente.nombre,
-                    'apellido': cliente.apellido,
-                    'cedula': cliente.cedula,
-                }
-
-                nicho_data = {
-                    'numero': nicho.numero,
-                    'seccion': nicho.seccion,
-                    'fila': nicho.fila,
-                    'columna': nicho.columna,
-                }
-
-                # Generar PDF de consentimiento
-                consentimiento_path = None
-                try:
-                    consentimiento_path = self.pdf_generator.generar_consentimiento_urna(
-                        urna_data, venta_data, cliente_data, nicho_data
-                    )
-
-                    # Preguntar si desea imprimir ahora
-                    imprimir_ahora = messagebox.askyesno(
-                        "Éxito",
-                        f"Urna #{numero_urna} registrada correctamente\n\n"
-                        f"¿Desea imprimir el documento de consentimiento ahora?"
-                    )
-
-                    if imprimir_ahora and consentimiento_path:
-                        # Abrir el archivo PDF
-                        import subprocess
-                        import os
-                        if os.name == 'nt':  # Windows
-                            os.startfile(consentimiento_path)
-                        else:  # Linux y macOS
-                            subprocess.Popen(['xdg-open', consentimiento_path])
-
-                except Exception as pdf_error:
-                    # Si hay error en PDF, mostrar advertencia pero continuar
-                    messagebox.showwarning(
-                        "Advertencia",
-                        f"Urna #{numero_urna} registrada correctamente\n\n"
-                        f"Sin embargo, hubo un error al generar el PDF de consentimiento:\n{str(pdf_error)}"
-                    )
+                # El consentimiento se genera en segundo plano; al terminar se ofrece imprimirlo
+                cola_documentos.encolar(
+                    CONSENTIMIENTO_URNA, *consentimiento,
+                    descripcion=f"consentimiento de la urna #{numero_urna}",
+                    al_terminar=self.on_new_consent_ready
+                )
 
                 db.close()
                 self.load_urnas()
@@ -414,61 +372,63 @@ class UrnasManager:
                 db.close()
                 return
 
-            # Obtener datos relacionados
-            venta = urna.venta
-            cliente = venta.cliente
-            nicho = venta.nicho
-
-            # Preparar datos para PDF
-            urna_data = {
-                'numero_urna': urna.numero_urna,
-                'nombre_difunto': urna.nombre_difunto,
-                'fecha_defuncion': urna.fecha_defuncion.strftime('%d/%m/%Y') if urna.fecha_defuncion else 'N/A',
-                'fecha_deposito_urna': urna.fecha_deposito_urna.strftime('%d/%m/%Y') if urna.fecha_deposito_urna else 'N/A',
-            }
-
-            venta_data = {
-                'numero_contrato': venta.numero_contrato,
-                'saldo_restante': venta.saldo_restante,
-            }
-
-            cliente_data = {
-                'nombre': cliente.nombre,
-                'apellido': cliente.apellido,
-                'cedula': cliente.cedula,
-            }
+            cola_documentos.encolar(
+                CONSENTIMIENTO_URNA, *datos_consentimiento(urna, urna.venta),
+                descripcion=f"consentimiento de la urna #{urna.numero_urna}",
+                al_terminar=self.on_consent_ready
+            )
+            db.close()
+            self.update_status(f"Generando consentimiento de la urna #{urna_numero}...")
 
-            nicho_data = {
-                'numero': nicho.numero,
-                'seccion': nicho.seccion,
-                'fila': nicho.fila,
-                'columna': nicho.columna,
-            }
+        except Exception as e:
+            messagebox.showerror("Error", f"Error al imprimir consentimiento: {str(e)}")
 
-            # Generar PDF de consentimiento
-            consentimiento_path = self.pdf_generator.generar_consentimiento_urna(
-                urna_data, venta_data, cliente_data, nicho_data
+    def on_new_consent_ready(self, trabajo):
+        """Ofrecer imprimir el consentimiento de una urna recién registrada"""
+        numero_urna = trabajo.datos[0]['numero_urna']
+        if trabajo.estado != TERMINADO:
+            # Si hay error en PDF, mostrar advertencia: la urna ya quedó registrada
+            messagebox.showwarning(
+                "Advertencia",
+                f"Urna #{numero_urna} registrada correctamente\n\n"
+                f"Sin embargo, hubo un error al generar el PDF de consentimiento:\n{str(trabajo.error)}"
             )
+            return
 
-            # Abrir el archivo PDF generado
-            import subprocess
-            import os
-            if os.name == 'nt':  # Windows
-                os.startfile(consentimiento_path)
-            else:  # Linux y macOS
-                subprocess.Popen(['xdg-open', consentimiento_path])
+        # Preguntar si desea imprimir ahora
+        imprimir_ahora = messagebox.askyesno(
+            "Éxito",
+            f"Urna #{numero_urna} registrada correctamente\n\n"
+            f"¿Desea imprimir el documento de consentimiento ahora?"
+        )
 
-            messagebox.showinfo("Éxito", f"Consentimiento generado e impreso:\n{consentimiento_path}")
-            db.close()
+        if imprimir_ahora:
+            self.open_consent_file(trabajo.ruta)
+
+    def on_consent_ready(self, trabajo):
+        """Abrir el consentimiento pedido desde la lista de urnas"""
+        if trabajo.estado != TERMINADO:
+            messagebox.showerror("Error", f"Error al imprimir consentimiento: {str(trabajo.error)}")
+            return
 
+        try:
+            self.open_consent_file(trabajo.ruta)
+            messagebox.showinfo("Éxito", f"Consentimiento generado e impreso:\n{trabajo.ruta}")
         except Exception as e:
             messagebox.showerror("Error", f"Error al imprimir consentimiento: {str(e)}")
 
+    def open_consent_file(self, consentimiento_path):
+        """Abrir el archivo PDF del consentimiento"""
+        import subprocess
+        import os
+        if os.name == 'nt':  # Windows
+            os.startfile(consentimiento_path)
+        else:  # Linux y macOS
+            subprocess.Popen(['xdg-open', consentimiento_path])
+
     def update_info_display(self, info_frame):
         """Actualizar información de resumen"""
-        db = get_db_session()
-        total_urnas = db.query(Urna).count()
-        db.close()
+        total_urnas = estadisticas.obtener()['total_urnas']
 
         # Limpiar frame
         for widget in info_frame.winfo_children():
@@ -599,9 +559,9 @@ class UrnasDialog:
         """Cargar ventas completamente pagadas en el combobox"""
         try:
             db = get_db_session()
-            ventas = db.query(Venta).filter(Venta.pagado_completamente == True).all()
+            ventas = obtener_filas(db, consulta_ventas(pagado=True, orden=[Venta.id]))
 
-            ventas_list = [f"{v.numero_contrato} - {v.nicho.numero}" for v in ventas]
+            ventas_list = [f"{v.numero_contrato} - {v.nicho_numero}" for v in ventas]
             combobox['values'] = ventas_list
 
             db.close()
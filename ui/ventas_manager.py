@@ -6,15 +6,20 @@ Interfaz para la gestión de ventas
 import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime
-from sqlalchemy import func
 from database.models import (get_db_session, Cliente, Nicho, Venta, Beneficiario, Pago,
                            generar_numero_contrato, generar_numero_recibo, buscar_nichos_disponibles)
+from database.consultas import consulta_ventas, ConsultaPaginada, ORDEN_VENTAS
+from database.estadisticas import estadisticas
+from ui.virtual_treeview import VirtualTreeview
+from ui.search_dispatcher import SearchDispatcher
 
 class VentasManager:
     def __init__(self, parent, update_status_callback):
         self.parent = parent
         self.update_status = update_status_callback
         self.tree = None
+        self.virtual_tree = None
+        self.search_dispatcher = SearchDispatcher(self.parent)
         self.search_var = tk.StringVar()
         
     def show(self):
@@ -78,7 +83,7 @@ class VentasManager:
         self.update_info_display(info_frame)
     
     def create_sales_tree(self, parent):
-        """Crear TreeView para mostrar ventas"""
+        """Crear TreeView virtual para mostrar ventas"""
         tree_frame = ttk.Frame(parent)
         tree_frame.grid(row=2, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         tree_frame.columnconfigure(0, weight=1)
@@ -87,17 +92,20 @@ class VentasManager:
         # TreeView
         columns = ('contrato', 'fecha', 'cliente', 'nicho', 'precio_total', 
                   'tipo_pago', 'saldo', 'estado')
-        self.tree = ttk.Treeview(tree_frame, columns=columns, show='headings', height=15)
+        self.virtual_tree = VirtualTreeview(tree_frame, columns, format_row=self.format_sale_row,
+                                            row_id=lambda venta: venta.id)
+        self.virtual_tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.tree = self.virtual_tree.tree
         
         # Configurar columnas
-        self.tree.heading('contrato', text='Contrato')
-        self.tree.heading('fecha', text='Fecha')
-        self.tree.heading('cliente', text='Titular')
-        self.tree.heading('nicho', text='Nicho')
-        self.tree.heading('precio_total', text='Precio Total')
-        self.tree.heading('tipo_pago', text='Tipo Pago')
-        self.tree.heading('saldo', text='Saldo')
-        self.tree.heading('estado', text='Estado')
+        self.virtual_tree.heading('contrato', text='Contrato')
+        self.virtual_tree.heading('fecha', text='Fecha')
+        self.virtual_tree.heading('cliente', text='Titular')
+        self.virtual_tree.heading('nicho', text='Nicho')
+        self.virtual_tree.heading('precio_total', text='Precio Total')
+        self.virtual_tree.heading('tipo_pago', text='Tipo Pago')
+        self.virtual_tree.heading('saldo', text='Saldo')
+        self.virtual_tree.heading('estado', text='Estado')
         
         self.tree.column('contrato', width=120)
         self.tree.column('fecha', width=100)
@@ -108,67 +116,47 @@ class VentasManager:
         self.tree.column('saldo', width=120)
         self.tree.column('estado', width=100)
         
-        # Scrollbars
-        v_scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree.yview)
-        h_scrollbar = ttk.Scrollbar(tree_frame, orient=tk.HORIZONTAL, command=self.tree.xview)
-        self.tree.configure(yscrollcommand=v_scrollbar.set, xscrollcommand=h_scrollbar.set)
-        
-        # Grid
-        self.tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        v_scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
-        h_scrollbar.grid(row=1, column=0, sticky=(tk.W, tk.E))
-        
         # Eventos
         self.tree.bind('<Double-1>', self.on_double_click)
         self.tree.bind('<Button-3>', self.show_context_menu)
     
     def load_sales(self):
         """Cargar ventas desde la base de datos"""
+        total = self.show_sales()
+        self.update_status(f"Ventas cargadas: {total}")
+    
+    def show_sales(self, busqueda=None, pagado=None):
+        """Mostrar las ventas que cumplen los filtros; devuelve el total de filas"""
+        # Una carga directa reemplaza cualquier búsqueda en curso
+        self.search_dispatcher.cancel()
         try:
-            db = get_db_session()
-            ventas = db.query(Venta).join(Nicho).order_by(Nicho.numero).all()
-            
-            # Limpiar TreeView
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-            
-            # Agregar ventas
-            for venta in ventas:
-                cliente_nombre = venta.cliente.nombre_completo if venta.cliente else "N/A"
-                nicho_numero = venta.nicho.numero if venta.nicho else "N/A"
-                estado = "Pagado" if venta.pagado_completamente else "Pendiente"
-
-                values = (
-                    venta.numero_contrato,
-                    venta.fecha_venta.strftime("%d/%m/%Y"),
-                    cliente_nombre,
-                    nicho_numero,
-                    f"${venta.precio_total:,.2f}",
-                    venta.tipo_pago.title(),
-                    f"${venta.saldo_restante:,.2f}",
-                    estado
-                )
-
-                # Usar el ID de la venta como identificador del item en el TreeView
-                item = self.tree.insert('', 'end', iid=str(venta.id), values=values)
-                
-                # Colorear según estado
-                if venta.pagado_completamente:
-                    self.tree.set(item, 'estado', 'Pagado')
-                    # self.tree.item(item, tags=('pagado',))
-                else:
-                    # self.tree.item(item, tags=('pendiente',))
-                    pass
+            self.virtual_tree.set_data_source(ConsultaPaginada(
+                consulta_ventas(busqueda=busqueda, pagado=pagado), ORDEN_VENTAS, Venta.id
+            ))
             
             # Configurar tags para colores
             self.tree.tag_configure('pagado', background='#d4edda')
             self.tree.tag_configure('pendiente', background='#fff3cd')
             
-            db.close()
-            self.update_status(f"Ventas cargadas: {len(ventas)}")
+            return self.virtual_tree.total
             
         except Exception as e:
             messagebox.showerror("Error", f"Error al cargar ventas: {str(e)}")
+            return 0
+    
+    def format_sale_row(self, venta):
+        """Formatear una fila de venta para el TreeView"""
+        estado = "Pagado" if venta.pagado_completamente else "Pendiente"
+        return (
+            venta.numero_contrato,
+            venta.fecha_venta.strftime("%d/%m/%Y"),
+            venta.cliente_nombre or "N/A",
+            venta.nicho_numero or "N/A",
+            f"${venta.precio_total:,.2f}",
+            venta.tipo_pago.title(),
+            f"${venta.saldo_restante:,.2f}",
+            estado
+        )
     
     def new_sale(self):
         """Crear nueva venta"""
@@ -191,7 +179,7 @@ class VentasManager:
                     return
                 
                 # Crear venta
-                numero_contrato = generar_numero_contrato()
+                numero_contrato = generar_numero_contrato(db)
                 
                 # NOTA: Para simplificar la contabilidad, el enganche siempre es 0 en la venta.
                 # Todo el dinero se registra a través de pagos (recibos).
@@ -220,7 +208,7 @@ class VentasManager:
                 numero_recibo_generado = None
 
                 if monto_pago_inicial > 0:
-                    numero_recibo_generado = generar_numero_recibo()
+                    numero_recibo_generado = generar_numero_recibo(db)
                     concepto_pago = "Pago total del nicho" if dialog.result['tipo_pago'] == 'contado' else "Pago de enganche"
 
                     pago_inicial = Pago(
@@ -454,55 +442,22 @@ class VentasManager:
             messagebox.showerror("Error", f"Error al anular venta: {str(e)}")
     
     def on_search(self, event=None):
-        """Filtrar ventas según búsqueda"""
+        """Filtrar ventas según búsqueda (con retardo y en segundo plano)"""
         search_term = self.search_var.get().lower()
+        fuente = ConsultaPaginada(consulta_ventas(busqueda=search_term or None), ORDEN_VENTAS, Venta.id)
         
-        if not search_term:
-            self.load_sales()
-            return
+        def mostrar(resultado):
+            self.virtual_tree.set_data_source(fuente, resultado)
+            if search_term:
+                self.update_status(f"Búsqueda: {resultado[0]} resultados")
+            else:
+                self.update_status(f"Ventas cargadas: {resultado[0]}")
         
-        try:
-            db = get_db_session()
-            query = db.query(Venta).join(Cliente).join(Nicho)
-            
-            # Filtrar por término de búsqueda
-            query = query.filter(
-                Venta.numero_contrato.contains(search_term) |
-                Cliente.nombre.contains(search_term) |
-                Cliente.apellido.contains(search_term) |
-                Cliente.cedula.contains(search_term) |
-                Nicho.numero.contains(search_term)
-            )
-            
-            ventas = query.order_by(Nicho.numero).all()
-
-            # Actualizar TreeView
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-
-            for venta in ventas:
-                cliente_nombre = venta.cliente.nombre_completo if venta.cliente else "N/A"
-                nicho_numero = venta.nicho.numero if venta.nicho else "N/A"
-                estado = "Pagado" if venta.pagado_completamente else "Pendiente"
-
-                values = (
-                    venta.numero_contrato,
-                    venta.fecha_venta.strftime("%d/%m/%Y"),
-                    cliente_nombre,
-                    nicho_numero,
-                    f"${venta.precio_total:,.2f}",
-                    venta.tipo_pago.title(),
-                    f"${venta.saldo_restante:,.2f}",
-                    estado
-                )
-
-                self.tree.insert('', 'end', iid=str(venta.id), values=values)
-
-            db.close()
-            self.update_status(f"Búsqueda: {len(ventas)} resultados")
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Error en búsqueda: {str(e)}")
+        self.search_dispatcher.submit(
+            lambda db: self.virtual_tree.prefetch(fuente, db),
+            mostrar,
+            lambda e: messagebox.showerror("Error", f"Error en búsqueda: {str(e)}")
+        )
     
     def clear_search(self):
         """Limpiar búsqueda"""
@@ -514,77 +469,26 @@ class VentasManager:
         """Aplicar filtros de estado"""
         filter_value = self.filter_estado.get()
         
-        try:
-            db = get_db_session()
-            query = db.query(Venta).join(Cliente).join(Nicho)
-            
-            # Aplicar filtro de búsqueda si existe
-            search_term = self.search_var.get().lower()
-            if search_term:
-                query = query.filter(
-                    Venta.numero_contrato.contains(search_term) |
-                    Cliente.nombre.contains(search_term) |
-                    Cliente.apellido.contains(search_term) |
-                    Cliente.cedula.contains(search_term) |
-                    Nicho.numero.contains(search_term)
-                )
-            
-            # Aplicar filtro de estado
-            if filter_value == "Pagadas":
-                query = query.filter(Venta.pagado_completamente == True)
-            elif filter_value == "Pendientes":
-                query = query.filter(Venta.pagado_completamente == False)
-
-            ventas = query.order_by(Nicho.numero).all()
-            
-            # Actualizar TreeView
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-            
-            for venta in ventas:
-                cliente_nombre = venta.cliente.nombre_completo if venta.cliente else "N/A"
-                nicho_numero = venta.nicho.numero if venta.nicho else "N/A"
-                estado = "Pagado" if venta.pagado_completamente else "Pendiente"
-
-                values = (
-                    venta.numero_contrato,
-                    venta.fecha_venta.strftime("%d/%m/%Y"),
-                    cliente_nombre,
-                    nicho_numero,
-                    f"${venta.precio_total:,.2f}",
-                    venta.tipo_pago.title(),
-                    f"${venta.saldo_restante:,.2f}",
-                    estado
-                )
+        # Aplicar filtro de estado
+        pagado = None
+        if filter_value == "Pagadas":
+            pagado = True
+        elif filter_value == "Pendientes":
+            pagado = False
 
-                self.tree.insert('', 'end', iid=str(venta.id), values=values)
-            
-            db.close()
-            self.update_status(f"Filtro aplicado: {len(ventas)} resultados")
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Error al aplicar filtros: {str(e)}")
+        total = self.show_sales(busqueda=self.search_var.get().lower() or None, pagado=pagado)
+        self.update_status(f"Filtro aplicado: {total} resultados")
     
     def update_info_display(self, parent):
         """Actualizar display de información"""
         try:
-            db = get_db_session()
-            
-            total_ventas = db.query(Venta).count()
-            ventas_pagadas = db.query(Venta).filter(Venta.pagado_completamente == True).count()
-            ventas_pendientes = total_ventas - ventas_pagadas
-            
-            # Calcular totales monetarios
-            total_vendido = db.query(func.sum(Venta.precio_total)).scalar() or 0
-            total_pendiente = db.query(func.sum(Venta.saldo_restante)).scalar() or 0
-            
-            db.close()
+            cifras = estadisticas.obtener()
             
-            info_text = (f"Total Ventas: {total_ventas} | "
-                        f"Pagadas: {ventas_pagadas} | "
-                        f"Pendientes: {ventas_pendientes} | "
-                        f"Monto Total: ${total_vendido:,.2f} | "
-                        f"Saldo Pendiente: ${total_pendiente:,.2f}")
+            info_text = (f"Total Ventas: {cifras['total_ventas']} | "
+                        f"Pagadas: {cifras['ventas_pagadas']} | "
+                        f"Pendientes: {cifras['ventas_pendientes']} | "
+                        f"Monto Total: ${cifras['monto_vendido']:,.2f} | "
+                        f"Saldo Pendiente: ${cifras['saldo_pendiente']:,.2f}")
             
             ttk.Label(parent, text=info_text, font=("Arial", 10)).pack()
             
@@ -0,0 +1,251 @@
+# ui/virtual_treeview.py
+"""
+TreeView virtual que solo materializa las filas visibles y carga páginas bajo demanda
+"""
+
+import tkinter as tk
+from tkinter import ttk
+from collections import OrderedDict
+
+# Alto aproximado del encabezado de columnas en píxeles
+HEADER_HEIGHT = 25
+
+
+class VirtualTreeview(ttk.Frame):
+    """
+    Lista paginada sobre ttk.Treeview.
+
+    La fuente de datos debe ofrecer count(), fetch(offset, limit, sort_key, descending)
+    y el conjunto sortable con las columnas que se pueden ordenar en el servidor.
+    """
+
+    def __init__(self, parent, columns, format_row, row_id, data_source=None, row_tags=None,
+                 page_size=200, max_pages=8, height=15):
+        super().__init__(parent)
+        self.columns = columns
+        self.format_row = format_row
+        self.row_id = row_id
+        self.row_tags = row_tags
+        self.data_source = data_source
+        self.page_size = page_size
+        self.max_pages = max_pages
+
+        self.total = 0
+        self.offset = 0
+        self.visible_rows = height
+        self.sort_column = None
+        self.sort_descending = False
+        self._pages = OrderedDict()
+        self._headings = {}
+        self._selected = None
+
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(0, weight=1)
+
+        self.tree = ttk.Treeview(self, columns=columns, show='headings', height=height,
+                                 selectmode='browse')
+        self.tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+
+        # La barra vertical representa el total de filas, no los items materializados
+        self.v_scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.v_scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+
+        h_scrollbar = ttk.Scrollbar(self, orient=tk.HORIZONTAL, command=self.tree.xview)
+        self.tree.configure(xscrollcommand=h_scrollbar.set)
+        h_scrollbar.grid(row=1, column=0, sticky=(tk.W, tk.E))
+
+        # Eventos
+        self.tree.bind('<Configure>', self._on_resize)
+        self.tree.bind('<<TreeviewSelect>>', self._on_select)
+        self.tree.bind('<MouseWheel>', self._on_mousewheel)
+        self.tree.bind('<Button-4>', self._on_mousewheel)
+        self.tree.bind('<Button-5>', self._on_mousewheel)
+        self.tree.bind('<Down>', lambda event: self._on_arrow_key(1))
+        self.tree.bind('<Up>', lambda event: self._on_arrow_key(-1))
+        self.tree.bind('<Next>', lambda event: self._on_page_key(1))
+        self.tree.bind('<Prior>', lambda event: self._on_page_key(-1))
+
+    def heading(self, column, text):
+        """Configurar encabezado; las columnas ordenables responden al clic"""
+        self._headings[column] = text
+        self.tree.heading(column, text=text, command=lambda c=column: self.sort_by(c))
+
+    def column(self, column, **kwargs):
+        """Configurar una columna del TreeView"""
+        self.tree.column(column, **kwargs)
+
+    def prefetch(self, data_source, db=None):
+        """Contar y leer la primera página de una fuente (no toca Tk; apto para un hilo de trabajo)"""
+        total = data_source.count(db=db)
+        first_page = data_source.fetch(0, self.page_size, self.sort_column,
+                                       self.sort_descending, db=db)
+        return total, first_page
+
+    def set_data_source(self, data_source, prefetched=None):
+        """
+        Cambiar la consulta mostrada y volver al inicio de la lista
+
+        Args:
+            data_source: Nueva fuente de datos
+            prefetched: Resultado de prefetch() para no volver a consultar
+        """
+        self.data_source = data_source
+        if prefetched is None:
+            self.refresh()
+            return
+
+        self.total, first_page = prefetched
+        self._pages.clear()
+        self._pages[0] = first_page
+        self.offset = 0
+        self._selected = None
+        self._render()
+
+    def refresh(self, keep_position=False):
+        """Volver a contar las filas y redibujar desde la base de datos"""
+        self._pages.clear()
+        if not keep_position:
+            self.offset = 0
+            self._selected = None
+        self.total = self.data_source.count() if self.data_source else 0
+        self._render()
+
+    def sort_by(self, column):
+        """Ordenar en el servidor por la columna indicada (alterna asc/desc)"""
+        if not self.data_source or column not in self.data_source.sortable:
+            return
+        if self.sort_column == column:
+            self.sort_descending = not self.sort_descending
+        else:
+            self.sort_column = column
+            self.sort_descending = False
+
+        # Indicar la columna ordenada en los encabezados
+        for col, text in self._headings.items():
+            if col == self.sort_column:
+                text = f"{text} {'▼' if self.sort_descending else '▲'}"
+            self.tree.heading(col, text=text)
+
+        self.refresh()
+
+    def scroll(self, rows):
+        """Desplazar la ventana visible el número de filas indicado"""
+        self.offset += rows
+        self._render()
+
+    def _get_page(self, page):
+        """Obtener una página desde la caché o la base de datos"""
+        if page in self._pages:
+            self._pages.move_to_end(page)
+            return self._pages[page]
+
+        rows = self.data_source.fetch(page * self.page_size, self.page_size,
+                                      self.sort_column, self.sort_descending)
+        self._pages[page] = rows
+
+        # Conservar solo las páginas usadas más recientemente
+        while len(self._pages) > self.max_pages:
+            self._pages.popitem(last=False)
+        return rows
+
+    def _get_rows(self, start, count):
+        """Obtener las filas [start, start + count) uniendo las páginas necesarias"""
+        if count <= 0 or self.total == 0:
+            return []
+        first_page = start // self.page_size
+        last_page = min(start + count - 1, self.total - 1) // self.page_size
+
+        rows = []
+        for page in range(first_page, last_page + 1):
+            rows.extend(self._get_page(page))
+
+        start_in_page = start - first_page * self.page_size
+        return rows[start_in_page:start_in_page + count]
+
+    def _render(self):
+        """Materializar únicamente las filas de la ventana visible"""
+        self.offset = max(0, min(self.offset, self.total - self.visible_rows))
+        rows = self._get_rows(self.offset, self.visible_rows) if self.data_source else []
+
+        self.tree.delete(*self.tree.get_children())
+        for row in rows:
+            tags = self.row_tags(row) if self.row_tags else ()
+            self.tree.insert('', 'end', iid=str(self.row_id(row)),
+                             values=self.format_row(row), tags=tags)
+
+        # Restaurar la selección si la fila seleccionada sigue visible
+        if self._selected and self.tree.exists(self._selected):
+            self.tree.selection_set(self._selected)
+            self.tree.focus(self._selected)
+
+        self._update_scrollbar()
+
+    def _update_scrollbar(self):
+        """Ajustar la barra vertical a la posición dentro del total de filas"""
+        if self.total <= 0:
+            self.v_scrollbar.set(0.0, 1.0)
+            return
+        first = self.offset / self.total
+        last = min(1.0, (self.offset + self.visible_rows) / self.total)
+        self.v_scrollbar.set(first, last)
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        """Traducir los comandos de la barra de desplazamiento a un desplazamiento de filas"""
+        if action == 'moveto':
+            self.offset = int(float(amount) * self.total)
+            self._render()
+        elif action == 'scroll':
+            step = int(amount)
+            if unit == 'pages':
+                step *= max(1, self.visible_rows - 1)
+            self.scroll(step)
+
+    def _on_mousewheel(self, event):
+        """Desplazar con la rueda del ratón (Windows/macOS y X11)"""
+        if event.num == 4:
+            step = -3
+        elif event.num == 5:
+            step = 3
+        else:
+            step = -3 if event.delta > 0 else 3
+        self.scroll(step)
+        return "break"
+
+    def _on_arrow_key(self, step):
+        """Al llegar al borde de la ventana, desplazar en lugar de perder el foco"""
+        items = self.tree.get_children()
+        if not items:
+            return None
+        edge = items[-1] if step > 0 else items[0]
+        if self.tree.focus() != edge:
+            return None
+
+        self.scroll(step)
+        items = self.tree.get_children()
+        if items:
+            target = items[-1] if step > 0 else items[0]
+            self.tree.selection_set(target)
+            self.tree.focus(target)
+        return "break"
+
+    def _on_page_key(self, step):
+        """Avanzar o retroceder una página visible"""
+        self.scroll(step * max(1, self.visible_rows - 1))
+        return "break"
+
+    def _on_select(self, event=None):
+        """Recordar la fila seleccionada aunque salga de la ventana visible"""
+        selection = self.tree.selection()
+        if selection:
+            self._selected = selection[0]
+
+    def _on_resize(self, event):
+        """Recalcular cuántas filas caben al cambiar el tamaño del widget"""
+        try:
+            row_height = int(ttk.Style().lookup('Treeview', 'rowheight') or 20)
+        except (ValueError, tk.TclError):
+            row_height = 20
+        visible_rows = max(1, (event.height - HEADER_HEIGHT) // row_height)
+        if visible_rows != self.visible_rows:
+            self.visible_rows = visible_rows
+            self._render()